@@ -5,7 +5,9 @@ Flask backend with Supabase integration for Expense Management System
 
 from flask import Flask, jsonify
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
+import logging
 import os
 from pathlib import Path
 
@@ -14,27 +16,55 @@ backend_dir = Path(__file__).resolve().parent
 env_path = backend_dir / '.env'
 load_dotenv(dotenv_path=env_path)
 
+# Module loggers (logging.getLogger(__name__)) write to stderr
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+
 # Import database config AFTER loading env
 from config.database import test_connection
+from utils.jobs import start_workers
+from utils.uploads import StreamingUploadRequest
 
 # Import route blueprints
 from routes.auth import auth_bp
 from routes.users import users_bp
 from routes.countries import countries_bp
 from routes.categories import categories_bp
-from routes.upload import upload_bp
+from routes.upload import upload_bp, MAX_UPLOAD_REQUEST_SIZE
 from routes.expenses import expenses_bp
+from routes.approval_rules import approval_rules_bp
+from routes.approvals import approvals_bp
+from routes.jobs import jobs_bp
+from routes.notifications import notifications_bp
+from routes.events import events_bp
+from routes.storage import storage_bp
+from routes.reports import reports_bp
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
 
+# Bodies over the limit are refused with 413 before they are parsed, and
+# multipart file parts are spooled to disk instead of memory
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_REQUEST_SIZE
+app.request_class = StreamingUploadRequest
+
+# Reverse proxies in front of the app (0 = none). Only that many
+# X-Forwarded-For hops are trusted, so request.remote_addr (used by the rate
+# limiter) cannot be spoofed by clients.
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', 0))
+if TRUSTED_PROXY_COUNT > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT, x_proto=TRUSTED_PROXY_COUNT)
+
 # Enable CORS for all routes
 CORS(app, resources={
     r"/*": {
         "origins": "*",
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization", "Last-Event-ID", "Range", "If-Range"],
+        "expose_headers": ["Retry-After", "Content-Range", "Accept-Ranges", "ETag"]
     }
 })
 
@@ -45,6 +75,23 @@ app.register_blueprint(countries_bp, url_prefix='/api')
 app.register_blueprint(categories_bp, url_prefix='/api/categories')
 app.register_blueprint(upload_bp, url_prefix='/api')
 app.register_blueprint(expenses_bp, url_prefix='/api/expenses')
+app.register_blueprint(approval_rules_bp, url_prefix='/api/approval-rules')
+app.register_blueprint(approvals_bp, url_prefix='/api/approvals')
+app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
+app.register_blueprint(notifications_bp, url_prefix='/api/notifications')
+app.register_blueprint(events_bp, url_prefix='/api/events')
+app.register_blueprint(storage_bp, url_prefix='/api/storage')
+app.register_blueprint(reports_bp, url_prefix='/api/reports')
+
+# Start the background job workers (JOB_WORKERS=0 disables them). The debug
+# reloader's watcher process only restarts the server, so it runs none.
+is_reloader_watcher = (
+    __name__ == '__main__'
+    and os.getenv('DEBUG', 'True').lower() == 'true'
+    and os.getenv('WERKZEUG_RUN_MAIN') != 'true'
+)
+if not is_reloader_watcher:
+    start_workers()
 
 # Basic health check route
 @app.route('/')
@@ -81,6 +128,14 @@ def not_found(error):
         'message': 'Resource not found'
     }), 404
 
+@app.errorhandler(413)
+def request_too_large(error):
+    """Handle bodies over MAX_CONTENT_LENGTH"""
+    return jsonify({
+        'status': 'error',
+        'message': f'Request too large. Maximum size: {MAX_UPLOAD_REQUEST_SIZE // 1024} KB'
+    }), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     """Handle 500 errors"""
@@ -1,6 +1,6 @@
 """
 Config package initialization
 """
-from .database import get_supabase_client, get_supabase_admin_client, test_connection
+from .database import get_supabase_client, get_supabase_admin_client, is_unique_violation, is_check_violation, test_connection
 
-__all__ = ['get_supabase_client', 'get_supabase_admin_client', 'test_connection']
+__all__ = ['get_supabase_client', 'get_supabase_admin_client', 'is_unique_violation', 'is_check_violation', 'test_connection']
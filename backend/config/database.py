@@ -4,13 +4,23 @@ Handles connection to Supabase PostgreSQL database
 """
 
 import os
-from supabase import create_client, Client
+import httpx
+from supabase import create_client, Client, ClientOptions
 
 # NOTE: Environment variables are loaded in app.py before this module is imported
 # This ensures proper order of initialization
 
+# Connection pool of the Supabase clients (PostgREST, Storage, Auth)
+SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', 60))  # seconds per read/write
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv('SUPABASE_CONNECT_TIMEOUT', 5))  # seconds
+SUPABASE_MAX_CONNECTIONS = int(os.getenv('SUPABASE_MAX_CONNECTIONS', 50))
+SUPABASE_MAX_KEEPALIVE = int(os.getenv('SUPABASE_MAX_KEEPALIVE', 20))  # idle connections kept open
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv('SUPABASE_KEEPALIVE_EXPIRY', 30))  # seconds
+
 # Initialize Supabase client
 supabase: Client = None
+supabase_admin: Client = None
+http_client: httpx.Client = None
 
 def get_supabase_url():
     """Get Supabase URL from environment"""
@@ -24,6 +34,30 @@ def get_supabase_service_key():
     """Get Supabase service role key from environment"""
     return os.getenv('SUPABASE_SERVICE_KEY')
 
+def get_http_client() -> httpx.Client:
+    """
+    Get the HTTP client shared by every Supabase client
+    One thread-safe connection pool with keep-alive (and HTTP/2), so
+    queries reuse open connections instead of handshaking each time
+    Returns:
+        httpx.Client: Shared HTTP client
+    """
+    global http_client
+    
+    if http_client is None:
+        http_client = httpx.Client(
+            timeout=httpx.Timeout(SUPABASE_TIMEOUT, connect=SUPABASE_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+                keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY
+            ),
+            http2=True,
+            follow_redirects=True
+        )
+    
+    return http_client
+
 def get_supabase_client() -> Client:
     """
     Get Supabase client instance (uses service role key to bypass RLS)
@@ -45,7 +79,8 @@ def get_supabase_client() -> Client:
             # Create client using service role key (bypasses RLS)
             supabase = create_client(
                 supabase_url=url,
-                supabase_key=key
+                supabase_key=key,
+                options=ClientOptions(httpx_client=get_http_client())
             )
         except Exception as e:
             raise
@@ -55,19 +90,50 @@ def get_supabase_client() -> Client:
 def get_supabase_admin_client() -> Client:
     """
     Get Supabase admin client (for admin operations with service role key)
+    Kept separate from get_supabase_client() so auth admin calls never
+    change the session of the client used for queries; both share one
+    connection pool.
     Returns:
         Client: Supabase admin client instance
     """
-    url = get_supabase_url()
-    service_key = get_supabase_service_key()
+    global supabase_admin
     
-    if not url or not service_key:
-        raise ValueError("Supabase URL and SERVICE_KEY must be set in environment variables")
+    if supabase_admin is None:
+        url = get_supabase_url()
+        service_key = get_supabase_service_key()
+        
+        if not url or not service_key:
+            raise ValueError("Supabase URL and SERVICE_KEY must be set in environment variables")
+        
+        supabase_admin = create_client(
+            supabase_url=url,
+            supabase_key=service_key,
+            options=ClientOptions(httpx_client=get_http_client())
+        )
     
-    return create_client(
-        supabase_url=url,
-        supabase_key=service_key
-    )
+    return supabase_admin
+
+def is_unique_violation(error: Exception) -> bool:
+    """
+    Check if a PostgREST error was caused by a UNIQUE constraint
+    Lets write paths rely on the schema's constraints instead of pre-selecting
+    Args:
+        error: Exception raised by a Supabase query
+    Returns:
+        True if the error is a unique_violation (SQLSTATE 23505)
+    """
+    return getattr(error, 'code', None) == '23505'
+
+def is_check_violation(error: Exception) -> bool:
+    """
+    Check if a PostgREST error was caused by a CHECK constraint or a trigger
+    raising check_violation
+    Args:
+        error: Exception raised by a Supabase query
+    Returns:
+        True if the error is a check_violation (SQLSTATE 23514)
+    """
+    return getattr(error, 'code', None) == '23514'
 
 def test_connection() -> dict:
     """
@@ -7,6 +7,9 @@
 -- Enable UUID extension
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
+-- Enable trigram extension (user directory prefix search)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- =====================================================
 -- TABLE: companies
 -- Stores company information
@@ -68,6 +71,7 @@ CREATE TABLE expenses (
     expense_date DATE NOT NULL,
     description TEXT,
     receipt_url TEXT,
+    receipt_thumbnail_url TEXT,
     paid_by VARCHAR(20) DEFAULT 'personal' CHECK (paid_by IN ('personal', 'company')),
     status VARCHAR(50) DEFAULT 'draft' CHECK (status IN ('draft', 'submitted', 'approved', 'rejected')),
     submitted_at TIMESTAMP WITH TIME ZONE,
@@ -111,37 +115,354 @@ CREATE TABLE approval_rule_approvers (
 -- =====================================================
 -- TABLE: approvals
 -- Tracks approval requests and responses
--- Status: pending, approved, rejected
+-- Status: waiting (later step of a sequential rule), pending, approved, rejected,
+-- skipped (still open when the expense was decided)
 -- =====================================================
 CREATE TABLE approvals (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     expense_id UUID REFERENCES expenses(id) ON DELETE CASCADE,
     approver_id UUID REFERENCES users(id) ON DELETE CASCADE,
     approval_rule_id UUID REFERENCES approval_rules(id) ON DELETE SET NULL,
-    status VARCHAR(50) DEFAULT 'pending' CHECK (status IN ('pending', 'approved', 'rejected')),
+    status VARCHAR(50) DEFAULT 'pending' CHECK (status IN ('waiting', 'pending', 'approved', 'rejected', 'skipped')),
+    sequence_order INTEGER DEFAULT 1,
+    is_required BOOLEAN DEFAULT FALSE,
     comments TEXT,
     responded_at TIMESTAMP WITH TIME ZONE,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- =====================================================
+-- TABLE: user_hierarchy
+-- Closure table of the users.manager_id tree
+-- One row per (ancestor, descendant) pair, including self (depth 0)
+-- Maintained by triggers on users, so every write path keeps it current
+-- =====================================================
+CREATE TABLE IF NOT EXISTS user_hierarchy (
+    ancestor_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    descendant_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    depth INTEGER NOT NULL,
+    PRIMARY KEY (ancestor_id, descendant_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_hierarchy_descendant ON user_hierarchy(descendant_id);
+
+CREATE OR REPLACE FUNCTION user_hierarchy_on_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO user_hierarchy (ancestor_id, descendant_id, depth)
+    VALUES (NEW.id, NEW.id, 0);
+
+    IF NEW.manager_id IS NOT NULL THEN
+        INSERT INTO user_hierarchy (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, NEW.id, depth + 1
+        FROM user_hierarchy
+        WHERE descendant_id = NEW.manager_id;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION user_hierarchy_on_manager_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Refuse assignments that would make a user manage one of their own managers
+    IF NEW.manager_id IS NOT NULL AND EXISTS (
+        SELECT 1 FROM user_hierarchy
+        WHERE ancestor_id = NEW.id AND descendant_id = NEW.manager_id
+    ) THEN
+        RAISE EXCEPTION 'Manager assignment would create a reporting cycle'
+            USING ERRCODE = 'check_violation';
+    END IF;
+
+    -- Detach the subtree from its old ancestors
+    DELETE FROM user_hierarchy
+    WHERE descendant_id IN (SELECT descendant_id FROM user_hierarchy WHERE ancestor_id = NEW.id)
+      AND ancestor_id NOT IN (SELECT descendant_id FROM user_hierarchy WHERE ancestor_id = NEW.id);
+
+    -- Attach it under the new manager's ancestors
+    IF NEW.manager_id IS NOT NULL THEN
+        INSERT INTO user_hierarchy (ancestor_id, descendant_id, depth)
+        SELECT sup.ancestor_id, sub.descendant_id, sup.depth + sub.depth + 1
+        FROM user_hierarchy sup
+        CROSS JOIN user_hierarchy sub
+        WHERE sup.descendant_id = NEW.manager_id
+          AND sub.ancestor_id = NEW.id;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_hierarchy_insert ON users;
+CREATE TRIGGER users_hierarchy_insert AFTER INSERT ON users
+    FOR EACH ROW EXECUTE FUNCTION user_hierarchy_on_insert();
+
+DROP TRIGGER IF EXISTS users_hierarchy_manager_change ON users;
+CREATE TRIGGER users_hierarchy_manager_change AFTER UPDATE OF manager_id ON users
+    FOR EACH ROW
+    WHEN (OLD.manager_id IS DISTINCT FROM NEW.manager_id)
+    EXECUTE FUNCTION user_hierarchy_on_manager_change();
+
+-- =====================================================
+-- VIEW: team_expenses
+-- Expenses joined to every ancestor of their owner, so
+-- "all expenses in my subtree" is one indexed join:
+--   team_expenses?ancestor_id=eq.<manager_id>
+-- =====================================================
+CREATE OR REPLACE VIEW team_expenses AS
+SELECT e.*, h.ancestor_id
+FROM expenses e
+JOIN user_hierarchy h ON h.descendant_id = e.user_id;
+
+-- =====================================================
+-- TABLE: category_usage
+-- Precomputed expense count and amount per category and currency
+-- Maintained by a trigger on expenses; read by
+-- GET /api/categories/stats and delete_category
+-- =====================================================
+CREATE TABLE IF NOT EXISTS category_usage (
+    category_id UUID NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+    company_id UUID NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+    currency VARCHAR(10) NOT NULL,
+    expense_count INTEGER NOT NULL DEFAULT 0,
+    total_amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (category_id, currency)
+);
+
+CREATE INDEX IF NOT EXISTS idx_category_usage_company ON category_usage(company_id);
+
+CREATE OR REPLACE FUNCTION category_usage_apply(
+    p_category_id UUID,
+    p_company_id UUID,
+    p_currency VARCHAR,
+    p_count INTEGER,
+    p_amount DECIMAL
+)
+RETURNS VOID AS $$
+BEGIN
+    IF p_category_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO category_usage (category_id, company_id, currency, expense_count, total_amount)
+    VALUES (p_category_id, p_company_id, COALESCE(p_currency, 'USD'), p_count, p_amount)
+    ON CONFLICT (category_id, currency) DO UPDATE
+    SET expense_count = category_usage.expense_count + EXCLUDED.expense_count,
+        total_amount = category_usage.total_amount + EXCLUDED.total_amount;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION category_usage_on_expense_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM category_usage_apply(OLD.category_id, OLD.company_id, OLD.currency, -1, -OLD.amount);
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM category_usage_apply(NEW.category_id, NEW.company_id, NEW.currency, 1, NEW.amount);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS expenses_category_usage ON expenses;
+CREATE TRIGGER expenses_category_usage
+    AFTER INSERT OR DELETE OR UPDATE OF category_id, currency, amount ON expenses
+    FOR EACH ROW EXECUTE FUNCTION category_usage_on_expense_change();
+
+-- =====================================================
+-- TABLE: jobs
+-- Durable background job queue (see utils/jobs.py)
+-- Status: queued, running, failed (finished jobs are deleted)
+-- =====================================================
+CREATE TABLE IF NOT EXISTS jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    job_type VARCHAR(100) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}',
+    status VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    locked_by TEXT,
+    locked_at TIMESTAMP WITH TIME ZONE,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(run_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_running ON jobs(locked_at) WHERE status = 'running';
+
+-- Claims up to p_limit runnable jobs (or jobs whose worker died) for one worker
+CREATE OR REPLACE FUNCTION claim_jobs(
+    p_worker TEXT,
+    p_limit INTEGER DEFAULT 1,
+    p_lock_timeout_seconds INTEGER DEFAULT 300
+)
+RETURNS SETOF jobs AS $$
+    UPDATE jobs
+    SET status = 'running',
+        locked_by = p_worker,
+        locked_at = NOW(),
+        attempts = attempts + 1,
+        updated_at = NOW()
+    WHERE id IN (
+        SELECT id FROM jobs
+        WHERE (status = 'queued' AND run_at <= NOW())
+           OR (status = 'running' AND locked_at < NOW() - make_interval(secs => p_lock_timeout_seconds))
+        ORDER BY run_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *;
+$$ LANGUAGE sql;
+
+-- Queue depth for monitoring (GET /api/jobs/stats)
+CREATE OR REPLACE FUNCTION job_queue_stats()
+RETURNS JSON AS $$
+    SELECT json_build_object(
+        'queued', COUNT(*) FILTER (WHERE status = 'queued'),
+        'running', COUNT(*) FILTER (WHERE status = 'running'),
+        'failed', COUNT(*) FILTER (WHERE status = 'failed'),
+        'oldest_queued_at', MIN(run_at) FILTER (WHERE status = 'queued'),
+        'by_type', COALESCE((
+            SELECT json_object_agg(job_type, counts)
+            FROM (
+                SELECT job_type, json_build_object(
+                    'queued', COUNT(*) FILTER (WHERE status = 'queued'),
+                    'running', COUNT(*) FILTER (WHERE status = 'running'),
+                    'failed', COUNT(*) FILTER (WHERE status = 'failed')
+                ) AS counts
+                FROM jobs
+                GROUP BY job_type
+            ) t
+        ), '{}'::json)
+    )
+    FROM jobs;
+$$ LANGUAGE sql STABLE;
+
+-- =====================================================
+-- TABLE: notifications
+-- In-app notifications (written in batches by utils/notifications.py)
+-- Types: approval_requested, expense_approved, expense_rejected
+-- =====================================================
+CREATE TABLE IF NOT EXISTS notifications (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    expense_id UUID REFERENCES expenses(id) ON DELETE CASCADE,
+    type VARCHAR(50) NOT NULL CHECK (type IN ('approval_requested', 'expense_approved', 'expense_rejected')),
+    read_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Newest-first listing per user (keyset pagination) and unread counts
+CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications(user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_notifications_unread ON notifications(user_id) WHERE read_at IS NULL;
+
+-- =====================================================
+-- TABLE: receipts
+-- One row per uploaded receipt object, with the optimized copy and
+-- thumbnail produced in the background (see utils/receipts.py)
+-- Status: pending, optimized, skipped (not an image), failed
+-- =====================================================
+CREATE TABLE IF NOT EXISTS receipts (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    company_id UUID NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+    uploaded_by UUID REFERENCES users(id) ON DELETE SET NULL,
+    path TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    content_type VARCHAR(100),
+    size BIGINT,
+    content_hash CHAR(64),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'optimized', 'skipped', 'failed')),
+    optimized_path TEXT,
+    optimized_url TEXT,
+    optimized_size BIGINT,
+    thumbnail_path TEXT,
+    thumbnail_url TEXT,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Maps an uploaded receipt URL to its optimized copy (create/update expense)
+CREATE INDEX IF NOT EXISTS idx_receipts_url ON receipts(url);
+CREATE INDEX IF NOT EXISTS idx_receipts_optimized_url ON receipts(optimized_url) WHERE optimized_url IS NOT NULL;
+
+-- Content-addressed deduplication: SHA-256 of the original -> stored object
+CREATE INDEX IF NOT EXISTS idx_receipts_content_hash ON receipts(company_id, content_hash) WHERE content_hash IS NOT NULL;
+
+-- =====================================================
+-- TABLE: receipt_extractions
+-- OCR results, one per company and receipt content (SHA-256), so a
+-- duplicate receipt is never read twice (see utils/ocr.py)
+-- Status: done, failed
+-- =====================================================
+CREATE TABLE IF NOT EXISTS receipt_extractions (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    company_id UUID NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+    content_hash CHAR(64) NOT NULL,
+    status VARCHAR(20) NOT NULL CHECK (status IN ('done', 'failed')),
+    text TEXT,
+    suggestions JSONB,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE(company_id, content_hash)
+);
+
+-- =====================================================
+-- TABLE: expense_reports
+-- PDF expense reports rendered in the background (see utils/reports.py)
+-- One row and one stored PDF per user and content version; rendering a
+-- report deletes the same user's older reports with the same title and
+-- reports older than REPORT_RETENTION_DAYS
+-- Status: pending, ready, failed
+-- =====================================================
+CREATE TABLE IF NOT EXISTS expense_reports (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    company_id UUID NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+    requested_by UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    version CHAR(64) NOT NULL,
+    title VARCHAR(200) NOT NULL,
+    company_currency VARCHAR(10) NOT NULL,
+    filters JSONB NOT NULL DEFAULT '{}',
+    expense_ids UUID[] NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'ready', 'failed')),
+    path TEXT,
+    size BIGINT,
+    total NUMERIC(12, 2),
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE(company_id, requested_by, version)
+);
+
 -- =====================================================
 -- INDEXES for better query performance
 -- =====================================================
 CREATE INDEX idx_users_company ON users(company_id);
 CREATE INDEX idx_users_manager ON users(manager_id);
 CREATE INDEX idx_users_email ON users(email);
+CREATE INDEX idx_users_name_trgm ON users USING GIN (name gin_trgm_ops);
+CREATE INDEX idx_users_email_trgm ON users USING GIN (email gin_trgm_ops);
+CREATE INDEX idx_users_company_created ON users(company_id, created_at DESC, id DESC);
 CREATE INDEX idx_categories_company ON categories(company_id);
 CREATE INDEX idx_expenses_user ON expenses(user_id);
 CREATE INDEX idx_expenses_company ON expenses(company_id);
 CREATE INDEX idx_expenses_category ON expenses(category_id);
 CREATE INDEX idx_expenses_status ON expenses(status);
 CREATE INDEX idx_expenses_date ON expenses(expense_date);
+CREATE INDEX idx_expenses_receipt_url ON expenses(receipt_url) WHERE receipt_url IS NOT NULL;
 CREATE INDEX idx_approval_rules_company ON approval_rules(company_id);
 CREATE INDEX idx_approval_rules_category ON approval_rules(category_id);
 CREATE INDEX idx_approvals_expense ON approvals(expense_id);
 CREATE INDEX idx_approvals_approver ON approvals(approver_id);
 CREATE INDEX idx_approvals_status ON approvals(status);
+CREATE INDEX idx_approvals_inbox ON approvals(approver_id, status, created_at DESC, id DESC);
 
 -- =====================================================
 -- TRIGGERS for updated_at timestamps
@@ -163,6 +484,9 @@ CREATE TRIGGER update_users_updated_at BEFORE UPDATE ON users
 CREATE TRIGGER update_categories_updated_at BEFORE UPDATE ON categories
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+CREATE TRIGGER update_receipts_updated_at BEFORE UPDATE ON receipts
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
 CREATE TRIGGER update_expenses_updated_at BEFORE UPDATE ON expenses
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
@@ -172,6 +496,252 @@ CREATE TRIGGER update_approval_rules_updated_at BEFORE UPDATE ON approval_rules
 CREATE TRIGGER update_approvals_updated_at BEFORE UPDATE ON approvals
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+CREATE TRIGGER update_jobs_updated_at BEFORE UPDATE ON jobs
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+CREATE TRIGGER update_expense_reports_updated_at BEFORE UPDATE ON expense_reports
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- =====================================================
+-- FUNCTION: signup_admin
+-- Creates a company and its admin user in one transaction
+-- Called from POST /api/auth/signup via supabase.rpc()
+-- =====================================================
+CREATE OR REPLACE FUNCTION signup_admin(
+    p_email TEXT,
+    p_password_hash TEXT,
+    p_name TEXT,
+    p_company_name TEXT,
+    p_currency TEXT DEFAULT 'USD'
+)
+RETURNS JSON AS $$
+DECLARE
+    v_company companies;
+    v_user users;
+BEGIN
+    -- Duplicate emails are rejected by UNIQUE(email) with a unique_violation,
+    -- which rolls back the company insert as well
+    INSERT INTO companies (name, currency)
+    VALUES (p_company_name, p_currency)
+    RETURNING * INTO v_company;
+
+    INSERT INTO users (email, password_hash, name, role, company_id, is_active)
+    VALUES (p_email, p_password_hash, p_name, 'admin', v_company.id, TRUE)
+    RETURNING * INTO v_user;
+
+    UPDATE companies SET created_by = v_user.id
+    WHERE id = v_company.id
+    RETURNING * INTO v_company;
+
+    RETURN json_build_object(
+        'user', to_jsonb(v_user) - 'password_hash',
+        'company', to_jsonb(v_company)
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- =====================================================
+-- FUNCTION: decide_approvals
+-- Applies one approver's approve/reject decision to many approvals
+-- in a single transaction, then re-evaluates every affected expense
+-- in one set-based pass:
+--   - without a rule (manager or admin fallback) the first decision wins
+--   - a rejection by a required approver, or in a sequential rule, rejects
+--   - approved once all required approvers approved and the approved
+--     share reaches approval_percentage
+--   - rejected once that share can no longer be reached
+--   - sequential rules promote the next 'waiting' step
+-- Open approvals of finished expenses are closed as 'skipped', which
+-- keeps the record of who was asked
+-- Called from POST /api/approvals/bulk via supabase.rpc()
+-- =====================================================
+CREATE OR REPLACE FUNCTION decide_approvals(
+    p_approver_id UUID,
+    p_company_id UUID,
+    p_approval_ids UUID[],
+    p_decision TEXT,
+    p_comments TEXT DEFAULT NULL
+)
+RETURNS JSON AS $$
+DECLARE
+    v_decided UUID[];
+    v_expense_ids UUID[];
+    v_result JSON;
+BEGIN
+    IF p_decision NOT IN ('approved', 'rejected') THEN
+        RAISE EXCEPTION 'Decision must be approved or rejected'
+            USING ERRCODE = 'check_violation';
+    END IF;
+
+    -- Lock the affected expenses so concurrent decisions evaluate in turn
+    PERFORM 1
+    FROM expenses e
+    JOIN approvals a ON a.expense_id = e.id
+    WHERE a.id = ANY(p_approval_ids)
+    ORDER BY e.id
+    FOR UPDATE OF e;
+
+    -- 1. Record the decisions (only the approver's own pending approvals
+    --    on submitted expenses of their company)
+    WITH decided AS (
+        UPDATE approvals a
+        SET status = p_decision,
+            comments = p_comments,
+            responded_at = NOW()
+        FROM expenses e
+        WHERE a.id = ANY(p_approval_ids)
+          AND a.approver_id = p_approver_id
+          AND a.status = 'pending'
+          AND e.id = a.expense_id
+          AND e.company_id = p_company_id
+          AND e.status = 'submitted'
+        RETURNING a.id, a.expense_id
+    )
+    SELECT COALESCE(array_agg(id), '{}'), COALESCE(array_agg(DISTINCT expense_id), '{}')
+    INTO v_decided, v_expense_ids
+    FROM decided;
+
+    -- 2. Evaluate every affected expense in one pass
+    WITH counts AS (
+        SELECT
+            a.expense_id,
+            COUNT(*) AS total,
+            COUNT(*) FILTER (WHERE a.status = 'approved') AS approved,
+            COUNT(*) FILTER (WHERE a.status IN ('pending', 'waiting')) AS open,
+            COALESCE(BOOL_OR(a.status = 'rejected' AND a.is_required), FALSE) AS required_rejected,
+            COALESCE(BOOL_OR(a.status = 'rejected'), FALSE) AS any_rejected,
+            COALESCE(BOOL_AND(a.status = 'approved' OR NOT a.is_required), TRUE) AS required_done,
+            COALESCE(BOOL_OR(a.status = 'pending'), FALSE) AS has_pending,
+            COALESCE(MAX(r.approval_percentage), 100) AS percentage,
+            COALESCE(BOOL_OR(r.is_sequential), FALSE) AS sequential,
+            -- Without a rule (manager or admin fallback) the first decision wins
+            BOOL_AND(a.approval_rule_id IS NULL) AS fallback
+        FROM approvals a
+        LEFT JOIN approval_rules r ON r.id = a.approval_rule_id
+        WHERE a.expense_id = ANY(v_expense_ids)
+        GROUP BY a.expense_id
+    ),
+    outcome AS (
+        SELECT
+            expense_id,
+            sequential,
+            has_pending,
+            CASE
+                WHEN fallback AND approved > 0 THEN 'approved'
+                WHEN fallback AND any_rejected THEN 'rejected'
+                WHEN required_rejected OR (sequential AND any_rejected) THEN 'rejected'
+                WHEN required_done AND approved * 100 >= percentage * total THEN 'approved'
+                WHEN (approved + open) * 100 < percentage * total THEN 'rejected'
+            END AS status
+        FROM counts
+    ),
+    finished AS (
+        UPDATE expenses e
+        SET status = o.status
+        FROM outcome o
+        WHERE e.id = o.expense_id
+          AND o.status IS NOT NULL
+        RETURNING e.id, e.user_id, e.status
+    ),
+    closed AS (
+        UPDATE approvals a
+        SET status = 'skipped'
+        FROM outcome o
+        WHERE a.expense_id = o.expense_id
+          AND o.status IS NOT NULL
+          AND a.status IN ('pending', 'waiting')
+        RETURNING a.id
+    ),
+    next_step AS (
+        SELECT a.expense_id, MIN(a.sequence_order) AS step
+        FROM approvals a
+        JOIN outcome o ON o.expense_id = a.expense_id
+        WHERE o.status IS NULL
+          AND o.sequential
+          AND NOT o.has_pending
+          AND a.status = 'waiting'
+        GROUP BY a.expense_id
+    ),
+    promoted AS (
+        UPDATE approvals a
+        SET status = 'pending'
+        FROM next_step n
+        WHERE a.expense_id = n.expense_id
+          AND a.sequence_order = n.step
+          AND a.status = 'waiting'
+        RETURNING a.id, a.expense_id, a.approver_id
+    )
+    SELECT json_build_object(
+        'decided', to_json(v_decided),
+        'expenses', (SELECT COALESCE(json_agg(finished), '[]'::json) FROM finished),
+        'promoted', (SELECT COALESCE(json_agg(promoted), '[]'::json) FROM promoted),
+        'closed_count', (SELECT COUNT(*) FROM closed)
+    )
+    INTO v_result;
+
+    RETURN v_result;
+END;
+$$ LANGUAGE plpgsql;
+
+-- =====================================================
+-- FUNCTION: save_approval_rule
+-- Creates (p_rule_id NULL) or updates an approval rule and, when
+-- p_approvers is given, replaces its approvers in the same transaction
+-- Fields missing from p_rule keep their current (or default) values
+-- Returns NULL when p_rule_id is not a rule of p_company_id
+-- Called from POST/PUT /api/approval-rules via supabase.rpc()
+-- =====================================================
+CREATE OR REPLACE FUNCTION save_approval_rule(
+    p_company_id UUID,
+    p_rule_id UUID,
+    p_rule JSONB,
+    p_approvers JSONB DEFAULT NULL
+)
+RETURNS JSON AS $$
+DECLARE
+    v_rule approval_rules;
+BEGIN
+    IF p_rule_id IS NULL THEN
+        INSERT INTO approval_rules (company_id, name)
+        VALUES (p_company_id, p_rule->>'name')
+        RETURNING * INTO v_rule;
+    ELSE
+        SELECT * INTO v_rule
+        FROM approval_rules
+        WHERE id = p_rule_id AND company_id = p_company_id
+        FOR UPDATE;
+
+        IF NOT FOUND THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    v_rule := jsonb_populate_record(v_rule, p_rule);
+
+    UPDATE approval_rules
+    SET name = v_rule.name,
+        description = v_rule.description,
+        category_id = v_rule.category_id,
+        min_amount = v_rule.min_amount,
+        max_amount = v_rule.max_amount,
+        is_sequential = v_rule.is_sequential,
+        approval_percentage = v_rule.approval_percentage,
+        is_active = v_rule.is_active
+    WHERE id = v_rule.id
+    RETURNING * INTO v_rule;
+
+    IF p_approvers IS NOT NULL THEN
+        DELETE FROM approval_rule_approvers WHERE approval_rule_id = v_rule.id;
+
+        INSERT INTO approval_rule_approvers (approval_rule_id, approver_id, sequence_order, is_required)
+        SELECT v_rule.id, a.approver_id, a.sequence_order, a.is_required
+        FROM jsonb_to_recordset(p_approvers) AS a(approver_id UUID, sequence_order INTEGER, is_required BOOLEAN);
+    END IF;
+
+    RETURN to_json(v_rule);
+END;
+$$ LANGUAGE plpgsql;
+
 -- =====================================================
 -- ROW LEVEL SECURITY (RLS) POLICIES
 -- Enable RLS for all tables
@@ -183,6 +753,7 @@ ALTER TABLE expenses ENABLE ROW LEVEL SECURITY;
 ALTER TABLE approval_rules ENABLE ROW LEVEL SECURITY;
 ALTER TABLE approval_rule_approvers ENABLE ROW LEVEL SECURITY;
 ALTER TABLE approvals ENABLE ROW LEVEL SECURITY;
+ALTER TABLE notifications ENABLE ROW LEVEL SECURITY;
 
 -- Companies: Users can only see their own company
 CREATE POLICY "Users can view their own company"
@@ -220,6 +791,11 @@ CREATE POLICY "Users can view relevant approvals"
         expense_id IN (SELECT id FROM expenses WHERE user_id = auth.uid())
     );
 
+-- Notifications: Users can only see their own notifications
+CREATE POLICY "Users can view their own notifications"
+    ON notifications FOR SELECT
+    USING (user_id = auth.uid());
+
 -- =====================================================
 -- SAMPLE DATA (Optional - for testing)
 -- =====================================================
@@ -0,0 +1,80 @@
+-- =====================================================
+-- MIGRATION: Approval workflow engine
+-- Date: October 19, 2026
+-- Adds the step/required flags the engine copies from
+-- approval_rule_approvers, a 'waiting' status for later steps of
+-- sequential rules, and save_approval_rule() to save a rule and its
+-- approvers atomically
+-- =====================================================
+
+ALTER TABLE approvals
+ADD COLUMN IF NOT EXISTS sequence_order INTEGER DEFAULT 1;
+
+ALTER TABLE approvals
+ADD COLUMN IF NOT EXISTS is_required BOOLEAN DEFAULT FALSE;
+
+ALTER TABLE approvals DROP CONSTRAINT IF EXISTS approvals_status_check;
+ALTER TABLE approvals
+ADD CONSTRAINT approvals_status_check
+CHECK (status IN ('waiting', 'pending', 'approved', 'rejected'));
+
+COMMENT ON COLUMN approvals.status IS 'waiting (later step of a sequential rule), pending, approved, rejected';
+
+-- =====================================================
+-- FUNCTION: save_approval_rule
+-- Creates (p_rule_id NULL) or updates an approval rule and, when
+-- p_approvers is given, replaces its approvers in the same transaction
+-- Fields missing from p_rule keep their current (or default) values
+-- Returns NULL when p_rule_id is not a rule of p_company_id
+-- Called from POST/PUT /api/approval-rules via supabase.rpc()
+-- =====================================================
+CREATE OR REPLACE FUNCTION save_approval_rule(
+    p_company_id UUID,
+    p_rule_id UUID,
+    p_rule JSONB,
+    p_approvers JSONB DEFAULT NULL
+)
+RETURNS JSON AS $$
+DECLARE
+    v_rule approval_rules;
+BEGIN
+    IF p_rule_id IS NULL THEN
+        INSERT INTO approval_rules (company_id, name)
+        VALUES (p_company_id, p_rule->>'name')
+        RETURNING * INTO v_rule;
+    ELSE
+        SELECT * INTO v_rule
+        FROM approval_rules
+        WHERE id = p_rule_id AND company_id = p_company_id
+        FOR UPDATE;
+
+        IF NOT FOUND THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    v_rule := jsonb_populate_record(v_rule, p_rule);
+
+    UPDATE approval_rules
+    SET name = v_rule.name,
+        description = v_rule.description,
+        category_id = v_rule.category_id,
+        min_amount = v_rule.min_amount,
+        max_amount = v_rule.max_amount,
+        is_sequential = v_rule.is_sequential,
+        approval_percentage = v_rule.approval_percentage,
+        is_active = v_rule.is_active
+    WHERE id = v_rule.id
+    RETURNING * INTO v_rule;
+
+    IF p_approvers IS NOT NULL THEN
+        DELETE FROM approval_rule_approvers WHERE approval_rule_id = v_rule.id;
+
+        INSERT INTO approval_rule_approvers (approval_rule_id, approver_id, sequence_order, is_required)
+        SELECT v_rule.id, a.approver_id, a.sequence_order, a.is_required
+        FROM jsonb_to_recordset(p_approvers) AS a(approver_id UUID, sequence_order INTEGER, is_required BOOLEAN);
+    END IF;
+
+    RETURN to_json(v_rule);
+END;
+$$ LANGUAGE plpgsql;
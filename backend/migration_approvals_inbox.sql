@@ -0,0 +1,9 @@
+-- =====================================================
+-- MIGRATION: Approver inbox index
+-- Date: October 19, 2026
+-- Serves GET /api/approvals/inbox ("my pending approvals", newest
+-- first, keyset paginated) from a single index range scan
+-- =====================================================
+
+CREATE INDEX IF NOT EXISTS idx_approvals_inbox
+ON approvals(approver_id, status, created_at DESC, id DESC);
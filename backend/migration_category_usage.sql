@@ -0,0 +1,74 @@
+-- =====================================================
+-- MIGRATION: Category usage counters
+-- Date: October 19, 2026
+-- Adds category_usage (maintained by a trigger on expenses) so
+-- category stats and the delete check are O(1) lookups
+-- =====================================================
+
+-- =====================================================
+-- TABLE: category_usage
+-- Precomputed expense count and amount per category and currency
+-- Maintained by a trigger on expenses; read by
+-- GET /api/categories/stats and delete_category
+-- =====================================================
+CREATE TABLE IF NOT EXISTS category_usage (
+    category_id UUID NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+    company_id UUID NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+    currency VARCHAR(10) NOT NULL,
+    expense_count INTEGER NOT NULL DEFAULT 0,
+    total_amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (category_id, currency)
+);
+
+CREATE INDEX IF NOT EXISTS idx_category_usage_company ON category_usage(company_id);
+
+CREATE OR REPLACE FUNCTION category_usage_apply(
+    p_category_id UUID,
+    p_company_id UUID,
+    p_currency VARCHAR,
+    p_count INTEGER,
+    p_amount DECIMAL
+)
+RETURNS VOID AS $$
+BEGIN
+    IF p_category_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO category_usage (category_id, company_id, currency, expense_count, total_amount)
+    VALUES (p_category_id, p_company_id, COALESCE(p_currency, 'USD'), p_count, p_amount)
+    ON CONFLICT (category_id, currency) DO UPDATE
+    SET expense_count = category_usage.expense_count + EXCLUDED.expense_count,
+        total_amount = category_usage.total_amount + EXCLUDED.total_amount;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION category_usage_on_expense_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM category_usage_apply(OLD.category_id, OLD.company_id, OLD.currency, -1, -OLD.amount);
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM category_usage_apply(NEW.category_id, NEW.company_id, NEW.currency, 1, NEW.amount);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS expenses_category_usage ON expenses;
+CREATE TRIGGER expenses_category_usage
+    AFTER INSERT OR DELETE OR UPDATE OF category_id, currency, amount ON expenses
+    FOR EACH ROW EXECUTE FUNCTION category_usage_on_expense_change();
+
+-- Backfill counters from existing expenses
+INSERT INTO category_usage (category_id, company_id, currency, expense_count, total_amount)
+SELECT category_id, company_id, COALESCE(currency, 'USD'), COUNT(*), SUM(amount)
+FROM expenses
+WHERE category_id IS NOT NULL
+GROUP BY category_id, company_id, COALESCE(currency, 'USD')
+ON CONFLICT (category_id, currency) DO UPDATE
+SET expense_count = EXCLUDED.expense_count,
+    total_amount = EXCLUDED.total_amount;
@@ -0,0 +1,155 @@
+-- =====================================================
+-- MIGRATION: Bulk approval decisions
+-- Date: October 19, 2026
+-- Installs decide_approvals(), used by POST /api/approvals/bulk
+-- and the single approve/reject endpoints
+-- =====================================================
+
+-- Approvals still open when their expense is decided are kept as 'skipped'
+ALTER TABLE approvals DROP CONSTRAINT IF EXISTS approvals_status_check;
+ALTER TABLE approvals
+ADD CONSTRAINT approvals_status_check
+CHECK (status IN ('waiting', 'pending', 'approved', 'rejected', 'skipped'));
+
+-- =====================================================
+-- FUNCTION: decide_approvals
+-- Applies one approver's approve/reject decision to many approvals
+-- in a single transaction, then re-evaluates every affected expense
+-- in one set-based pass:
+--   - without a rule (manager or admin fallback) the first decision wins
+--   - a rejection by a required approver, or in a sequential rule, rejects
+--   - approved once all required approvers approved and the approved
+--     share reaches approval_percentage
+--   - rejected once that share can no longer be reached
+--   - sequential rules promote the next 'waiting' step
+-- Open approvals of finished expenses are closed as 'skipped', which
+-- keeps the record of who was asked
+-- Called from POST /api/approvals/bulk via supabase.rpc()
+-- =====================================================
+CREATE OR REPLACE FUNCTION decide_approvals(
+    p_approver_id UUID,
+    p_company_id UUID,
+    p_approval_ids UUID[],
+    p_decision TEXT,
+    p_comments TEXT DEFAULT NULL
+)
+RETURNS JSON AS $$
+DECLARE
+    v_decided UUID[];
+    v_expense_ids UUID[];
+    v_result JSON;
+BEGIN
+    IF p_decision NOT IN ('approved', 'rejected') THEN
+        RAISE EXCEPTION 'Decision must be approved or rejected'
+            USING ERRCODE = 'check_violation';
+    END IF;
+
+    -- Lock the affected expenses so concurrent decisions evaluate in turn
+    PERFORM 1
+    FROM expenses e
+    JOIN approvals a ON a.expense_id = e.id
+    WHERE a.id = ANY(p_approval_ids)
+    ORDER BY e.id
+    FOR UPDATE OF e;
+
+    -- 1. Record the decisions (only the approver's own pending approvals
+    --    on submitted expenses of their company)
+    WITH decided AS (
+        UPDATE approvals a
+        SET status = p_decision,
+            comments = p_comments,
+            responded_at = NOW()
+        FROM expenses e
+        WHERE a.id = ANY(p_approval_ids)
+          AND a.approver_id = p_approver_id
+          AND a.status = 'pending'
+          AND e.id = a.expense_id
+          AND e.company_id = p_company_id
+          AND e.status = 'submitted'
+        RETURNING a.id, a.expense_id
+    )
+    SELECT COALESCE(array_agg(id), '{}'), COALESCE(array_agg(DISTINCT expense_id), '{}')
+    INTO v_decided, v_expense_ids
+    FROM decided;
+
+    -- 2. Evaluate every affected expense in one pass
+    WITH counts AS (
+        SELECT
+            a.expense_id,
+            COUNT(*) AS total,
+            COUNT(*) FILTER (WHERE a.status = 'approved') AS approved,
+            COUNT(*) FILTER (WHERE a.status IN ('pending', 'waiting')) AS open,
+            COALESCE(BOOL_OR(a.status = 'rejected' AND a.is_required), FALSE) AS required_rejected,
+            COALESCE(BOOL_OR(a.status = 'rejected'), FALSE) AS any_rejected,
+            COALESCE(BOOL_AND(a.status = 'approved' OR NOT a.is_required), TRUE) AS required_done,
+            COALESCE(BOOL_OR(a.status = 'pending'), FALSE) AS has_pending,
+            COALESCE(MAX(r.approval_percentage), 100) AS percentage,
+            COALESCE(BOOL_OR(r.is_sequential), FALSE) AS sequential,
+            -- Without a rule (manager or admin fallback) the first decision wins
+            BOOL_AND(a.approval_rule_id IS NULL) AS fallback
+        FROM approvals a
+        LEFT JOIN approval_rules r ON r.id = a.approval_rule_id
+        WHERE a.expense_id = ANY(v_expense_ids)
+        GROUP BY a.expense_id
+    ),
+    outcome AS (
+        SELECT
+            expense_id,
+            sequential,
+            has_pending,
+            CASE
+                WHEN fallback AND approved > 0 THEN 'approved'
+                WHEN fallback AND any_rejected THEN 'rejected'
+                WHEN required_rejected OR (sequential AND any_rejected) THEN 'rejected'
+                WHEN required_done AND approved * 100 >= percentage * total THEN 'approved'
+                WHEN (approved + open) * 100 < percentage * total THEN 'rejected'
+            END AS status
+        FROM counts
+    ),
+    finished AS (
+        UPDATE expenses e
+        SET status = o.status
+        FROM outcome o
+        WHERE e.id = o.expense_id
+          AND o.status IS NOT NULL
+        RETURNING e.id, e.user_id, e.status
+    ),
+    closed AS (
+        UPDATE approvals a
+        SET status = 'skipped'
+        FROM outcome o
+        WHERE a.expense_id = o.expense_id
+          AND o.status IS NOT NULL
+          AND a.status IN ('pending', 'waiting')
+        RETURNING a.id
+    ),
+    next_step AS (
+        SELECT a.expense_id, MIN(a.sequence_order) AS step
+        FROM approvals a
+        JOIN outcome o ON o.expense_id = a.expense_id
+        WHERE o.status IS NULL
+          AND o.sequential
+          AND NOT o.has_pending
+          AND a.status = 'waiting'
+        GROUP BY a.expense_id
+    ),
+    promoted AS (
+        UPDATE approvals a
+        SET status = 'pending'
+        FROM next_step n
+        WHERE a.expense_id = n.expense_id
+          AND a.sequence_order = n.step
+          AND a.status = 'waiting'
+        RETURNING a.id, a.expense_id, a.approver_id
+    )
+    SELECT json_build_object(
+        'decided', to_json(v_decided),
+        'expenses', (SELECT COALESCE(json_agg(finished), '[]'::json) FROM finished),
+        'promoted', (SELECT COALESCE(json_agg(promoted), '[]'::json) FROM promoted),
+        'closed_count', (SELECT COUNT(*) FROM closed)
+    )
+    INTO v_result;
+
+    RETURN v_result;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,36 @@
+-- =====================================================
+-- MIGRATION: Expense reports
+-- Date: October 19, 2026
+-- Adds expense_reports: PDF reports rendered by the render_report job
+-- =====================================================
+
+-- =====================================================
+-- TABLE: expense_reports
+-- PDF expense reports rendered in the background (see utils/reports.py)
+-- One row and one stored PDF per user and content version; rendering a
+-- report deletes the same user's older reports with the same title and
+-- reports older than REPORT_RETENTION_DAYS
+-- Status: pending, ready, failed
+-- =====================================================
+CREATE TABLE IF NOT EXISTS expense_reports (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    company_id UUID NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+    requested_by UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    version CHAR(64) NOT NULL,
+    title VARCHAR(200) NOT NULL,
+    company_currency VARCHAR(10) NOT NULL,
+    filters JSONB NOT NULL DEFAULT '{}',
+    expense_ids UUID[] NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'ready', 'failed')),
+    path TEXT,
+    size BIGINT,
+    total NUMERIC(12, 2),
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE(company_id, requested_by, version)
+);
+
+DROP TRIGGER IF EXISTS update_expense_reports_updated_at ON expense_reports;
+CREATE TRIGGER update_expense_reports_updated_at BEFORE UPDATE ON expense_reports
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
@@ -0,0 +1,81 @@
+-- =====================================================
+-- MIGRATION: Background job queue
+-- Date: October 19, 2026
+-- Adds the jobs table, claim_jobs() (FOR UPDATE SKIP LOCKED)
+-- and job_queue_stats() used by utils/jobs.py
+-- =====================================================
+
+-- =====================================================
+-- TABLE: jobs
+-- Durable background job queue (see utils/jobs.py)
+-- Status: queued, running, failed (finished jobs are deleted)
+-- =====================================================
+CREATE TABLE IF NOT EXISTS jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    job_type VARCHAR(100) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}',
+    status VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    locked_by TEXT,
+    locked_at TIMESTAMP WITH TIME ZONE,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(run_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_running ON jobs(locked_at) WHERE status = 'running';
+
+-- Claims up to p_limit runnable jobs (or jobs whose worker died) for one worker
+CREATE OR REPLACE FUNCTION claim_jobs(
+    p_worker TEXT,
+    p_limit INTEGER DEFAULT 1,
+    p_lock_timeout_seconds INTEGER DEFAULT 300
+)
+RETURNS SETOF jobs AS $$
+    UPDATE jobs
+    SET status = 'running',
+        locked_by = p_worker,
+        locked_at = NOW(),
+        attempts = attempts + 1,
+        updated_at = NOW()
+    WHERE id IN (
+        SELECT id FROM jobs
+        WHERE (status = 'queued' AND run_at <= NOW())
+           OR (status = 'running' AND locked_at < NOW() - make_interval(secs => p_lock_timeout_seconds))
+        ORDER BY run_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *;
+$$ LANGUAGE sql;
+
+-- Queue depth for monitoring (GET /api/jobs/stats)
+CREATE OR REPLACE FUNCTION job_queue_stats()
+RETURNS JSON AS $$
+    SELECT json_build_object(
+        'queued', COUNT(*) FILTER (WHERE status = 'queued'),
+        'running', COUNT(*) FILTER (WHERE status = 'running'),
+        'failed', COUNT(*) FILTER (WHERE status = 'failed'),
+        'oldest_queued_at', MIN(run_at) FILTER (WHERE status = 'queued'),
+        'by_type', COALESCE((
+            SELECT json_object_agg(job_type, counts)
+            FROM (
+                SELECT job_type, json_build_object(
+                    'queued', COUNT(*) FILTER (WHERE status = 'queued'),
+                    'running', COUNT(*) FILTER (WHERE status = 'running'),
+                    'failed', COUNT(*) FILTER (WHERE status = 'failed')
+                ) AS counts
+                FROM jobs
+                GROUP BY job_type
+            ) t
+        ), '{}'::json)
+    )
+    FROM jobs;
+$$ LANGUAGE sql STABLE;
+
+DROP TRIGGER IF EXISTS update_jobs_updated_at ON jobs;
+CREATE TRIGGER update_jobs_updated_at BEFORE UPDATE ON jobs
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
@@ -0,0 +1,31 @@
+-- =====================================================
+-- MIGRATION: Notifications
+-- Date: October 19, 2026
+-- Adds the notifications table used for in-app notifications
+-- (email digests are sent by utils/notifications.py)
+-- =====================================================
+
+-- =====================================================
+-- TABLE: notifications
+-- In-app notifications (written in batches by utils/notifications.py)
+-- Types: approval_requested, expense_approved, expense_rejected
+-- =====================================================
+CREATE TABLE IF NOT EXISTS notifications (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    expense_id UUID REFERENCES expenses(id) ON DELETE CASCADE,
+    type VARCHAR(50) NOT NULL CHECK (type IN ('approval_requested', 'expense_approved', 'expense_rejected')),
+    read_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Newest-first listing per user (keyset pagination) and unread counts
+CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications(user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_notifications_unread ON notifications(user_id) WHERE read_at IS NULL;
+
+ALTER TABLE notifications ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own notifications" ON notifications;
+CREATE POLICY "Users can view their own notifications"
+    ON notifications FOR SELECT
+    USING (user_id = auth.uid());
@@ -0,0 +1,14 @@
+-- =====================================================
+-- MIGRATION: Content-addressed receipt deduplication
+-- Date: October 19, 2026
+-- Receipts uploaded through /api/upload are stored under
+-- receipts/{company_id}/sha256/{hash}.{ext}; content_hash indexes them so
+-- repeat uploads reuse the stored object and duplicate expenses are flagged
+-- =====================================================
+
+ALTER TABLE receipts ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+
+CREATE INDEX IF NOT EXISTS idx_receipts_content_hash ON receipts(company_id, content_hash) WHERE content_hash IS NOT NULL;
+
+-- Maps an optimized receipt URL back to its receipt (duplicate detection)
+CREATE INDEX IF NOT EXISTS idx_receipts_optimized_url ON receipts(optimized_url) WHERE optimized_url IS NOT NULL;
@@ -0,0 +1,23 @@
+-- =====================================================
+-- MIGRATION: Receipt OCR
+-- Date: October 19, 2026
+-- Adds receipt_extractions: OCR suggestions cached by receipt content hash
+-- =====================================================
+
+-- =====================================================
+-- TABLE: receipt_extractions
+-- OCR results, one per company and receipt content (SHA-256), so a
+-- duplicate receipt is never read twice (see utils/ocr.py)
+-- Status: done, failed
+-- =====================================================
+CREATE TABLE IF NOT EXISTS receipt_extractions (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    company_id UUID NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+    content_hash CHAR(64) NOT NULL,
+    status VARCHAR(20) NOT NULL CHECK (status IN ('done', 'failed')),
+    text TEXT,
+    suggestions JSONB,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE(company_id, content_hash)
+);
@@ -0,0 +1,49 @@
+-- =====================================================
+-- MIGRATION: Receipt optimization
+-- Date: October 19, 2026
+-- Adds the receipts table (optimized copies and thumbnails produced
+-- in the background) and expenses.receipt_thumbnail_url
+-- =====================================================
+
+-- =====================================================
+-- TABLE: receipts
+-- One row per uploaded receipt object, with the optimized copy and
+-- thumbnail produced in the background (see utils/receipts.py)
+-- Status: pending, optimized, skipped (not an image), failed
+-- =====================================================
+CREATE TABLE IF NOT EXISTS receipts (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    company_id UUID NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+    uploaded_by UUID REFERENCES users(id) ON DELETE SET NULL,
+    path TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    content_type VARCHAR(100),
+    size BIGINT,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'optimized', 'skipped', 'failed')),
+    optimized_path TEXT,
+    optimized_url TEXT,
+    optimized_size BIGINT,
+    thumbnail_path TEXT,
+    thumbnail_url TEXT,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Maps an uploaded receipt URL to its optimized copy (create/update expense)
+CREATE INDEX IF NOT EXISTS idx_receipts_url ON receipts(url);
+
+DROP TRIGGER IF EXISTS update_receipts_updated_at ON receipts;
+CREATE TRIGGER update_receipts_updated_at BEFORE UPDATE ON receipts
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+ALTER TABLE expenses ADD COLUMN IF NOT EXISTS receipt_thumbnail_url TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_expenses_receipt_url ON expenses(receipt_url) WHERE receipt_url IS NOT NULL;
+
+-- team_expenses selects e.*, so it has to be rebuilt to pick up the new column
+DROP VIEW IF EXISTS team_expenses;
+CREATE VIEW team_expenses AS
+SELECT e.*, h.ancestor_id
+FROM expenses e
+JOIN user_hierarchy h ON h.descendant_id = e.user_id;
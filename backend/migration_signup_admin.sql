@@ -0,0 +1,45 @@
+-- =====================================================
+-- MIGRATION: Transactional admin signup
+-- Date: October 19, 2026
+-- Replaces the four sequential signup round trips
+-- (check email, insert company, insert user, set created_by)
+-- with a single atomic database call
+-- =====================================================
+
+-- =====================================================
+-- FUNCTION: signup_admin
+-- Creates a company and its admin user in one transaction
+-- Called from POST /api/auth/signup via supabase.rpc()
+-- =====================================================
+CREATE OR REPLACE FUNCTION signup_admin(
+    p_email TEXT,
+    p_password_hash TEXT,
+    p_name TEXT,
+    p_company_name TEXT,
+    p_currency TEXT DEFAULT 'USD'
+)
+RETURNS JSON AS $$
+DECLARE
+    v_company companies;
+    v_user users;
+BEGIN
+    -- Duplicate emails are rejected by UNIQUE(email) with a unique_violation,
+    -- which rolls back the company insert as well
+    INSERT INTO companies (name, currency)
+    VALUES (p_company_name, p_currency)
+    RETURNING * INTO v_company;
+
+    INSERT INTO users (email, password_hash, name, role, company_id, is_active)
+    VALUES (p_email, p_password_hash, p_name, 'admin', v_company.id, TRUE)
+    RETURNING * INTO v_user;
+
+    UPDATE companies SET created_by = v_user.id
+    WHERE id = v_company.id
+    RETURNING * INTO v_company;
+
+    RETURN json_build_object(
+        'user', to_jsonb(v_user) - 'password_hash',
+        'company', to_jsonb(v_company)
+    );
+END;
+$$ LANGUAGE plpgsql;
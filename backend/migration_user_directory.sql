@@ -0,0 +1,14 @@
+-- =====================================================
+-- MIGRATION: User directory search and pagination indexes
+-- Date: October 19, 2026
+-- Backs GET /api/users?q= prefix search and cursor pagination
+-- =====================================================
+
+-- Trigram indexes serve ILIKE 'prefix%' lookups on name and email
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_users_name_trgm ON users USING GIN (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_email_trgm ON users USING GIN (email gin_trgm_ops);
+
+-- Keyset pagination: company filter + (created_at, id) ordering
+CREATE INDEX IF NOT EXISTS idx_users_company_created ON users(company_id, created_at DESC, id DESC);
@@ -0,0 +1,105 @@
+-- =====================================================
+-- MIGRATION: Org hierarchy closure table
+-- Date: October 19, 2026
+-- Adds user_hierarchy (maintained by triggers on users) and the
+-- team_expenses view used to scope managers to their reports
+-- =====================================================
+
+-- =====================================================
+-- TABLE: user_hierarchy
+-- Closure table of the users.manager_id tree
+-- One row per (ancestor, descendant) pair, including self (depth 0)
+-- Maintained by triggers on users, so every write path keeps it current
+-- =====================================================
+CREATE TABLE IF NOT EXISTS user_hierarchy (
+    ancestor_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    descendant_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    depth INTEGER NOT NULL,
+    PRIMARY KEY (ancestor_id, descendant_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_hierarchy_descendant ON user_hierarchy(descendant_id);
+
+CREATE OR REPLACE FUNCTION user_hierarchy_on_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO user_hierarchy (ancestor_id, descendant_id, depth)
+    VALUES (NEW.id, NEW.id, 0);
+
+    IF NEW.manager_id IS NOT NULL THEN
+        INSERT INTO user_hierarchy (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, NEW.id, depth + 1
+        FROM user_hierarchy
+        WHERE descendant_id = NEW.manager_id;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION user_hierarchy_on_manager_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Refuse assignments that would make a user manage one of their own managers
+    IF NEW.manager_id IS NOT NULL AND EXISTS (
+        SELECT 1 FROM user_hierarchy
+        WHERE ancestor_id = NEW.id AND descendant_id = NEW.manager_id
+    ) THEN
+        RAISE EXCEPTION 'Manager assignment would create a reporting cycle'
+            USING ERRCODE = 'check_violation';
+    END IF;
+
+    -- Detach the subtree from its old ancestors
+    DELETE FROM user_hierarchy
+    WHERE descendant_id IN (SELECT descendant_id FROM user_hierarchy WHERE ancestor_id = NEW.id)
+      AND ancestor_id NOT IN (SELECT descendant_id FROM user_hierarchy WHERE ancestor_id = NEW.id);
+
+    -- Attach it under the new manager's ancestors
+    IF NEW.manager_id IS NOT NULL THEN
+        INSERT INTO user_hierarchy (ancestor_id, descendant_id, depth)
+        SELECT sup.ancestor_id, sub.descendant_id, sup.depth + sub.depth + 1
+        FROM user_hierarchy sup
+        CROSS JOIN user_hierarchy sub
+        WHERE sup.descendant_id = NEW.manager_id
+          AND sub.ancestor_id = NEW.id;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_hierarchy_insert ON users;
+CREATE TRIGGER users_hierarchy_insert AFTER INSERT ON users
+    FOR EACH ROW EXECUTE FUNCTION user_hierarchy_on_insert();
+
+DROP TRIGGER IF EXISTS users_hierarchy_manager_change ON users;
+CREATE TRIGGER users_hierarchy_manager_change AFTER UPDATE OF manager_id ON users
+    FOR EACH ROW
+    WHEN (OLD.manager_id IS DISTINCT FROM NEW.manager_id)
+    EXECUTE FUNCTION user_hierarchy_on_manager_change();
+
+-- =====================================================
+-- VIEW: team_expenses
+-- Expenses joined to every ancestor of their owner, so
+-- "all expenses in my subtree" is one indexed join:
+--   team_expenses?ancestor_id=eq.<manager_id>
+-- =====================================================
+CREATE OR REPLACE VIEW team_expenses AS
+SELECT e.*, h.ancestor_id
+FROM expenses e
+JOIN user_hierarchy h ON h.descendant_id = e.user_id;
+
+-- Backfill the closure table from the existing manager_id tree
+INSERT INTO user_hierarchy (ancestor_id, descendant_id, depth)
+WITH RECURSIVE tree AS (
+    SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth
+    FROM users
+    UNION ALL
+    SELECT tree.ancestor_id, u.id, tree.depth + 1
+    FROM tree
+    JOIN users u ON u.manager_id = tree.descendant_id
+)
+SELECT ancestor_id, descendant_id, MIN(depth)
+FROM tree
+GROUP BY ancestor_id, descendant_id
+ON CONFLICT (ancestor_id, descendant_id) DO NOTHING;
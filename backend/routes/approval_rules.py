@@ -0,0 +1,352 @@
+"""
+Approval Rule Routes
+Handles approval rule management (Admin only for create/update/delete)
+"""
+
+from flask import Blueprint, request, jsonify
+from config.database import get_supabase_client
+from utils.auth import token_required, admin_required, manager_or_admin_required
+from utils.approvals import invalidate_rule_index
+from routes.categories import get_company_category
+from decimal import Decimal, InvalidOperation
+
+approval_rules_bp = Blueprint('approval_rules', __name__)
+
+RULE_FIELDS = ['name', 'description', 'category_id', 'min_amount', 'max_amount', 'is_sequential', 'approval_percentage', 'is_active']
+
+
+def validate_rule_data(data, company_id, is_update=False):
+    """Validate approval rule data"""
+    errors = []
+    
+    if not is_update or 'name' in data:
+        if not str(data.get('name') or '').strip():
+            errors.append('name is required')
+    
+    if data.get('category_id') and not get_company_category(company_id, data['category_id']):
+        errors.append('category_id does not belong to your company')
+    
+    amounts = {}
+    for field in ['min_amount', 'max_amount']:
+        if data.get(field) is not None:
+            try:
+                amounts[field] = Decimal(str(data[field]))
+                if amounts[field] < 0:
+                    errors.append(f'{field} cannot be negative')
+            except InvalidOperation:
+                errors.append(f'{field} must be a number')
+    
+    if 'min_amount' in amounts and 'max_amount' in amounts and amounts['max_amount'] < amounts['min_amount']:
+        errors.append('max_amount must be greater than or equal to min_amount')
+    
+    if 'approval_percentage' in data:
+        try:
+            percentage = int(data['approval_percentage'])
+            if not 0 < percentage <= 100:
+                errors.append('approval_percentage must be between 1 and 100')
+        except (TypeError, ValueError):
+            errors.append('approval_percentage must be an integer')
+    
+    if not is_update or 'approvers' in data:
+        approvers = data.get('approvers')
+        if not isinstance(approvers, list) or not approvers:
+            errors.append('approvers must be a non-empty list')
+        elif not all(isinstance(a, dict) and a.get('approver_id') for a in approvers):
+            errors.append('each approver needs an approver_id')
+        elif len({str(a['approver_id']).lower() for a in approvers}) != len(approvers):
+            errors.append('each approver can only be listed once')
+        else:
+            for approver in approvers:
+                try:
+                    if approver.get('sequence_order') is not None and int(approver['sequence_order']) < 1:
+                        errors.append('sequence_order must be a positive integer')
+                        break
+                except (TypeError, ValueError):
+                    errors.append('sequence_order must be a positive integer')
+                    break
+    
+    return errors
+
+
+def check_rule_approvers(supabase, approvers, company_id):
+    """
+    Check that every approver is an active user of the company
+    Returns: error message, or empty string on success
+    """
+    approver_ids = [a['approver_id'] for a in approvers]
+    found = supabase.table('users').select('id').eq('company_id', company_id).eq(
+        'is_active', True
+    ).in_('id', approver_ids).execute()
+    
+    if len(found.data) != len(approver_ids):
+        return 'All approvers must be active users in your company'
+    
+    return ''
+
+
+def save_rule(supabase, company_id, rule_id, fields, approvers=None):
+    """
+    Create (rule_id None) or update a rule and replace its approvers
+    save_approval_rule does both in one transaction, so a failed approver
+    insert leaves neither an orphaned rule nor a rule without approvers.
+    Returns: approval_rules row, or None if the rule does not exist
+    """
+    response = supabase.rpc('save_approval_rule', {
+        'p_company_id': company_id,
+        'p_rule_id': rule_id,
+        'p_rule': fields,
+        'p_approvers': None if approvers is None else [{
+            'approver_id': approver['approver_id'],
+            'sequence_order': int(approver.get('sequence_order') or position),
+            'is_required': bool(approver.get('is_required', False))
+        } for position, approver in enumerate(approvers, start=1)]
+    }).execute()
+    
+    return response.data
+
+
+@approval_rules_bp.route('', methods=['GET'])
+@token_required
+@manager_or_admin_required
+def list_rules(current_user):
+    """
+    Get all approval rules for the company
+    
+    GET /api/approval-rules?is_active=true
+    
+    Response:
+    {
+        "success": true,
+        "data": [
+            {
+                "id": "uuid",
+                "name": "Travel over 1000",
+                "category_id": "uuid" | null,
+                "min_amount": 1000,
+                "max_amount": null,
+                "is_sequential": true,
+                "approval_percentage": 100,
+                "approvers": [{"approver_id": "uuid", "sequence_order": 1, "is_required": true}]
+            },
+            ...
+        ],
+        "count": 3
+    }
+    """
+    try:
+        supabase = get_supabase_client()
+        company_id = current_user['company_id']
+        
+        query = supabase.table('approval_rules').select(
+            '*, approvers:approval_rule_approvers(approver_id, sequence_order, is_required)'
+        ).eq('company_id', company_id)
+        
+        is_active = request.args.get('is_active')
+        if is_active is not None:
+            query = query.eq('is_active', is_active.lower() == 'true')
+        
+        response = query.order('name').execute()
+        
+        return jsonify({
+            'success': True,
+            'data': response.data,
+            'count': len(response.data)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to fetch approval rules: {str(e)}'
+        }), 500
+
+
+@approval_rules_bp.route('', methods=['POST'])
+@token_required
+@admin_required
+def create_rule(current_user):
+    """
+    Create new approval rule (Admin only)
+    
+    POST /api/approval-rules
+    Request Body:
+    {
+        "name": "Travel over 1000",
+        "description": "..." (optional),
+        "category_id": "uuid" (optional, null = all categories),
+        "min_amount": 1000 (optional, default 0),
+        "max_amount": null (optional, null = no upper bound),
+        "is_sequential": true (optional),
+        "approval_percentage": 100 (optional),
+        "approvers": [
+            {"approver_id": "uuid", "sequence_order": 1, "is_required": true}
+        ]
+    }
+    
+    Response:
+    {
+        "success": true,
+        "message": "Approval rule created successfully",
+        "data": { rule_data }
+    }
+    """
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({
+                'success': False,
+                'message': 'Request body is required'
+            }), 400
+        
+        company_id = current_user['company_id']
+        
+        errors = validate_rule_data(data, company_id)
+        if errors:
+            return jsonify({
+                'success': False,
+                'message': 'Validation failed',
+                'errors': errors
+            }), 400
+        
+        supabase = get_supabase_client()
+        
+        error = check_rule_approvers(supabase, data['approvers'], company_id)
+        if error:
+            return jsonify({
+                'success': False,
+                'message': error
+            }), 400
+        
+        new_rule = {field: data[field] for field in RULE_FIELDS if field in data}
+        new_rule['name'] = new_rule['name'].strip()
+        
+        rule = save_rule(supabase, company_id, None, new_rule, data['approvers'])
+        
+        invalidate_rule_index(company_id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Approval rule created successfully',
+            'data': rule
+        }), 201
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to create approval rule: {str(e)}'
+        }), 500
+
+
+@approval_rules_bp.route('/<rule_id>', methods=['PUT'])
+@token_required
+@admin_required
+def update_rule(current_user, rule_id):
+    """
+    Update approval rule (Admin only)
+    Passing "approvers" replaces the whole approver list
+    
+    PUT /api/approval-rules/:id
+    
+    Response:
+    {
+        "success": true,
+        "message": "Approval rule updated successfully",
+        "data": { rule_data }
+    }
+    """
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({
+                'success': False,
+                'message': 'Request body is required'
+            }), 400
+        
+        supabase = get_supabase_client()
+        company_id = current_user['company_id']
+        
+        existing = supabase.table('approval_rules').select('id').eq('id', rule_id).eq('company_id', company_id).execute()
+        
+        if not existing.data:
+            return jsonify({
+                'success': False,
+                'message': 'Approval rule not found'
+            }), 404
+        
+        errors = validate_rule_data(data, company_id, is_update=True)
+        if errors:
+            return jsonify({
+                'success': False,
+                'message': 'Validation failed',
+                'errors': errors
+            }), 400
+        
+        if 'approvers' in data:
+            error = check_rule_approvers(supabase, data['approvers'], company_id)
+            if error:
+                return jsonify({
+                    'success': False,
+                    'message': error
+                }), 400
+        
+        updates = {field: data[field] for field in RULE_FIELDS if field in data}
+        rule = save_rule(supabase, company_id, rule_id, updates, data.get('approvers'))
+        
+        invalidate_rule_index(company_id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Approval rule updated successfully',
+            'data': rule
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to update approval rule: {str(e)}'
+        }), 500
+
+
+@approval_rules_bp.route('/<rule_id>', methods=['DELETE'])
+@token_required
+@admin_required
+def delete_rule(current_user, rule_id):
+    """
+    Deactivate approval rule (Admin only)
+    Soft delete - in-flight approvals still evaluate against the rule
+    
+    DELETE /api/approval-rules/:id
+    
+    Response:
+    {
+        "success": true,
+        "message": "Approval rule deactivated successfully"
+    }
+    """
+    try:
+        supabase = get_supabase_client()
+        company_id = current_user['company_id']
+        
+        response = supabase.table('approval_rules').update({'is_active': False}).eq(
+            'id', rule_id
+        ).eq('company_id', company_id).execute()
+        
+        if not response.data:
+            return jsonify({
+                'success': False,
+                'message': 'Approval rule not found'
+            }), 404
+        
+        invalidate_rule_index(company_id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Approval rule deactivated successfully'
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to delete approval rule: {str(e)}'
+        }), 500
@@ -0,0 +1,297 @@
+"""
+Approval Routes
+Handles the approver inbox and approval decisions
+"""
+
+from flask import Blueprint, request, jsonify
+from config.database import get_supabase_client
+from utils.auth import token_required
+from utils.pagination import parse_limit, apply_cursor, paginate
+from utils.notifications import notify
+from utils.events import publish_event
+import uuid
+
+approvals_bp = Blueprint('approvals', __name__)
+
+# Expense summary embedded in inbox rows (one joined query, no per-row lookups)
+INBOX_FIELDS = (
+    'id, status, comments, sequence_order, is_required, created_at, responded_at, '
+    'expense:expenses(id, amount, currency, expense_date, description, receipt_url, status, paid_by, '
+    'category:categories(name), user:users(id, name, email))'
+)
+
+APPROVAL_STATUSES = ['waiting', 'pending', 'approved', 'rejected', 'skipped']
+
+# Request action -> approvals.status
+DECISIONS = {'approve': 'approved', 'reject': 'rejected'}
+MAX_BULK_DECISIONS = 500
+
+
+@approvals_bp.route('/inbox', methods=['GET'])
+@token_required
+def get_inbox(current_user):
+    """
+    Get the current user's approvals, newest first (cursor paginated)
+    
+    GET /api/approvals/inbox?status=pending&limit=50&cursor=...
+    
+    Query Parameters:
+    - status: pending (default), approved, rejected, waiting or skipped
+    - limit: Page size (default 50, max 200)
+    - cursor: next_cursor from the previous page
+    
+    Response:
+    {
+        "success": true,
+        "data": [
+            {
+                "id": "uuid",
+                "status": "pending",
+                "created_at": "...",
+                "expense": {
+                    "id": "uuid",
+                    "amount": "120.00",
+                    "currency": "USD",
+                    "category": {"name": "Travel"},
+                    "user": {"id": "uuid", "name": "John Doe", "email": "..."},
+                    ...
+                }
+            },
+            ...
+        ],
+        "count": 50,
+        "next_cursor": "..." | null
+    }
+    """
+    try:
+        supabase = get_supabase_client()
+        limit = parse_limit(request.args.get('limit'))
+        
+        status = request.args.get('status', 'pending')
+        if status not in APPROVAL_STATUSES:
+            return jsonify({
+                'success': False,
+                'message': f'Invalid status. Must be one of: {", ".join(APPROVAL_STATUSES)}'
+            }), 400
+        
+        # Served by idx_approvals_inbox (approver_id, status, created_at, id)
+        query = supabase.table('approvals').select(INBOX_FIELDS).eq(
+            'approver_id', current_user['user_id']
+        ).eq('status', status)
+        
+        try:
+            query = apply_cursor(query, request.args.get('cursor'), 'created_at')
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        response = query.limit(limit + 1).execute()
+        approvals, next_cursor = paginate(response.data, limit, 'created_at')
+        
+        return jsonify({
+            'success': True,
+            'data': approvals,
+            'count': len(approvals),
+            'next_cursor': next_cursor
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to fetch approvals: {str(e)}'
+        }), 500
+
+
+def decide(current_user, approval_ids, decision, comments):
+    """
+    Apply one decision to many approvals in a single transaction
+    (decide_approvals records the decisions, re-evaluates every affected
+    expense and promotes sequential steps in one database call)
+    Returns: decide_approvals result plus the ids that were skipped
+    """
+    supabase = get_supabase_client()
+    
+    response = supabase.rpc('decide_approvals', {
+        'p_approver_id': current_user['user_id'],
+        'p_company_id': current_user['company_id'],
+        'p_approval_ids': approval_ids,
+        'p_decision': decision,
+        'p_comments': comments
+    }).execute()
+    
+    result = response.data or {}
+    decided = set(result.get('decided') or [])
+    result['skipped'] = [approval_id for approval_id in approval_ids if approval_id not in decided]
+    
+    # Notifications are buffered into per-recipient digests; stream events
+    # are pushed to open pages right away
+    company_id = current_user['company_id']
+    
+    if result.get('decided'):
+        publish_event('approval.decided', company_id, {
+            'approval_ids': result['decided'],
+            'status': decision
+        }, [current_user['user_id']])
+    
+    for row in result.get('promoted') or []:
+        notify(row['approver_id'], 'approval_requested', row['expense_id'])
+        publish_event('approval.assigned', company_id, {'expense_id': row['expense_id']}, [row['approver_id']])
+    
+    for expense in result.get('expenses') or []:
+        if expense.get('status') in ('approved', 'rejected'):
+            notify(expense['user_id'], f"expense_{expense['status']}", expense['id'])
+        publish_event('expense.status', company_id, {
+            'id': expense['id'],
+            'status': expense['status']
+        }, [expense['user_id'], current_user['user_id']])
+    
+    return result
+
+
+def parse_decision_body(data):
+    """
+    Validate an approve/reject request body
+    Returns: (approval_ids, decision, comments, error_message)
+    """
+    if not isinstance(data, dict):
+        return None, None, None, 'Request body is required'
+    
+    action = data.get('action')
+    if action not in DECISIONS:
+        return None, None, None, 'action must be either "approve" or "reject"'
+    
+    approval_ids = data.get('approval_ids')
+    if not isinstance(approval_ids, list) or not approval_ids:
+        return None, None, None, 'approval_ids must be a non-empty list'
+    
+    if len(approval_ids) > MAX_BULK_DECISIONS:
+        return None, None, None, f'Too many approvals. Maximum per request: {MAX_BULK_DECISIONS}'
+    
+    try:
+        approval_ids = list(dict.fromkeys(str(uuid.UUID(str(i))) for i in approval_ids))
+    except ValueError:
+        return None, None, None, 'approval_ids must be valid ids'
+    
+    comments = data.get('comments')
+    if comments is not None:
+        comments = str(comments).strip() or None
+    
+    return approval_ids, DECISIONS[action], comments, ''
+
+
+def decide_one(current_user, approval_id, action):
+    """Shared handler for the single approve/reject endpoints"""
+    try:
+        data = request.get_json(silent=True) or {}
+        approval_ids, decision, comments, error = parse_decision_body({
+            'approval_ids': [approval_id],
+            'action': action,
+            'comments': data.get('comments')
+        })
+        if error:
+            return jsonify({
+                'success': False,
+                'message': error
+            }), 400
+        
+        result = decide(current_user, approval_ids, decision, comments)
+        
+        if not result.get('decided'):
+            return jsonify({
+                'success': False,
+                'message': 'Approval not found or not pending for you'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': f'Expense {result["expenses"][0]["status"]}' if result.get('expenses') else 'Decision recorded',
+            'data': result
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to record decision: {str(e)}'
+        }), 500
+
+
+@approvals_bp.route('/bulk', methods=['POST'])
+@token_required
+def bulk_decide(current_user):
+    """
+    Approve or reject many approvals at once
+    
+    POST /api/approvals/bulk
+    Request Body:
+    {
+        "approval_ids": ["uuid", "uuid", ...],
+        "action": "approve" | "reject",
+        "comments": "Looks good" (optional)
+    }
+    
+    Response:
+    {
+        "success": true,
+        "message": "2 approvals recorded",
+        "data": {
+            "decided": ["uuid", "uuid"],
+            "skipped": ["uuid"],
+            "expenses": [{"id": "uuid", "user_id": "uuid", "status": "approved"}],
+            "promoted": [{"id": "uuid", "expense_id": "uuid", "approver_id": "uuid"}],
+            "closed_count": 0
+        }
+    }
+    """
+    try:
+        approval_ids, decision, comments, error = parse_decision_body(request.get_json(silent=True))
+        if error:
+            return jsonify({
+                'success': False,
+                'message': error
+            }), 400
+        
+        result = decide(current_user, approval_ids, decision, comments)
+        
+        return jsonify({
+            'success': True,
+            'message': f'{len(result.get("decided") or [])} approvals recorded',
+            'data': result
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to record approvals: {str(e)}'
+        }), 500
+
+
+@approvals_bp.route('/<approval_id>/approve', methods=['POST'])
+@token_required
+def approve(current_user, approval_id):
+    """
+    Approve a single approval
+    
+    POST /api/approvals/:id/approve
+    Request Body:
+    {
+        "comments": "Looks good" (optional)
+    }
+    """
+    return decide_one(current_user, approval_id, 'approve')
+
+
+@approvals_bp.route('/<approval_id>/reject', methods=['POST'])
+@token_required
+def reject(current_user, approval_id):
+    """
+    Reject a single approval
+    
+    POST /api/approvals/:id/reject
+    Request Body:
+    {
+        "comments": "Missing receipt" (optional)
+    }
+    """
+    return decide_one(current_user, approval_id, 'reject')
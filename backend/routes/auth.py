@@ -4,8 +4,10 @@ Handles user signup, login, and authentication
 """
 
 from flask import Blueprint, request, jsonify
-from config.database import get_supabase_client
+from config.database import get_supabase_client, is_unique_violation
+from postgrest.exceptions import APIError
 from utils.auth import hash_password, verify_password, generate_token, token_required
+from utils.rate_limit import rate_limit, key_by_ip, key_by_email
 import re
 
 auth_bp = Blueprint('auth', __name__)
@@ -31,6 +33,7 @@ def validate_password(password: str) -> tuple[bool, str]:
     return True, ""
 
 @auth_bp.route('/signup', methods=['POST'])
+@rate_limit('signup', limit=5, window=3600, key_funcs=[key_by_ip, key_by_email])
 def signup():
     """
     Admin signup endpoint - Creates admin user and company
@@ -90,58 +93,37 @@ def signup():
         # Get Supabase client
         supabase = get_supabase_client()
         
-        # Check if user already exists
-        existing_user = supabase.table('users').select('id').eq('email', email).execute()
-        if existing_user.data:
-            return jsonify({
-                'success': False,
-                'message': 'User with this email already exists'
-            }), 409
-        
         # Hash password
         password_hash = hash_password(password)
         
-        # Create company first
-        company_data = {
-            'name': company_name,
-            'currency': currency
-        }
-        company_response = supabase.table('companies').insert(company_data).execute()
-        
-        if not company_response.data:
-            return jsonify({
-                'success': False,
-                'message': 'Failed to create company'
-            }), 500
-        
-        company = company_response.data[0]
-        company_id = company['id']
-        
-        # Update company with created_by (will be set after user creation)
-        # Create admin user
-        user_data = {
-            'email': email,
-            'password_hash': password_hash,
-            'name': name,
-            'role': 'admin',
-            'company_id': company_id,
-            'is_active': True
-        }
-        user_response = supabase.table('users').insert(user_data).execute()
-        
-        if not user_response.data:
-            # Rollback: Delete company if user creation fails
-            supabase.table('companies').delete().eq('id', company_id).execute()
+        # Create company + admin user atomically in one database call
+        # (signup_admin inserts both rows and links created_by; UNIQUE(email) rejects duplicates)
+        try:
+            signup_response = supabase.rpc('signup_admin', {
+                'p_email': email,
+                'p_password_hash': password_hash,
+                'p_name': name,
+                'p_company_name': company_name,
+                'p_currency': currency
+            }).execute()
+        except APIError as e:
+            if is_unique_violation(e):
+                return jsonify({
+                    'success': False,
+                    'message': 'User with this email already exists'
+                }), 409
+            raise
+        
+        if not signup_response.data:
             return jsonify({
                 'success': False,
-                'message': 'Failed to create user account'
+                'message': 'Failed to create admin account'
             }), 500
         
-        user = user_response.data[0]
+        user = signup_response.data['user']
+        company = signup_response.data['company']
         user_id = user['id']
-        
-        # Update company's created_by field
-        supabase.table('companies').update({'created_by': user_id}).eq('id', company_id).execute()
+        company_id = company['id']
         
         # Generate JWT token
         token = generate_token(
@@ -151,9 +133,6 @@ def signup():
             company_id=company_id
         )
         
-        # Remove password_hash from response
-        user.pop('password_hash', None)
-        
         return jsonify({
             'success': True,
             'message': 'Admin account created successfully',
@@ -169,6 +148,7 @@ def signup():
         }), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login', limit=10, window=300, key_funcs=[key_by_ip, key_by_email])
 def login():
     """
     User login endpoint
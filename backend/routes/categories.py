@@ -4,12 +4,46 @@ Handles expense category management (Admin only for create/update/delete)
 """
 
 from flask import Blueprint, request, jsonify
-from config.database import get_supabase_client
+from config.database import get_supabase_client, is_unique_violation
+from postgrest.exceptions import APIError
 from utils.auth import token_required, admin_required
+from utils.cache import VersionedCache
 import re
 
 categories_bp = Blueprint('categories', __name__)
 
+# Per-company category cache (categories change rarely, expenses validate against them constantly)
+category_cache = VersionedCache()
+
+
+def get_company_categories(company_id: str) -> dict:
+    """
+    Get all categories of a company, keyed by id (served from the cache)
+    Args:
+        company_id: Company UUID
+    Returns:
+        { category_id: category_data }
+    """
+    def load():
+        supabase = get_supabase_client()
+        response = supabase.table('categories').select('*').eq('company_id', company_id).execute()
+        return {category['id']: category for category in response.data}
+    
+    return category_cache.get(company_id, load)
+
+
+def get_company_category(company_id: str, category_id: str):
+    """
+    Get one category of a company without a database round trip on cache hits
+    Returns: category data, or None if it does not exist in the company
+    """
+    return get_company_categories(company_id).get(str(category_id))
+
+
+def invalidate_company_categories(company_id: str):
+    """Invalidate the cached categories of a company after a write"""
+    category_cache.invalidate(company_id)
+
 
 def validate_category_name(name: str) -> bool:
     """Validate category name (alphanumeric, spaces, hyphens, max 100 chars)"""
@@ -50,27 +84,24 @@ def list_categories(current_user):
     }
     """
     try:
-        supabase = get_supabase_client()
         company_id = current_user['company_id']
         
-        # Build query
-        query = supabase.table('categories').select('*').eq('company_id', company_id)
+        # Served from the per-company cache
+        categories = list(get_company_categories(company_id).values())
         
         # Filter by active status if provided
         is_active = request.args.get('is_active')
         if is_active is not None:
             is_active_bool = is_active.lower() == 'true'
-            query = query.eq('is_active', is_active_bool)
+            categories = [c for c in categories if c['is_active'] == is_active_bool]
         
         # Order by name
-        query = query.order('name')
-        
-        response = query.execute()
+        categories.sort(key=lambda c: c['name'])
         
         return jsonify({
             'success': True,
-            'data': response.data,
-            'count': len(response.data)
+            'data': categories,
+            'count': len(categories)
         }), 200
         
     except Exception as e:
@@ -80,6 +111,73 @@ def list_categories(current_user):
         }), 500
 
 
+@categories_bp.route('/stats', methods=['GET'])
+@token_required
+@admin_required
+def get_category_stats(current_user):
+    """
+    Get usage statistics per category (Admin only)
+    Served from the category_usage counters maintained on expense writes
+    
+    GET /api/categories/stats
+    
+    Response:
+    {
+        "success": true,
+        "data": [
+            {
+                "category_id": "uuid",
+                "name": "Travel",
+                "is_active": true,
+                "expense_count": 42,
+                "totals": {"USD": 1234.50, "EUR": 99.00}
+            },
+            ...
+        ],
+        "count": 10
+    }
+    """
+    try:
+        supabase = get_supabase_client()
+        company_id = current_user['company_id']
+        
+        usage = supabase.table('category_usage').select(
+            'category_id, currency, expense_count, total_amount'
+        ).eq('company_id', company_id).execute()
+        
+        stats = {
+            category['id']: {
+                'category_id': category['id'],
+                'name': category['name'],
+                'is_active': category['is_active'],
+                'expense_count': 0,
+                'totals': {}
+            }
+            for category in get_company_categories(company_id).values()
+        }
+        
+        for row in usage.data:
+            entry = stats.get(row['category_id'])
+            if not entry or row['expense_count'] <= 0:
+                continue
+            entry['expense_count'] += row['expense_count']
+            entry['totals'][row['currency']] = float(row['total_amount'])
+        
+        data = sorted(stats.values(), key=lambda e: e['name'])
+        
+        return jsonify({
+            'success': True,
+            'data': data,
+            'count': len(data)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to fetch category statistics: {str(e)}'
+        }), 500
+
+
 @categories_bp.route('/<category_id>', methods=['GET'])
 @token_required
 def get_category(current_user, category_id):
@@ -101,12 +199,11 @@ def get_category(current_user, category_id):
     }
     """
     try:
-        supabase = get_supabase_client()
         company_id = current_user['company_id']
         
-        response = supabase.table('categories').select('*').eq('id', category_id).eq('company_id', company_id).execute()
+        category = get_company_category(company_id, category_id)
         
-        if not response.data:
+        if not category:
             return jsonify({
                 'success': False,
                 'message': 'Category not found'
@@ -114,7 +211,7 @@ def get_category(current_user, category_id):
         
         return jsonify({
             'success': True,
-            'data': response.data[0]
+            'data': category
         }), 200
         
     except Exception as e:
@@ -168,15 +265,6 @@ def create_category(current_user):
         supabase = get_supabase_client()
         company_id = current_user['company_id']
         
-        # Check if category already exists for this company
-        existing = supabase.table('categories').select('id').eq('name', name).eq('company_id', company_id).execute()
-        
-        if existing.data:
-            return jsonify({
-                'success': False,
-                'message': f'Category "{name}" already exists in your company'
-            }), 409
-        
         # Create category
         new_category = {
             'name': name,
@@ -185,7 +273,18 @@ def create_category(current_user):
             'is_active': True
         }
         
-        response = supabase.table('categories').insert(new_category).execute()
+        # UNIQUE(name, company_id) rejects duplicates, no need to check beforehand
+        try:
+            response = supabase.table('categories').insert(new_category).execute()
+        except APIError as e:
+            if is_unique_violation(e):
+                return jsonify({
+                    'success': False,
+                    'message': f'Category "{name}" already exists in your company'
+                }), 409
+            raise
+        
+        invalidate_company_categories(company_id)
         
         return jsonify({
             'success': True,
@@ -247,15 +346,6 @@ def update_category(current_user, category_id):
                     'message': 'Invalid category name'
                 }), 400
             
-            # Check if new name conflicts with existing category
-            if name != existing.data[0]['name']:
-                name_check = supabase.table('categories').select('id').eq('name', name).eq('company_id', company_id).execute()
-                if name_check.data:
-                    return jsonify({
-                        'success': False,
-                        'message': f'Category "{name}" already exists'
-                    }), 409
-            
             updates['name'] = name
         
         if 'description' in data:
@@ -270,8 +360,18 @@ def update_category(current_user, category_id):
                 'message': 'No fields to update'
             }), 400
         
-        # Update category
-        response = supabase.table('categories').update(updates).eq('id', category_id).execute()
+        # Update category (UNIQUE(name, company_id) rejects a conflicting rename)
+        try:
+            response = supabase.table('categories').update(updates).eq('id', category_id).execute()
+        except APIError as e:
+            if is_unique_violation(e):
+                return jsonify({
+                    'success': False,
+                    'message': f'Category "{updates["name"]}" already exists'
+                }), 409
+            raise
+        
+        invalidate_company_categories(company_id)
         
         return jsonify({
             'success': True,
@@ -307,20 +407,21 @@ def delete_category(current_user, category_id):
         company_id = current_user['company_id']
         
         # Check if category exists
-        existing = supabase.table('categories').select('*').eq('id', category_id).eq('company_id', company_id).execute()
-        
-        if not existing.data:
+        if not get_company_category(company_id, category_id):
             return jsonify({
                 'success': False,
                 'message': 'Category not found'
             }), 404
         
-        # Check if category is used by any expenses
-        expenses = supabase.table('expenses').select('id').eq('category_id', category_id).limit(1).execute()
+        # Check if category is used by any expenses (precomputed counters)
+        usage = supabase.table('category_usage').select('expense_count').eq(
+            'category_id', category_id
+        ).gt('expense_count', 0).limit(1).execute()
         
-        if expenses.data:
+        if usage.data:
             # Soft delete - just deactivate
             supabase.table('categories').update({'is_active': False}).eq('id', category_id).execute()
+            invalidate_company_categories(company_id)
             
             return jsonify({
                 'success': True,
@@ -329,6 +430,7 @@ def delete_category(current_user, category_id):
         else:
             # No expenses, can actually delete
             supabase.table('categories').delete().eq('id', category_id).execute()
+            invalidate_company_categories(company_id)
             
             return jsonify({
                 'success': True,
@@ -0,0 +1,141 @@
+"""
+Event Stream Routes
+Server-Sent Events push of expense and approval status changes
+"""
+
+from flask import Blueprint, Response, request, jsonify
+from utils.auth import (
+    token_required, admin_required, generate_stream_token, decode_stream_token,
+    STREAM_TOKEN_EXPIRATION_SECONDS
+)
+from utils.events import (
+    hub, get_broker, format_sse, SubscriberLimitReached,
+    EVENTS_HEARTBEAT_SECONDS, EVENTS_MAX_STREAM_SECONDS
+)
+import time
+
+events_bp = Blueprint('events', __name__)
+
+# Client reconnect delay sent to EventSource (milliseconds)
+STREAM_RETRY_MS = 5000
+
+
+@events_bp.route('/token', methods=['POST'])
+@token_required
+def create_stream_token(current_user):
+    """
+    Get a short-lived token for opening the event stream
+    
+    POST /api/events/token
+    
+    Response:
+    {
+        "success": true,
+        "data": {"token": "...", "expires_in": 60}
+    }
+    """
+    return jsonify({
+        'success': True,
+        'data': {
+            'token': generate_stream_token(current_user),
+            'expires_in': STREAM_TOKEN_EXPIRATION_SECONDS
+        }
+    }), 200
+
+
+@events_bp.route('/stream', methods=['GET'])
+def stream_events():
+    """
+    Stream status-change events for the current user
+    
+    GET /api/events/stream?token=<stream token>
+    
+    Admins receive every event of their company; other users receive events
+    about their own expenses and approvals. Events:
+    - expense.status: {"id": "uuid", "status": "submitted" | "approved" | "rejected"}
+    - approval.assigned: {"expense_id": "uuid"}
+    - approval.decided: {"approval_ids": ["uuid"], "status": "approved" | "rejected"}
+    - resync: events were missed, refetch instead of applying deltas
+    
+    Reconnects with Last-Event-ID replay the events missed in between.
+    """
+    try:
+        current_user = decode_stream_token(request.args.get('token', ''))
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Token validation failed: {str(e)}'
+        }), 401
+    
+    get_broker().start()
+    
+    try:
+        subscriber, missed = hub.subscribe(
+            current_user['user_id'],
+            current_user['company_id'],
+            current_user['role'],
+            request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        )
+    except SubscriberLimitReached:
+        response = jsonify({
+            'success': False,
+            'message': 'Too many open event streams, try again later'
+        })
+        response.headers['Retry-After'] = str(STREAM_RETRY_MS // 1000)
+        return response, 503
+    
+    def generate():
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            
+            if missed is None:
+                yield format_sse('resync', {})
+            else:
+                for event in missed:
+                    yield format_sse(event['type'], event['data'], event['id'])
+            
+            # Streams are recycled so revoked users and rebalanced processes
+            # do not keep a connection forever
+            deadline = time.monotonic() + EVENTS_MAX_STREAM_SECONDS
+            while time.monotonic() < deadline:
+                events, overflowed = subscriber.get(EVENTS_HEARTBEAT_SECONDS)
+                
+                if overflowed:
+                    yield format_sse('resync', {})
+                elif not events:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ': keep-alive\n\n'
+                
+                for event in events:
+                    yield format_sse(event['type'], event['data'], event['id'])
+        finally:
+            hub.unsubscribe(subscriber)
+    
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Also covers clients that disconnect before the first chunk is sent
+    response.call_on_close(lambda: hub.unsubscribe(subscriber))
+    return response
+
+
+@events_bp.route('/stats', methods=['GET'])
+@token_required
+@admin_required
+def get_stream_stats(current_user):
+    """
+    Get open event streams of this process (Admin only)
+    
+    GET /api/events/stats
+    
+    Response:
+    {
+        "success": true,
+        "data": {"subscribers": 120, "companies": 4, "max_subscribers": 5000}
+    }
+    """
+    return jsonify({
+        'success': True,
+        'data': hub.stats()
+    }), 200
@@ -3,15 +3,31 @@ Expense Routes
 Handles expense CRUD operations and submission for approval
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from config.database import get_supabase_client
 from utils.auth import token_required, admin_required
+from routes.categories import get_company_category
+from utils.jobs import enqueue
+from utils.events import publish_event
+from utils.receipts import resolve_receipt_urls, find_duplicate_expenses, find_receipt_by_url
+from utils.ocr import get_cached_extraction, OCR_ENABLED, OCR_EXTENSIONS
+from utils.storage import get_storage
+from utils.archive import stream_zip, fetch_concurrently
+from routes.upload import belongs_to_company
+import utils.approvals  # registers the approval background jobs
 from datetime import datetime
 from decimal import Decimal, ROUND_HALF_UP
+import csv
+import io
+import os
 import re
 
 expenses_bp = Blueprint('expenses', __name__)
 
+# Receipt archive Configuration
+RECEIPT_ZIP_CONCURRENCY = int(os.getenv('RECEIPT_ZIP_CONCURRENCY', 8))  # receipts fetched in parallel
+RECEIPT_ZIP_MAX_FILES = int(os.getenv('RECEIPT_ZIP_MAX_FILES', 2000))
+
 
 def validate_expense_data(data, is_update=False):
     """Validate expense data"""
@@ -42,18 +58,84 @@ def validate_expense_data(data, is_update=False):
     return errors
 
 
+def scoped_expenses_query(supabase, current_user, columns):
+    """
+    Build an expenses query limited to what the current user may see
+    - admin: every expense in the company
+    - manager: their own and their reports' expenses, recursively, through
+      the team_expenses view (one indexed join on the user_hierarchy closure table)
+    - employee: their own expenses
+    """
+    company_id = current_user['company_id']
+    role = current_user['role']
+    
+    if role == 'admin':
+        return supabase.table('expenses').select(columns).eq('company_id', company_id)
+    
+    if role == 'manager':
+        return supabase.table('team_expenses').select(columns).eq(
+            'company_id', company_id
+        ).eq('ancestor_id', current_user['user_id'])
+    
+    return supabase.table('expenses').select(columns).eq(
+        'company_id', company_id
+    ).eq('user_id', current_user['user_id'])
+
+
+def apply_expense_filters(query, args, role):
+    """Apply the list_expenses query-string filters to an expenses query"""
+    status = args.get('status')
+    if status:
+        query = query.eq('status', status)
+    
+    category_id = args.get('category_id')
+    if category_id:
+        query = query.eq('category_id', category_id)
+    
+    # User filter (only for admin/manager)
+    filter_user_id = args.get('user_id')
+    if filter_user_id and role in ['admin', 'manager']:
+        query = query.eq('user_id', filter_user_id)
+    
+    # Date range filters
+    from_date = args.get('from_date')
+    if from_date:
+        query = query.gte('expense_date', from_date)
+    
+    to_date = args.get('to_date')
+    if to_date:
+        query = query.lte('expense_date', to_date)
+    
+    # Paid by filter
+    paid_by = args.get('paid_by')
+    if paid_by:
+        query = query.eq('paid_by', paid_by)
+    
+    return query
+
+
+def is_in_reporting_tree(supabase, manager_id, user_id):
+    """Check if user_id reports (directly or indirectly) to manager_id"""
+    result = supabase.table('user_hierarchy').select('depth').eq(
+        'ancestor_id', manager_id
+    ).eq('descendant_id', user_id).limit(1).execute()
+    return bool(result.data)
+
+
 @expenses_bp.route('', methods=['GET'])
 @token_required
 def list_expenses(current_user):
     """
     Get list of expenses with filters
+    Admins see the whole company, managers see their reporting tree
+    (themselves and all direct/indirect reports), employees see their own
     
     GET /api/expenses?status=draft&category_id=123&user_id=456&from_date=2024-01-01&to_date=2024-12-31
     
     Query Parameters:
     - status: Filter by status (draft, submitted, approved, rejected)
     - category_id: Filter by category
-    - user_id: Filter by user (admin/manager only)
+    - user_id: Filter by user (admin, or manager within their reporting tree)
     - from_date: Filter by expense_date >= from_date
     - to_date: Filter by expense_date <= to_date
     - paid_by: Filter by paid_by (personal, company)
@@ -67,44 +149,15 @@ def list_expenses(current_user):
     """
     try:
         supabase = get_supabase_client()
-        company_id = current_user['company_id']
-        user_id = current_user['user_id']
         role = current_user['role']
         
-        # Base query - filter by company
-        query = supabase.table('expenses').select('*, category:categories(name), user:users(name, email)').eq('company_id', company_id)
-        
-        # Non-admins can only see their own expenses
-        if role not in ['admin', 'manager']:
-            query = query.eq('user_id', user_id)
+        # Base query - filter by company, scoped by role
+        query = scoped_expenses_query(
+            supabase, current_user, '*, category:categories(name), user:users!user_id(name, email)'
+        )
         
         # Apply filters
-        status = request.args.get('status')
-        if status:
-            query = query.eq('status', status)
-        
-        category_id = request.args.get('category_id')
-        if category_id:
-            query = query.eq('category_id', category_id)
-        
-        # User filter (only for admin/manager)
-        filter_user_id = request.args.get('user_id')
-        if filter_user_id and role in ['admin', 'manager']:
-            query = query.eq('user_id', filter_user_id)
-        
-        # Date range filters
-        from_date = request.args.get('from_date')
-        if from_date:
-            query = query.gte('expense_date', from_date)
-        
-        to_date = request.args.get('to_date')
-        if to_date:
-            query = query.lte('expense_date', to_date)
-        
-        # Paid by filter
-        paid_by = request.args.get('paid_by')
-        if paid_by:
-            query = query.eq('paid_by', paid_by)
+        query = apply_expense_filters(query, request.args, role)
         
         # Order by expense date (most recent first)
         query = query.order('expense_date', desc=True)
@@ -130,6 +183,8 @@ def list_expenses(current_user):
 def get_expense(current_user, expense_id):
     """
     Get single expense by ID
+    Other expenses filed with the same receipt content are listed in
+    data.duplicate_expenses.
     
     GET /api/expenses/:id
     
@@ -160,11 +215,15 @@ def get_expense(current_user, expense_id):
         expense = result.data[0]
         
         # Check if user has permission to view
-        if role not in ['admin', 'manager'] and expense['user_id'] != user_id:
-            return jsonify({
-                'success': False,
-                'message': 'Unauthorized: You can only view your own expenses'
-            }), 403
+        if role != 'admin' and expense['user_id'] != user_id:
+            if role != 'manager' or not is_in_reporting_tree(supabase, user_id, expense['user_id']):
+                return jsonify({
+                    'success': False,
+                    'message': 'Unauthorized: You can only view your own or your reports\' expenses'
+                }), 403
+        
+        # Flag other expenses filed with the same receipt
+        expense['duplicate_expenses'] = find_duplicate_expenses(company_id, expense.get('receipt_url'), expense['id'])
         
         return jsonify({
             'success': True,
@@ -226,18 +285,16 @@ def create_expense(current_user):
         company_id = current_user['company_id']
         user_id = current_user['user_id']
         
-        # Verify category exists and belongs to company
-        category_result = supabase.table('categories').select('id, is_active').eq(
-            'id', data['category_id']
-        ).eq('company_id', company_id).execute()
+        # Verify category exists and belongs to company (per-company category cache)
+        category = get_company_category(company_id, data['category_id'])
         
-        if not category_result.data:
+        if not category:
             return jsonify({
                 'success': False,
                 'message': 'Category not found or does not belong to your company'
             }), 404
         
-        if not category_result.data[0]['is_active']:
+        if not category['is_active']:
             return jsonify({
                 'success': False,
                 'message': 'Cannot create expense with inactive category'
@@ -252,17 +309,23 @@ def create_expense(current_user):
             'currency': data['currency'],
             'expense_date': data['expense_date'],
             'description': data.get('description', ''),
-            'receipt_url': data.get('receipt_url'),
             'paid_by': data['paid_by'],
             'status': 'draft'
         }
         
+        # Reference the optimized receipt and its thumbnail when ready
+        expense_data['receipt_url'], expense_data['receipt_thumbnail_url'] = resolve_receipt_urls(
+            company_id, data.get('receipt_url')
+        )
+        
         result = supabase.table('expenses').insert(expense_data).execute()
+        expense = result.data[0]
+        expense['duplicate_expenses'] = find_duplicate_expenses(company_id, expense['receipt_url'], expense['id'])
         
         return jsonify({
             'success': True,
             'message': 'Expense created successfully',
-            'data': result.data[0]
+            'data': expense
         }), 201
         
     except Exception as e:
@@ -346,17 +409,15 @@ def update_expense(current_user, expense_id):
         
         # If category is being changed, verify it
         if 'category_id' in data:
-            category_result = supabase.table('categories').select('id, is_active').eq(
-                'id', data['category_id']
-            ).eq('company_id', company_id).execute()
+            category = get_company_category(company_id, data['category_id'])
             
-            if not category_result.data:
+            if not category:
                 return jsonify({
                     'success': False,
                     'message': 'Category not found or does not belong to your company'
                 }), 404
             
-            if not category_result.data[0]['is_active']:
+            if not category['is_active']:
                 return jsonify({
                     'success': False,
                     'message': 'Cannot update expense with inactive category'
@@ -373,13 +434,20 @@ def update_expense(current_user, expense_id):
                 else:
                     update_data[field] = data[field]
         
+        if 'receipt_url' in update_data:
+            update_data['receipt_url'], update_data['receipt_thumbnail_url'] = resolve_receipt_urls(
+                company_id, update_data['receipt_url']
+            )
+        
         # Update expense
         result = supabase.table('expenses').update(update_data).eq('id', expense_id).execute()
+        expense = result.data[0]
+        expense['duplicate_expenses'] = find_duplicate_expenses(company_id, expense.get('receipt_url'), expense_id)
         
         return jsonify({
             'success': True,
             'message': 'Expense updated successfully',
-            'data': result.data[0]
+            'data': expense
         }), 200
         
     except Exception as e:
@@ -471,8 +539,8 @@ def submit_expense(current_user, expense_id):
         company_id = current_user['company_id']
         user_id = current_user['user_id']
         
-        # Get existing expense
-        existing = supabase.table('expenses').select('*').eq(
+        # Get existing expense (with the submitter's manager, the fallback approver)
+        existing = supabase.table('expenses').select('*, submitter:users!user_id(manager_id)').eq(
             'id', expense_id
         ).eq('company_id', company_id).eq('user_id', user_id).execute()
         
@@ -483,6 +551,7 @@ def submit_expense(current_user, expense_id):
             }), 404
         
         expense = existing.data[0]
+        manager_id = (expense.pop('submitter', None) or {}).get('manager_id')
         
         # Can only submit draft expenses
         if expense['status'] != 'draft':
@@ -491,16 +560,35 @@ def submit_expense(current_user, expense_id):
                 'message': f'Cannot submit expense with status: {expense["status"]}. Only draft expenses can be submitted.'
             }), 400
         
-        # Update status to submitted
+        # Update status to submitted (guarded so a double submit cannot route twice)
         result = supabase.table('expenses').update({
             'status': 'submitted',
             'submitted_at': datetime.now().isoformat()
-        }).eq('id', expense_id).execute()
+        }).eq('id', expense_id).eq('status', 'draft').execute()
         
-        # TODO: In Phase 4, trigger approval workflow here
-        # - Find matching approval rule
-        # - Create approval records
-        # - Send notifications to approvers
+        if not result.data:
+            return jsonify({
+                'success': False,
+                'message': 'Expense was already submitted'
+            }), 409
+        
+        # Approval routing and notifications run in the background job queue
+        try:
+            enqueue('route_approvals', {
+                'expense': result.data[0],
+                'manager_id': manager_id
+            })
+        except Exception:
+            supabase.table('expenses').update({
+                'status': 'draft',
+                'submitted_at': None
+            }).eq('id', expense_id).execute()
+            raise
+        
+        publish_event('expense.status', company_id, {
+            'id': expense_id,
+            'status': 'submitted'
+        }, [user_id])
         
         return jsonify({
             'success': True,
@@ -540,19 +628,9 @@ def get_expense_stats(current_user):
     """
     try:
         supabase = get_supabase_client()
-        company_id = current_user['company_id']
-        user_id = current_user['user_id']
-        role = current_user['role']
         
-        # Base query
-        if role in ['admin', 'manager']:
-            # Admins/managers see company-wide stats
-            result = supabase.table('expenses').select('status, amount, currency').eq('company_id', company_id).execute()
-        else:
-            # Regular users see only their stats
-            result = supabase.table('expenses').select('status, amount, currency').eq(
-                'company_id', company_id
-            ).eq('user_id', user_id).execute()
+        # Admins see company-wide stats, managers their reporting tree, employees their own
+        result = scoped_expenses_query(supabase, current_user, 'status, amount, currency').execute()
         
         expenses = result.data
         
@@ -578,3 +656,152 @@ def get_expense_stats(current_user):
             'success': False,
             'message': f'Failed to retrieve statistics: {str(e)}'
         }), 500
+
+
+@expenses_bp.route('/receipt-suggestions', methods=['GET'])
+@token_required
+def get_receipt_suggestions(current_user):
+    """
+    Get field suggestions read from an uploaded receipt (OCR)
+    OCR runs in the background after upload; poll while status is pending.
+    
+    GET /api/expenses/receipt-suggestions?receipt_url=https://...
+    
+    Response:
+    {
+        "success": true,
+        "data": {
+            "status": "pending" | "done" | "failed" | "unavailable",
+            "suggestions": {
+                "amount": "12.50",
+                "currency": "EUR",
+                "expense_date": "2025-01-15",
+                "description": "Merchant name"
+            } | null
+        }
+    }
+    """
+    try:
+        receipt_url = request.args.get('receipt_url')
+        if not receipt_url:
+            return jsonify({
+                'success': False,
+                'message': 'receipt_url is required'
+            }), 400
+        
+        company_id = current_user['company_id']
+        receipt = find_receipt_by_url(company_id, receipt_url)
+        
+        if not receipt:
+            return jsonify({
+                'success': False,
+                'message': 'Receipt not found'
+            }), 404
+        
+        extraction = get_cached_extraction(company_id, receipt.get('content_hash'))
+        
+        if extraction:
+            status = extraction['status']
+        elif OCR_ENABLED and receipt['path'].rsplit('.', 1)[-1].lower() in OCR_EXTENSIONS:
+            status = 'pending'
+        else:
+            status = 'unavailable'
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'status': status,
+                'suggestions': extraction['suggestions'] if extraction else None
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to retrieve receipt suggestions: {str(e)}'
+        }), 500
+
+
+def receipt_archive_name(expense, path):
+    """File name of an expense's receipt inside the archive"""
+    employee = re.sub(r'[^A-Za-z0-9]+', '-', (expense.get('user') or {}).get('name') or 'unknown').strip('-')
+    extension = path.rsplit('.', 1)[-1].lower() if '.' in path else 'bin'
+    return f"{expense['expense_date']}_{employee}_{expense['amount']}-{expense['currency']}_{expense['id'][:8]}.{extension}"
+
+
+@expenses_bp.route('/receipts.zip', methods=['GET'])
+@token_required
+def download_receipts(current_user):
+    """
+    Download the receipts of the filtered expenses as one ZIP archive
+    Takes the list_expenses filters. Receipts are fetched a few at a time
+    and streamed into the response as they arrive; manifest.csv lists
+    every expense and the file holding its receipt.
+    
+    GET /api/expenses/receipts.zip?status=approved&from_date=2025-01-01&to_date=2025-03-31
+    
+    Response: application/zip (attachment)
+    """
+    try:
+        supabase = get_supabase_client()
+        company_id = current_user['company_id']
+        
+        query = scoped_expenses_query(
+            supabase, current_user,
+            'id, expense_date, amount, currency, status, description, receipt_url, user:users!user_id(name)'
+        )
+        query = apply_expense_filters(query, request.args, current_user['role'])
+        expenses = query.not_.is_('receipt_url', 'null').order('expense_date').limit(RECEIPT_ZIP_MAX_FILES + 1).execute().data
+        
+        if len(expenses) > RECEIPT_ZIP_MAX_FILES:
+            return jsonify({
+                'success': False,
+                'message': f'Too many receipts. Narrow the filters to at most {RECEIPT_ZIP_MAX_FILES} expenses.'
+            }), 400
+        
+        storage = get_storage()
+        
+        # Only objects in the company's own receipt folder are fetched
+        for expense in expenses:
+            path = storage.path_from_url(expense['receipt_url'])
+            expense['_path'] = path if path and belongs_to_company(path, company_id) else None
+        
+        def fetch(expense):
+            if expense['_path'] is None:
+                raise ValueError('receipt is not stored in this company\'s receipt storage')
+            return storage.read(expense['_path'])
+        
+        def archive_files():
+            manifest = io.StringIO()
+            writer = csv.writer(manifest)
+            writer.writerow(['expense_id', 'expense_date', 'employee', 'amount', 'currency', 'status', 'description', 'file'])
+            
+            for expense, result in fetch_concurrently(fetch, expenses, RECEIPT_ZIP_CONCURRENCY):
+                if isinstance(result, Exception):
+                    file_name = f"missing: {result}"
+                else:
+                    file_name = receipt_archive_name(expense, expense['_path'])
+                    yield file_name, result
+                writer.writerow([
+                    expense['id'], expense['expense_date'], (expense.get('user') or {}).get('name'),
+                    expense['amount'], expense['currency'], expense['status'], expense.get('description') or '', file_name
+                ])
+            
+            yield 'manifest.csv', manifest.getvalue().encode('utf-8')
+        
+        filename = f"receipts-{datetime.now().strftime('%Y-%m-%d')}.zip"
+        return Response(
+            stream_with_context(stream_zip(archive_files())),
+            mimetype='application/zip',
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'Cache-Control': 'no-store',
+                'X-Accel-Buffering': 'no'
+            }
+        )
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to build receipt archive: {str(e)}'
+        }), 500
@@ -0,0 +1,120 @@
+"""
+Job Queue Routes
+Handles background job queue monitoring (operators only) and receipt
+garbage collection (Admin only)
+"""
+
+from flask import Blueprint, request, jsonify
+from utils.auth import token_required, admin_required, operator_required
+from utils.jobs import queue_stats, enqueue
+from utils.receipt_gc import collect_receipts, RECEIPT_GC_GRACE_HOURS
+
+jobs_bp = Blueprint('jobs', __name__)
+
+
+@jobs_bp.route('/stats', methods=['GET'])
+@token_required
+@operator_required
+def get_queue_stats(current_user):
+    """
+    Get background job queue depth (operators only: the queue is shared by
+    every company, see OPERATOR_EMAILS)
+    
+    GET /api/jobs/stats
+    
+    Response:
+    {
+        "success": true,
+        "data": {
+            "queued": 3,
+            "running": 1,
+            "failed": 0,
+            "oldest_queued_at": "2025-01-15T10:30:00+00:00" | null,
+            "by_type": {"route_approvals": {"queued": 2, "running": 1, "failed": 0}}
+        }
+    }
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'data': queue_stats()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to fetch job queue stats: {str(e)}'
+        }), 500
+
+
+@jobs_bp.route('/receipt-gc', methods=['POST'])
+@token_required
+@admin_required
+def run_receipt_gc(current_user):
+    """
+    Delete the company's receipt objects no expense references (Admin only)
+    A dry run scans right away and reports what would be deleted; a real
+    run is queued as a background job.
+    
+    POST /api/jobs/receipt-gc
+    Request Body:
+    {
+        "dry_run": true (default),
+        "grace_hours": 24 (optional, keep uploads younger than this)
+    }
+    
+    Response (dry run):
+    {
+        "success": true,
+        "data": {
+            "dry_run": true,
+            "prefixes": 12,
+            "objects_scanned": 5400,
+            "bytes_scanned": 812000000,
+            "orphans": 37,
+            "orphan_bytes": 5100000,
+            "removed": 0,
+            "elapsed_seconds": 3.2,
+            "objects_per_second": 1687.5
+        }
+    }
+    
+    Response (queued): 202 {"success": true, "data": {"job_id": "uuid"}}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        dry_run = data.get('dry_run', True) is not False
+        
+        try:
+            grace_hours = float(data.get('grace_hours', RECEIPT_GC_GRACE_HOURS))
+        except (TypeError, ValueError):
+            grace_hours = -1
+        if grace_hours < 0:
+            return jsonify({
+                'success': False,
+                'message': 'grace_hours must be a non-negative number'
+            }), 400
+        
+        if dry_run:
+            return jsonify({
+                'success': True,
+                'data': collect_receipts(current_user['company_id'], grace_hours, dry_run=True)
+            }), 200
+        
+        job = enqueue('collect_receipts', {
+            'company_id': current_user['company_id'],
+            'grace_hours': grace_hours,
+            'dry_run': False
+        }, max_attempts=1)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Receipt garbage collection queued',
+            'data': {'job_id': job['id']}
+        }), 202
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Receipt garbage collection failed: {str(e)}'
+        }), 500
@@ -0,0 +1,146 @@
+"""
+Notification Routes
+Handles the current user's in-app notifications
+"""
+
+from flask import Blueprint, request, jsonify
+from config.database import get_supabase_client
+from utils.auth import token_required
+from utils.pagination import parse_limit, apply_cursor, paginate
+from datetime import datetime, timezone
+import uuid
+
+notifications_bp = Blueprint('notifications', __name__)
+
+NOTIFICATION_FIELDS = (
+    'id, type, read_at, created_at, '
+    'expense:expenses(id, amount, currency, description, status)'
+)
+
+MAX_MARK_READ = 500
+
+
+@notifications_bp.route('', methods=['GET'])
+@token_required
+def list_notifications(current_user):
+    """
+    Get the current user's notifications, newest first (cursor paginated)
+    
+    GET /api/notifications?unread=true&limit=50&cursor=...
+    
+    Response:
+    {
+        "success": true,
+        "data": [
+            {
+                "id": "uuid",
+                "type": "approval_requested",
+                "read_at": null,
+                "created_at": "...",
+                "expense": {"id": "uuid", "amount": "120.00", "currency": "USD", ...}
+            },
+            ...
+        ],
+        "count": 50,
+        "next_cursor": "..." | null
+    }
+    """
+    try:
+        supabase = get_supabase_client()
+        limit = parse_limit(request.args.get('limit'))
+        
+        # Served by idx_notifications_user (user_id, created_at, id)
+        query = supabase.table('notifications').select(NOTIFICATION_FIELDS).eq(
+            'user_id', current_user['user_id']
+        )
+        
+        if request.args.get('unread', '').lower() == 'true':
+            query = query.is_('read_at', 'null')
+        
+        try:
+            query = apply_cursor(query, request.args.get('cursor'), 'created_at')
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        response = query.limit(limit + 1).execute()
+        notifications, next_cursor = paginate(response.data, limit, 'created_at')
+        
+        return jsonify({
+            'success': True,
+            'data': notifications,
+            'count': len(notifications),
+            'next_cursor': next_cursor
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to fetch notifications: {str(e)}'
+        }), 500
+
+
+@notifications_bp.route('/read', methods=['POST'])
+@token_required
+def mark_read(current_user):
+    """
+    Mark notifications as read (one UPDATE statement)
+    
+    POST /api/notifications/read
+    Request Body:
+    {
+        "ids": ["uuid", ...]  (or "all": true)
+    }
+    
+    Response:
+    {
+        "success": true,
+        "message": "3 notifications marked as read"
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        supabase = get_supabase_client()
+        query = supabase.table('notifications').update({
+            'read_at': datetime.now(timezone.utc).isoformat()
+        }).eq('user_id', current_user['user_id']).is_('read_at', 'null')
+        
+        if data.get('all') is not True:
+            ids = data.get('ids')
+            if not isinstance(ids, list) or not ids:
+                return jsonify({
+                    'success': False,
+                    'message': 'ids must be a non-empty list (or pass "all": true)'
+                }), 400
+            
+            if len(ids) > MAX_MARK_READ:
+                return jsonify({
+                    'success': False,
+                    'message': f'Too many notifications. Maximum per request: {MAX_MARK_READ}'
+                }), 400
+            
+            try:
+                ids = list(dict.fromkeys(str(uuid.UUID(str(i))) for i in ids))
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'message': 'ids must be valid ids'
+                }), 400
+            
+            query = query.in_('id', ids)
+        
+        response = query.execute()
+        
+        return jsonify({
+            'success': True,
+            'message': f'{len(response.data)} notifications marked as read'
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to update notifications: {str(e)}'
+        }), 500
@@ -0,0 +1,236 @@
+"""
+Report Routes
+Handles printable PDF expense reports (rendered in the background)
+"""
+
+from flask import Blueprint, Response, request, jsonify
+from config.database import get_supabase_client
+from utils.auth import token_required
+from utils.jobs import enqueue
+from utils.storage import get_storage
+from utils.reports import (
+    content_version, find_report, REPORT_MAX_EXPENSES, REPORT_STALE_SECONDS
+)
+from routes.expenses import scoped_expenses_query, apply_expense_filters
+from datetime import datetime, timezone
+
+reports_bp = Blueprint('reports', __name__)
+
+REPORT_FIELDS = 'id, title, status, version, size, total, company_currency, error, created_at, updated_at'
+
+
+def report_response(report):
+    """Public fields of a report row"""
+    data = {field: report.get(field) for field in REPORT_FIELDS.split(', ')}
+    data['expense_count'] = len(report.get('expense_ids') or [])
+    return data
+
+
+def is_stale(report):
+    """Pending for so long that its job has most likely given up"""
+    updated_at = datetime.fromisoformat(report['updated_at'].replace('Z', '+00:00'))
+    return (datetime.now(timezone.utc) - updated_at).total_seconds() > REPORT_STALE_SECONDS
+
+
+@reports_bp.route('', methods=['POST'])
+@token_required
+def create_report(current_user):
+    """
+    Request a PDF report of the expenses matching the list_expenses filters
+    Rendering happens in the background; poll GET /api/reports/:id until
+    status is "ready". Rendering a report deletes the requester's earlier
+    reports with the same title, and reports older than REPORT_RETENTION_DAYS. Requesting the same, unchanged expenses with the same
+    title again returns the cached report.
+    
+    POST /api/reports
+    Request Body:
+    {
+        "title": "Q1 travel" (optional),
+        "status": "approved",
+        "from_date": "2025-01-01",
+        "to_date": "2025-03-31",
+        ... (any list_expenses filter)
+    }
+    
+    Response (202 while rendering, 200 when cached):
+    {
+        "success": true,
+        "data": {
+            "id": "uuid",
+            "status": "pending" | "ready" | "failed",
+            "expense_count": 42,
+            ...
+        }
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        supabase = get_supabase_client()
+        company_id = current_user['company_id']
+        user_id = current_user['user_id']
+        
+        filters = {key: str(value) for key, value in data.items() if key != 'title' and value not in (None, '')}
+        query = scoped_expenses_query(supabase, current_user, 'id, updated_at')
+        query = apply_expense_filters(query, filters, current_user['role'])
+        expenses = query.limit(REPORT_MAX_EXPENSES + 1).execute().data
+        
+        if not expenses:
+            return jsonify({
+                'success': False,
+                'message': 'No expenses match the filters'
+            }), 400
+        
+        if len(expenses) > REPORT_MAX_EXPENSES:
+            return jsonify({
+                'success': False,
+                'message': f'Too many expenses. Narrow the filters to at most {REPORT_MAX_EXPENSES} expenses.'
+            }), 400
+        
+        company = supabase.table('companies').select('currency').eq('id', company_id).execute()
+        company_currency = (company.data[0]['currency'] if company.data else None) or 'USD'
+        from_date, to_date = filters.get('from_date'), filters.get('to_date')
+        default_title = 'Expense report' + (f" {from_date or '...'} to {to_date or '...'}" if from_date or to_date else '')
+        title = str(data.get('title') or default_title)[:200]
+        version = content_version(expenses, company_currency, title)
+        
+        report = find_report(company_id, user_id, version)
+        
+        if report and (report['status'] == 'ready' or (report['status'] == 'pending' and not is_stale(report))):
+            return jsonify({
+                'success': True,
+                'data': report_response(report)
+            }), 200 if report['status'] == 'ready' else 202
+        
+        if report:
+            # Failed, or its job was lost: render again
+            report = supabase.table('expense_reports').update({
+                'status': 'pending',
+                'error': None
+            }).eq('id', report['id']).execute().data[0]
+        else:
+            # A concurrent request for the same report may insert first:
+            # UNIQUE(company_id, requested_by, version) keeps one row, and
+            # only the request that inserted it queues the render
+            inserted = supabase.table('expense_reports').upsert({
+                'company_id': company_id,
+                'requested_by': user_id,
+                'version': version,
+                'title': title,
+                'company_currency': company_currency,
+                'filters': filters,
+                'expense_ids': [expense['id'] for expense in expenses],
+                'status': 'pending'
+            }, on_conflict='company_id,requested_by,version', ignore_duplicates=True).execute().data
+            
+            if not inserted:
+                report = find_report(company_id, user_id, version)
+                return jsonify({
+                    'success': True,
+                    'data': report_response(report)
+                }), 200 if report['status'] == 'ready' else 202
+            report = inserted[0]
+        
+        enqueue('render_report', {'report_id': report['id']})
+        
+        return jsonify({
+            'success': True,
+            'message': 'Report is being generated',
+            'data': report_response(report)
+        }), 202
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to create report: {str(e)}'
+        }), 500
+
+
+def get_own_report(current_user, report_id):
+    """The current user's report, or None"""
+    result = get_supabase_client().table('expense_reports').select('*').eq(
+        'id', report_id
+    ).eq('company_id', current_user['company_id']).eq('requested_by', current_user['user_id']).execute()
+    return result.data[0] if result.data else None
+
+
+@reports_bp.route('/<report_id>', methods=['GET'])
+@token_required
+def get_report(current_user, report_id):
+    """
+    Get report status
+    
+    GET /api/reports/:id
+    
+    Response:
+    {
+        "success": true,
+        "data": {"id": "uuid", "status": "pending" | "ready" | "failed", ...}
+    }
+    """
+    try:
+        report = get_own_report(current_user, report_id)
+        
+        if not report:
+            return jsonify({
+                'success': False,
+                'message': 'Report not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': report_response(report)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to retrieve report: {str(e)}'
+        }), 500
+
+
+@reports_bp.route('/<report_id>/download', methods=['GET'])
+@token_required
+def download_report(current_user, report_id):
+    """
+    Download a finished report
+    
+    GET /api/reports/:id/download
+    
+    Response: application/pdf (attachment)
+    """
+    try:
+        report = get_own_report(current_user, report_id)
+        
+        if not report:
+            return jsonify({
+                'success': False,
+                'message': 'Report not found'
+            }), 404
+        
+        if report['status'] != 'ready':
+            return jsonify({
+                'success': False,
+                'message': f'Report is not ready (status: {report["status"]})'
+            }), 409
+        
+        # The PDF under a version never changes
+        etag = report['version']
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers={'ETag': f'"{etag}"'})
+        
+        filename = f"expense-report-{report['created_at'][:10]}.pdf"
+        return Response(
+            get_storage().read(report['path']),
+            mimetype='application/pdf',
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'ETag': f'"{etag}"',
+                'Cache-Control': 'private, max-age=86400'
+            }
+        )
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to download report: {str(e)}'
+        }), 500
@@ -0,0 +1,187 @@
+"""
+Local Storage Routes
+Stand-in for the storage service when STORAGE_BACKEND=local: accepts
+signed direct uploads and serves stored receipts
+"""
+
+import mimetypes
+from datetime import datetime, timezone
+from flask import Blueprint, Response, request, jsonify
+from werkzeug.datastructures import ContentRange
+from werkzeug.http import is_resource_modified
+from werkzeug.wsgi import wrap_file
+from utils.storage import get_storage, LocalStorage, LOCAL_STORAGE_MAX_AGE, LOCAL_STORAGE_ACCEL_PREFIX
+
+storage_bp = Blueprint('storage', __name__)
+
+# Only receipts are public; reports are served by /api/reports/<id>/download
+PUBLIC_FOLDER = 'receipts'
+
+# Older Python versions lack WebP in the extension table
+mimetypes.add_type('image/webp', '.webp')
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def local_storage():
+    """The local backend, or None when receipts live in Supabase Storage"""
+    storage = get_storage()
+    return storage if isinstance(storage, LocalStorage) else None
+
+
+def iter_range(file, length):
+    """Yield length bytes from the file's current position, then close it"""
+    try:
+        while length > 0:
+            chunk = file.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def requested_range(size, etag, last_modified):
+    """
+    Byte range to serve for the request's Range header
+    Returns: (start, stop), None to serve the whole file, or False when the
+    range cannot be satisfied
+    """
+    byte_range = request.range
+    if byte_range is None or byte_range.units != 'bytes' or len(byte_range.ranges) != 1:
+        return None
+    
+    # If-Range: only serve the part when the client's copy is still current
+    if_range = request.if_range
+    if if_range.etag is not None and if_range.etag != etag:
+        return None
+    if if_range.date is not None and last_modified > if_range.date:
+        return None
+    
+    span = byte_range.range_for_length(size)
+    return span if span is not None else False
+
+
+@storage_bp.route('/upload/<path:file_path>', methods=['PUT'])
+def signed_upload(file_path):
+    """
+    Receive a direct upload to a signed URL (see POST /api/upload/sign)
+    
+    PUT /api/storage/upload/<path>?token=...
+    Body: raw file bytes
+    """
+    storage = local_storage()
+    if storage is None:
+        return jsonify({
+            'success': False,
+            'message': 'Resource not found'
+        }), 404
+    
+    try:
+        claims = storage.verify_upload_token(file_path, request.args.get('token', ''))
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 403
+    
+    try:
+        size = storage.write_stream(file_path, request.stream, claims['max_size'])
+    except FileExistsError:
+        return jsonify({
+            'success': False,
+            'message': 'Object already exists'
+        }), 409
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 413
+    
+    return jsonify({
+        'success': True,
+        'data': {
+            'path': file_path,
+            'size': size
+        }
+    }), 200
+
+
+@storage_bp.route('/object/<path:file_path>', methods=['GET'])
+def get_object(file_path):
+    """
+    Serve a stored receipt (public URL of the local backend)
+    Supports conditional GET (ETag / Last-Modified -> 304) and single byte
+    ranges (Range / If-Range -> 206). Whole files go out through the
+    server's wsgi.file_wrapper, which gunicorn sends with zero-copy
+    sendfile(); with LOCAL_STORAGE_ACCEL_PREFIX set, nginx serves the bytes.
+    
+    GET /api/storage/object/<path>
+    """
+    storage = local_storage()
+    
+    try:
+        full_path = storage.resolve(file_path) if storage else None
+    except ValueError:
+        full_path = None
+    
+    if full_path is None or storage.resolve(PUBLIC_FOLDER) not in full_path.parents or not full_path.is_file():
+        return jsonify({
+            'success': False,
+            'message': 'Resource not found'
+        }), 404
+    
+    info = full_path.stat()
+    etag = f"{info.st_mtime_ns:x}-{info.st_size:x}"
+    last_modified = datetime.fromtimestamp(int(info.st_mtime), tz=timezone.utc)
+    
+    response = Response(
+        mimetype=mimetypes.guess_type(full_path.name)[0] or 'application/octet-stream',
+        direct_passthrough=True
+    )
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.accept_ranges = 'bytes'
+    # Content-addressed objects never change under the same path
+    if '/sha256/' in file_path:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = f'public, max-age={LOCAL_STORAGE_MAX_AGE}'
+    
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response.status_code = 304
+        return response
+    
+    if LOCAL_STORAGE_ACCEL_PREFIX:
+        # nginx handles Range itself when serving the internal location
+        response.headers['X-Accel-Redirect'] = f"{LOCAL_STORAGE_ACCEL_PREFIX}/{file_path}"
+        return response
+    
+    span = requested_range(info.st_size, etag, last_modified)
+    if span is False:
+        response.status_code = 416
+        response.content_range = ContentRange('bytes', None, None, info.st_size)
+        return response
+    
+    file = open(full_path, 'rb')
+    
+    if span is None:
+        response.content_length = info.st_size
+        response.response = wrap_file(request.environ, file, STREAM_CHUNK_SIZE)
+        return response
+    
+    start, stop = span
+    file.seek(start)
+    response.status_code = 206
+    response.content_range = ContentRange('bytes', start, stop, info.st_size)
+    response.content_length = stop - start
+    
+    # gunicorn's file_wrapper sendfile()s from the current offset and stops
+    # at Content-Length; other servers' wrappers read to EOF, so parts are
+    # streamed in chunks there
+    if request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+        response.response = wrap_file(request.environ, file, STREAM_CHUNK_SIZE)
+    else:
+        response.response = iter_range(file, stop - start)
+    return response
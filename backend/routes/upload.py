@@ -1,12 +1,14 @@
 """
 File Upload Routes
-Handles file uploads to Supabase Storage (receipts, documents, etc.)
+Handles file uploads to receipt storage (receipts, documents, etc.)
 """
 
 from flask import Blueprint, request, jsonify
-from config.database import get_supabase_client
 from utils.auth import token_required
-import os
+from utils.uploads import spooled_size, spooled_path, spooled_sha256
+from utils.storage import get_storage
+from utils.receipts import register_receipt, find_receipt_by_hash, find_receipt_by_url, touch_receipt
+from config.database import get_supabase_client
 import uuid
 from datetime import datetime
 
@@ -15,24 +17,45 @@ upload_bp = Blueprint('upload', __name__)
 # Allowed file extensions for receipts
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'webp'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+# Largest accepted request body: one file plus multipart headers and form fields
+MAX_UPLOAD_REQUEST_SIZE = MAX_FILE_SIZE + 64 * 1024
+# Every upload goes under receipts/{company_id}/ (never a client-chosen folder)
+RECEIPT_FOLDER = 'receipts'
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def build_file_path(folder, company_id, filename):
+    """Company-scoped object path: {folder}/{company_id}/{YYYY-MM}/{uuid}.{ext}"""
+    file_extension = filename.rsplit('.', 1)[1].lower()
+    timestamp = datetime.now().strftime('%Y-%m')
+    return f"{folder}/{company_id}/{timestamp}/{uuid.uuid4()}.{file_extension}"
+
+def build_content_path(folder, company_id, content_hash, filename):
+    """Content-addressed object path: {folder}/{company_id}/sha256/{hash}.{ext}"""
+    file_extension = filename.rsplit('.', 1)[1].lower()
+    return f"{folder}/{company_id}/sha256/{content_hash}.{file_extension}"
+
+def belongs_to_company(file_path, company_id):
+    """Check a receipt path is inside the company's prefix"""
+    return file_path.startswith(f"{RECEIPT_FOLDER}/{company_id}/") and '..' not in file_path.split('/')
+
 
 @upload_bp.route('/upload', methods=['POST'])
 @token_required
 def upload_file(current_user):
     """
-    Upload file to Supabase Storage
+    Upload file to receipt storage
+    Files are stored under the SHA-256 of their content (computed while the
+    body is spooled); uploading content the company already stored returns
+    the existing object without storing it again.
     
     POST /api/upload
     Content-Type: multipart/form-data
     
     Form Data:
     - file: File to upload (image or PDF)
-    - folder: Optional folder name (default: 'receipts')
     
     Response:
     {
@@ -42,12 +65,22 @@ def upload_file(current_user):
             "url": "https://...storage.supabase.co/.../file.jpg",
             "path": "receipts/uuid-filename.jpg",
             "filename": "original-filename.jpg",
-            "size": 123456
+            "size": 123456,
+            "content_hash": "sha256 hex",
+            "deduplicated": false
         }
     }
     """
     try:
-        # Check if file is in request
+        # Reject oversized bodies from Content-Length, before any of it is read
+        if request.content_length is not None and request.content_length > MAX_UPLOAD_REQUEST_SIZE:
+            return jsonify({
+                'success': False,
+                'message': f'File too large. Maximum size: {MAX_FILE_SIZE / 1024 / 1024}MB'
+            }), 413
+        
+        # Check if file is in request (parts are spooled to disk in chunks,
+        # see utils/uploads.py)
         if 'file' not in request.files:
             return jsonify({
                 'success': False,
@@ -71,9 +104,7 @@ def upload_file(current_user):
             }), 400
         
         # Check file size
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)  # Reset file pointer
+        file_size = spooled_size(file)
         
         if file_size > MAX_FILE_SIZE:
             return jsonify({
@@ -81,36 +112,40 @@ def upload_file(current_user):
                 'message': f'File too large. Maximum size: {MAX_FILE_SIZE / 1024 / 1024}MB'
             }), 400
         
-        # Generate unique filename
         original_filename = file.filename
-        file_extension = original_filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        
-        # Get folder from request or use default
-        folder = request.form.get('folder', 'receipts')
         
         # Create full path with user company ID for organization
         company_id = current_user['company_id']
         user_id = current_user['user_id']
-        timestamp = datetime.now().strftime('%Y-%m')
         
-        file_path = f"{folder}/{company_id}/{timestamp}/{unique_filename}"
+        storage = get_storage()
+        content_hash = spooled_sha256(file)
         
-        # Read file data
-        file_data = file.read()
+        # Same content uploaded before: reuse the stored object
+        receipt = find_receipt_by_hash(company_id, content_hash)
+        deduplicated = receipt is not None and belongs_to_company(receipt['path'], company_id)
         
-        # Upload to Supabase Storage
-        supabase = get_supabase_client()
-        
-        # Upload file (Supabase Storage bucket should be named 'receipts')
-        storage = supabase.storage.from_('receipts')
-        response = storage.upload(file_path, file_data, {
-            'content-type': file.content_type,
-            'upsert': 'false'
-        })
-        
-        # Get public URL
-        public_url = storage.get_public_url(file_path)
+        if deduplicated:
+            file_path, public_url = receipt['path'], receipt['url']
+            touch_receipt(receipt['id'])
+        else:
+            file_path = build_content_path(RECEIPT_FOLDER, company_id, content_hash, original_filename)
+            
+            # Upload file (bucket 'receipts'). Passing the spooled file's path
+            # lets the storage client stream it from disk in chunks instead of
+            # holding the whole receipt in memory.
+            try:
+                storage.upload(file_path, spooled_path(file), file.content_type)
+            except FileExistsError:
+                # A concurrent upload of the same content got there first
+                deduplicated = True
+            
+            # Get public URL
+            public_url = storage.public_url(file_path)
+            
+            # Record the receipt; images are optimized in the background
+            register_receipt(company_id, user_id, file_path, public_url,
+                             file.content_type, file_size, content_hash)
         
         return jsonify({
             'success': True,
@@ -120,6 +155,8 @@ def upload_file(current_user):
                 'path': file_path,
                 'filename': original_filename,
                 'size': file_size,
+                'content_hash': content_hash,
+                'deduplicated': deduplicated,
                 'uploaded_by': user_id,
                 'uploaded_at': datetime.now().isoformat()
             }
@@ -136,7 +173,10 @@ def upload_file(current_user):
 @token_required
 def delete_file(current_user, file_path):
     """
-    Delete file from Supabase Storage
+    Delete file from receipt storage
+    Uploads are deduplicated, so one object can be shared by several
+    uploaders: only the user who first uploaded it (or an admin) may
+    delete it, and receipts still attached to an expense are kept.
     
     DELETE /api/upload/<file_path>
     
@@ -147,19 +187,44 @@ def delete_file(current_user, file_path):
     }
     """
     try:
-        supabase = get_supabase_client()
         company_id = current_user['company_id']
         
         # Security check: Ensure file belongs to user's company
-        if not file_path.startswith(f"receipts/{company_id}/"):
+        if not belongs_to_company(file_path, company_id):
             return jsonify({
                 'success': False,
                 'message': 'Unauthorized: File does not belong to your company'
             }), 403
         
-        # Delete from Supabase Storage
-        storage = supabase.storage.from_('receipts')
-        storage.remove([file_path])
+        storage = get_storage()
+        receipt = find_receipt_by_url(company_id, storage.public_url(file_path))
+        
+        if receipt:
+            if receipt.get('uploaded_by') != current_user['user_id'] and current_user['role'] != 'admin':
+                return jsonify({
+                    'success': False,
+                    'message': 'Unauthorized: Only the uploader can delete this file'
+                }), 403
+            
+            supabase = get_supabase_client()
+            urls = [url for url in (receipt['url'], receipt.get('optimized_url')) if url]
+            in_use = supabase.table('expenses').select('id').eq(
+                'company_id', company_id
+            ).in_('receipt_url', urls).limit(1).execute()
+            
+            if in_use.data:
+                return jsonify({
+                    'success': False,
+                    'message': 'File is attached to an expense'
+                }), 409
+            
+            # Derived copies go with the original
+            paths = {file_path, receipt.get('optimized_path'), receipt.get('thumbnail_path')}
+            storage.remove([path for path in paths if path])
+            supabase.table('receipts').delete().eq('id', receipt['id']).execute()
+        else:
+            # Delete from receipt storage
+            storage.remove([file_path])
         
         return jsonify({
             'success': True,
@@ -245,3 +310,148 @@ def validate_file(current_user):
             'success': False,
             'message': f'Validation failed: {str(e)}'
         }), 500
+
+
+@upload_bp.route('/upload/sign', methods=['POST'])
+@token_required
+def sign_upload(current_user):
+    """
+    Get a short-lived signed URL to upload a receipt straight to storage
+    The file never passes through the API; call /upload/confirm afterwards.
+    
+    POST /api/upload/sign
+    Request Body:
+    {
+        "filename": "receipt.jpg",
+        "size": 123456
+    }
+    
+    Response:
+    {
+        "success": true,
+        "data": {
+            "path": "receipts/{company_id}/2025-01/uuid.jpg",
+            "upload_url": "https://...",
+            "token": "...",
+            "method": "PUT",
+            "expires_in": 600,
+            "max_size": 5242880
+        }
+    }
+    """
+    try:
+        data = request.get_json(silent=True)
+        
+        if not data or 'filename' not in data or 'size' not in data:
+            return jsonify({
+                'success': False,
+                'message': 'filename and size are required'
+            }), 400
+        
+        filename = str(data['filename'])
+        try:
+            size = int(data['size'])
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': 'size must be an integer'
+            }), 400
+        
+        if not allowed_file(filename):
+            return jsonify({
+                'success': False,
+                'message': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
+            }), 400
+        
+        if size <= 0 or size > MAX_FILE_SIZE:
+            return jsonify({
+                'success': False,
+                'message': f'File too large. Maximum size: {MAX_FILE_SIZE / 1024 / 1024}MB'
+            }), 400
+        
+        file_path = build_file_path(RECEIPT_FOLDER, current_user['company_id'], filename)
+        signed = get_storage().create_signed_upload(file_path, MAX_FILE_SIZE)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'path': file_path,
+                'upload_url': signed['url'],
+                'token': signed['token'],
+                'method': signed['method'],
+                'expires_in': signed['expires_in'],
+                'max_size': MAX_FILE_SIZE
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to sign upload: {str(e)}'
+        }), 500
+
+
+@upload_bp.route('/upload/confirm', methods=['POST'])
+@token_required
+def confirm_upload(current_user):
+    """
+    Confirm a direct upload and get its URL
+    Uploads over MAX_FILE_SIZE are deleted and rejected.
+    
+    POST /api/upload/confirm
+    Request Body:
+    {
+        "path": "receipts/{company_id}/2025-01/uuid.jpg",
+        "filename": "receipt.jpg" (optional, original name)
+    }
+    
+    Response: same as POST /api/upload
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        file_path = str(data.get('path') or '')
+        
+        if not belongs_to_company(file_path, current_user['company_id']):
+            return jsonify({
+                'success': False,
+                'message': 'Unauthorized: File does not belong to your company'
+            }), 403
+        
+        storage = get_storage()
+        info = storage.stat(file_path)
+        
+        if not info:
+            return jsonify({
+                'success': False,
+                'message': 'Upload not found'
+            }), 404
+        
+        if info['size'] is not None and info['size'] > MAX_FILE_SIZE:
+            storage.remove([file_path])
+            return jsonify({
+                'success': False,
+                'message': f'File too large. Maximum size: {MAX_FILE_SIZE / 1024 / 1024}MB'
+            }), 400
+        
+        public_url = storage.public_url(file_path)
+        register_receipt(current_user['company_id'], current_user['user_id'], file_path,
+                         public_url, info['content_type'], info['size'])
+        
+        return jsonify({
+            'success': True,
+            'message': 'File uploaded successfully',
+            'data': {
+                'url': public_url,
+                'path': file_path,
+                'filename': data.get('filename') or file_path.rsplit('/', 1)[1],
+                'size': info['size'],
+                'uploaded_by': current_user['user_id'],
+                'uploaded_at': datetime.now().isoformat()
+            }
+        }), 201
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to confirm upload: {str(e)}'
+        }), 500
@@ -4,12 +4,29 @@ Handles CRUD operations for users within a company
 """
 
 from flask import Blueprint, request, jsonify
-from config.database import get_supabase_client
-from utils.auth import hash_password, token_required, admin_required
+from config.database import get_supabase_client, is_unique_violation, is_check_violation
+from postgrest.exceptions import APIError
+from utils.auth import hash_password, hash_passwords, token_required, admin_required
+from utils.rate_limit import rate_limit, key_by_user
+from utils.pagination import parse_limit, apply_cursor, paginate
+import csv
+import io
 import re
+import uuid
 
 users_bp = Blueprint('users', __name__)
 
+# Columns returned by user listings (never includes password_hash)
+USER_LIST_FIELDS = 'id, email, name, role, manager_id, is_active, created_at'
+USER_DETAIL_FIELDS = 'id, email, name, role, company_id, manager_id, is_active, created_at, updated_at'
+
+# Maximum ids accepted by a batch lookup (GET /api/users?ids=...)
+MAX_BATCH_LOOKUP = 200
+
+# Bulk provisioning limits
+MAX_BULK_USERS = 5000
+BULK_INSERT_BATCH_SIZE = 500
+
 def validate_email(email: str) -> bool:
     """Validate email format"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -19,29 +36,175 @@ def validate_role(role: str) -> bool:
     """Validate user role"""
     return role in ['admin', 'manager', 'employee']
 
+def sanitize_search_term(term: str) -> str:
+    """Strip characters that have meaning in PostgREST filters from a search term"""
+    return re.sub(r'[,()*%"\\]', '', term).strip()[:100]
+
+def parse_id_list(value: str) -> list:
+    """
+    Parse a comma-separated list of user ids
+    Returns: list of unique, valid UUID strings
+    Raises:
+        ValueError: If an id is malformed or there are too many
+    """
+    ids = list(dict.fromkeys(part.strip() for part in value.split(',') if part.strip()))
+    
+    if len(ids) > MAX_BATCH_LOOKUP:
+        raise ValueError(f'Too many ids. Maximum per request: {MAX_BATCH_LOOKUP}')
+    
+    for user_id in ids:
+        try:
+            uuid.UUID(user_id)
+        except ValueError:
+            raise ValueError(f'Invalid user id: {user_id}')
+    
+    return ids
+
+def read_bulk_rows() -> list:
+    """
+    Read bulk user rows from a JSON body, a CSV body or an uploaded CSV file
+    Returns:
+        List of row dictionaries
+    Raises:
+        ValueError: If the payload cannot be parsed
+    """
+    if 'file' in request.files:
+        text = request.files['file'].read().decode('utf-8-sig')
+        return list(csv.DictReader(io.StringIO(text)))
+    
+    if request.mimetype == 'text/csv':
+        return list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('users'), list):
+        raise ValueError('Request body must be {"users": [...]} or CSV')
+    
+    if not all(isinstance(row, dict) for row in data['users']):
+        raise ValueError('Each user must be an object')
+    
+    return data['users']
+
+def validate_bulk_row(row: dict) -> str:
+    """
+    Validate one bulk user row with the same rules as create_user
+    Returns: error message, or empty string if the row is valid
+    """
+    required_fields = ['email', 'password', 'name', 'role']
+    missing_fields = [field for field in required_fields if not row.get(field)]
+    if missing_fields:
+        return f'Missing required fields: {", ".join(missing_fields)}'
+    
+    if not validate_email(str(row['email']).lower().strip()):
+        return 'Invalid email format'
+    
+    role = str(row['role']).lower().strip()
+    if not validate_role(role):
+        return 'Invalid role. Must be manager or employee'
+    if role == 'admin':
+        return 'Cannot create admin users through this endpoint'
+    
+    if not isinstance(row['password'], str):
+        return 'Password must be a string'
+    if len(row['password']) < 8:
+        return 'Password must be at least 8 characters long'
+    
+    manager_id = row.get('manager_id')
+    if manager_id:
+        try:
+            uuid.UUID(str(manager_id))
+        except ValueError:
+            return 'Invalid manager_id'
+    
+    manager_email = row.get('manager_email')
+    if manager_email and not validate_email(str(manager_email).lower().strip()):
+        return 'Invalid manager_email'
+    
+    return ''
+
+def insert_bulk_batch(supabase, batch: list, company_id: str, known_managers: dict, errors: list) -> list:
+    """
+    Insert one batch of validated rows, skipping emails that already exist
+    UNIQUE(email) conflicts are ignored by the upsert and reported per row
+    Returns: created users (without password_hash)
+    """
+    user_rows = [{
+        'email': row['email'],
+        'password_hash': row['password_hash'],
+        'name': row['name'],
+        'role': row['role'],
+        'company_id': company_id,
+        'manager_id': known_managers.get(row['manager_id'] or row['manager_email']),
+        'is_active': True
+    } for _, row in batch]
+    
+    response = supabase.table('users').upsert(
+        user_rows, on_conflict='email', ignore_duplicates=True
+    ).execute()
+    
+    inserted = response.data or []
+    inserted_emails = {user['email'] for user in inserted}
+    for row_number, row in batch:
+        if row['email'] not in inserted_emails:
+            errors.append({
+                'row': row_number,
+                'email': row['email'],
+                'message': 'User with this email already exists'
+            })
+    
+    for user in inserted:
+        user.pop('password_hash', None)
+    
+    return inserted
+
 @users_bp.route('', methods=['GET'])
 @token_required
 def list_users(current_user):
     """
-    List all users in the company
+    List users in the company (cursor paginated, newest first)
     
     Query Parameters:
     - role: Filter by role (admin, manager, employee)
     - is_active: Filter by active status (true/false)
+    - q: Prefix search on name or email (e.g. for manager pickers)
+    - limit: Page size (default 50, max 200)
+    - cursor: next_cursor from the previous page
+    - ids: Comma-separated user ids to fetch in one query (max 200, no pagination)
     
     Response:
     {
         "success": true,
         "users": [ {...}, {...} ],
-        "count": 10
+        "count": 10,
+        "next_cursor": "..." | null
     }
     """
     try:
         supabase = get_supabase_client()
         company_id = current_user['company_id']
+        limit = parse_limit(request.args.get('limit'))
         
-        # Build query
-        query = supabase.table('users').select('*').eq('company_id', company_id)
+        # Build query (narrow projection, password_hash is never selected)
+        query = supabase.table('users').select(USER_LIST_FIELDS).eq('company_id', company_id)
+        
+        # Batch lookup by ids replaces one GET /users/<id> per user
+        ids_param = request.args.get('ids')
+        if ids_param:
+            try:
+                ids = parse_id_list(ids_param)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
+            
+            response = query.in_('id', ids).execute()
+            
+            return jsonify({
+                'success': True,
+                'users': response.data,
+                'count': len(response.data),
+                'next_cursor': None
+            }), 200
         
         # Apply filters
         role_filter = request.args.get('role')
@@ -53,18 +216,28 @@ def list_users(current_user):
             is_active = is_active_filter.lower() == 'true'
             query = query.eq('is_active', is_active)
         
-        # Execute query
-        response = query.order('created_at', desc=True).execute()
-        users = response.data
+        # Prefix search (backed by the trigram indexes on name/email)
+        search = sanitize_search_term(request.args.get('q', ''))
+        if search:
+            query = query.or_(f'name.ilike.{search}*,email.ilike.{search}*')
+        
+        try:
+            query = apply_cursor(query, request.args.get('cursor'), 'created_at')
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
         
-        # Remove password_hash from all users
-        for user in users:
-            user.pop('password_hash', None)
+        # Execute query (one extra row tells us whether there is a next page)
+        response = query.limit(limit + 1).execute()
+        users, next_cursor = paginate(response.data, limit, 'created_at')
         
         return jsonify({
             'success': True,
             'users': users,
-            'count': len(users)
+            'count': len(users),
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -89,8 +262,10 @@ def get_user(current_user, user_id):
         supabase = get_supabase_client()
         company_id = current_user['company_id']
         
-        # Fetch user
-        response = supabase.table('users').select('*').eq('id', user_id).eq('company_id', company_id).execute()
+        # Fetch user with manager details embedded (one self-join query)
+        response = supabase.table('users').select(
+            f'{USER_DETAIL_FIELDS}, manager:manager_id(id, name, email)'
+        ).eq('id', user_id).eq('company_id', company_id).execute()
         
         if not response.data:
             return jsonify({
@@ -99,13 +274,8 @@ def get_user(current_user, user_id):
             }), 404
         
         user = response.data[0]
-        user.pop('password_hash', None)
-        
-        # If user has a manager, fetch manager details
-        if user.get('manager_id'):
-            manager_response = supabase.table('users').select('id, name, email').eq('id', user['manager_id']).execute()
-            if manager_response.data:
-                user['manager'] = manager_response.data[0]
+        if user.get('manager') is None:
+            user.pop('manager', None)
         
         return jsonify({
             'success': True,
@@ -121,6 +291,7 @@ def get_user(current_user, user_id):
 @users_bp.route('', methods=['POST'])
 @token_required
 @admin_required
+@rate_limit('create_user', limit=60, window=60, key_funcs=[key_by_user])
 def create_user(current_user):
     """
     Create new user (employee or manager) - Admin only
@@ -191,14 +362,6 @@ def create_user(current_user):
         supabase = get_supabase_client()
         company_id = current_user['company_id']
         
-        # Check if user already exists
-        existing_user = supabase.table('users').select('id').eq('email', email).execute()
-        if existing_user.data:
-            return jsonify({
-                'success': False,
-                'message': 'User with this email already exists'
-            }), 409
-        
         # If manager_id provided, verify it exists and belongs to same company
         if manager_id:
             manager_response = supabase.table('users').select('id, company_id').eq('id', manager_id).execute()
@@ -228,7 +391,16 @@ def create_user(current_user):
             'is_active': True
         }
         
-        user_response = supabase.table('users').insert(user_data).execute()
+        # UNIQUE(email) rejects duplicates, no need to check beforehand
+        try:
+            user_response = supabase.table('users').insert(user_data).execute()
+        except APIError as e:
+            if is_unique_violation(e):
+                return jsonify({
+                    'success': False,
+                    'message': 'User with this email already exists'
+                }), 409
+            raise
         
         if not user_response.data:
             return jsonify({
@@ -251,6 +423,168 @@ def create_user(current_user):
             'message': f'Server error: {str(e)}'
         }), 500
 
+@users_bp.route('/bulk', methods=['POST'])
+@token_required
+@admin_required
+@rate_limit('bulk_users', limit=10, window=3600, key_funcs=[key_by_user])
+def bulk_create_users(current_user):
+    """
+    Create many users at once (employee or manager) - Admin only
+    
+    POST /api/users/bulk
+    Content-Type: application/json | text/csv | multipart/form-data (file)
+    
+    JSON Body:
+    {
+        "users": [
+            {
+                "email": "user@company.com",
+                "password": "SecurePass123",
+                "name": "John Doe",
+                "role": "employee" | "manager",
+                "manager_id": "uuid" (optional),
+                "manager_email": "boss@company.com" (optional, may be a row in the same upload)
+            },
+            ...
+        ]
+    }
+    
+    CSV columns: email,password,name,role,manager_id,manager_email
+    
+    Response:
+    {
+        "success": true,
+        "message": "Created 2 of 3 users",
+        "created": [ {...}, {...} ],
+        "errors": [ {"row": 3, "email": "...", "message": "..."} ],
+        "created_count": 2,
+        "error_count": 1
+    }
+    """
+    try:
+        try:
+            rows = read_bulk_rows()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        if not rows:
+            return jsonify({
+                'success': False,
+                'message': 'No users provided'
+            }), 400
+        
+        if len(rows) > MAX_BULK_USERS:
+            return jsonify({
+                'success': False,
+                'message': f'Too many users. Maximum per request: {MAX_BULK_USERS}'
+            }), 400
+        
+        supabase = get_supabase_client()
+        company_id = current_user['company_id']
+        errors = []
+        
+        # 1. Validate every row up front
+        valid_rows = []
+        seen_emails = set()
+        for row_number, row in enumerate(rows, start=1):
+            row_error = validate_bulk_row(row)
+            email = str(row.get('email') or '').lower().strip()
+            
+            if not row_error and email in seen_emails:
+                row_error = 'Duplicate email in upload'
+            
+            if row_error:
+                errors.append({'row': row_number, 'email': email or None, 'message': row_error})
+                continue
+            
+            seen_emails.add(email)
+            valid_rows.append((row_number, {
+                'email': email,
+                'password': row['password'],
+                'name': str(row['name']).strip(),
+                'role': str(row['role']).lower().strip(),
+                'manager_id': row.get('manager_id') or None,
+                'manager_email': str(row.get('manager_email') or '').lower().strip() or None
+            }))
+        
+        # 2. Resolve all manager references in one query
+        manager_ids = {r['manager_id'] for _, r in valid_rows if r['manager_id']}
+        manager_emails = {r['manager_email'] for _, r in valid_rows if r['manager_email']}
+        known_managers = {}
+        if manager_ids or manager_emails:
+            filters = []
+            if manager_ids:
+                filters.append(f'id.in.({",".join(manager_ids)})')
+            if manager_emails:
+                filters.append(f'email.in.({",".join(manager_emails)})')
+            manager_response = supabase.table('users').select('id, email').eq(
+                'company_id', company_id
+            ).or_(','.join(filters)).execute()
+            for manager in manager_response.data:
+                known_managers[manager['id']] = manager['id']
+                known_managers[manager['email']] = manager['id']
+        
+        pending = []
+        for row_number, row in valid_rows:
+            ref = row['manager_id'] or row['manager_email']
+            if ref and ref not in known_managers and ref not in seen_emails:
+                errors.append({
+                    'row': row_number,
+                    'email': row['email'],
+                    'message': 'Manager not found in your company'
+                })
+                continue
+            pending.append((row_number, row))
+        
+        # 3. Hash all passwords in parallel across cores
+        hashes = hash_passwords([row['password'] for _, row in pending])
+        for (_, row), password_hash in zip(pending, hashes):
+            row['password_hash'] = password_hash
+        
+        # 4. Insert in batches; rows managed by someone in the same upload wait
+        #    for a later wave, once their manager's id is known
+        created = []
+        while pending:
+            ready = [(n, r) for n, r in pending if not r['manager_email'] or r['manager_email'] in known_managers]
+            if not ready:
+                for row_number, row in pending:
+                    errors.append({
+                        'row': row_number,
+                        'email': row['email'],
+                        'message': 'Manager was not created'
+                    })
+                break
+            
+            ready_numbers = {n for n, _ in ready}
+            pending = [(n, r) for n, r in pending if n not in ready_numbers]
+            
+            for start in range(0, len(ready), BULK_INSERT_BATCH_SIZE):
+                batch = ready[start:start + BULK_INSERT_BATCH_SIZE]
+                inserted = insert_bulk_batch(supabase, batch, company_id, known_managers, errors)
+                for user in inserted:
+                    known_managers[user['email']] = user['id']
+                created.extend(inserted)
+        
+        errors.sort(key=lambda e: e['row'])
+        
+        return jsonify({
+            'success': not errors,
+            'message': f'Created {len(created)} of {len(rows)} users',
+            'created': created,
+            'errors': errors,
+            'created_count': len(created),
+            'error_count': len(errors)
+        }), 201 if created else 400
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Server error: {str(e)}'
+        }), 500
+
 @users_bp.route('/<user_id>', methods=['PUT'])
 @token_required
 @admin_required
@@ -352,7 +686,16 @@ def update_user(current_user, user_id):
             }), 400
         
         # Update user
-        update_response = supabase.table('users').update(update_data).eq('id', user_id).execute()
+        # The user_hierarchy trigger rejects manager changes that would create a cycle
+        try:
+            update_response = supabase.table('users').update(update_data).eq('id', user_id).execute()
+        except APIError as e:
+            if is_check_violation(e):
+                return jsonify({
+                    'success': False,
+                    'message': 'Manager assignment would create a reporting cycle'
+                }), 400
+            raise
         
         if not update_response.data:
             return jsonify({
@@ -440,6 +783,7 @@ def delete_user(current_user, user_id):
 @users_bp.route('/<user_id>/password', methods=['PUT'])
 @token_required
 @admin_required
+@rate_limit('reset_password', limit=20, window=60, key_funcs=[key_by_user])
 def reset_password(current_user, user_id):
     """
     Reset user password - Admin only
@@ -0,0 +1,281 @@
+"""
+Approval Workflow Engine
+Matches submitted expenses to approval rules and creates their approvals
+in the background (decisions are evaluated in the database by
+decide_approvals(), see routes/approvals.py)
+"""
+
+import logging
+from bisect import bisect_right
+from decimal import Decimal
+from typing import Dict, List, Optional
+from config.database import get_supabase_client
+from utils.cache import VersionedCache
+from utils.currency import convert_currency
+from utils.jobs import job_handler, job_failure_handler
+from utils.notifications import notify
+from utils.events import publish_event
+
+logger = logging.getLogger(__name__)
+
+# Per-company rule index cache (invalidated by the approval rule routes)
+rule_index_cache = VersionedCache()
+
+# =====================================================
+# RULE INDEX
+# =====================================================
+
+class RuleIndex:
+    """
+    In-memory index of a company's active approval rules
+    
+    Rules are bucketed by category_id (None = rules for every category) and
+    sorted by min_amount within a bucket, so matching is a dict lookup plus
+    a binary search over amount ranges instead of a scan of every rule.
+    """
+    
+    def __init__(self, rules: List[Dict], company_currency: str):
+        self.company_currency = company_currency or 'USD'
+        self.rules_by_id = {}
+        buckets = {}
+        
+        for rule in rules:
+            if not rule.get('approvers'):
+                continue
+            
+            rule['min_amount'] = Decimal(str(rule.get('min_amount') or 0))
+            rule['max_amount'] = Decimal(str(rule['max_amount'])) if rule.get('max_amount') is not None else None
+            rule['approvers'] = sorted(rule['approvers'], key=lambda a: a.get('sequence_order') or 1)
+            
+            self.rules_by_id[rule['id']] = rule
+            buckets.setdefault(rule.get('category_id'), []).append(rule)
+        
+        self._buckets = {}
+        for category_id, bucket in buckets.items():
+            bucket.sort(key=lambda r: r['min_amount'])
+            self._buckets[category_id] = ([r['min_amount'] for r in bucket], bucket)
+    
+    def match(self, category_id: Optional[str], amount: Decimal) -> Optional[Dict]:
+        """
+        Find the rule for an expense
+        Category-specific rules win over company-wide ones; within a bucket the
+        rule with the highest min_amount whose range contains amount wins.
+        Args:
+            category_id: Expense category UUID
+            amount: Expense amount in company currency
+        Returns:
+            Matching rule, or None
+        """
+        for key in (category_id, None):
+            rule = self._match_bucket(key, amount)
+            if rule:
+                return rule
+        return None
+    
+    def _match_bucket(self, key, amount: Decimal) -> Optional[Dict]:
+        """Interval lookup within one category bucket"""
+        bucket = self._buckets.get(key)
+        if not bucket:
+            return None
+        
+        mins, rules = bucket
+        position = bisect_right(mins, amount)
+        for rule in reversed(rules[:position]):
+            if rule['max_amount'] is None or amount <= rule['max_amount']:
+                return rule
+        return None
+
+
+def get_rule_index(company_id: str) -> RuleIndex:
+    """
+    Get the approval rule index of a company (served from the cache)
+    Args:
+        company_id: Company UUID
+    Returns:
+        RuleIndex
+    """
+    def load():
+        supabase = get_supabase_client()
+        rules = supabase.table('approval_rules').select(
+            '*, approvers:approval_rule_approvers(approver_id, sequence_order, is_required)'
+        ).eq('company_id', company_id).eq('is_active', True).execute()
+        company = supabase.table('companies').select('currency').eq('id', company_id).execute()
+        currency = company.data[0]['currency'] if company.data else 'USD'
+        return RuleIndex(rules.data, currency)
+    
+    return rule_index_cache.get(company_id, load)
+
+
+def invalidate_rule_index(company_id: str):
+    """Invalidate the cached rule index of a company after a rule change"""
+    rule_index_cache.invalidate(company_id)
+
+# =====================================================
+# ROUTING
+# =====================================================
+
+def build_approval_rows(expense: Dict, manager_id: Optional[str] = None) -> List[Dict]:
+    """
+    Build the approvals rows for a submitted expense
+    Uses the matching rule; without one, falls back to the submitter's manager.
+    Sequential rules make only the first step 'pending', later steps 'waiting'.
+    Args:
+        expense: Expense row (company_id, user_id, category_id, amount, currency)
+        manager_id: Submitter's manager (fallback approver)
+    Returns:
+        Rows ready for one batched insert into approvals (may be empty)
+    """
+    index = get_rule_index(expense['company_id'])
+    amount = Decimal(str(expense['amount']))
+    
+    # Rule thresholds are in company currency
+    if expense.get('currency') and expense['currency'] != index.company_currency:
+        converted = convert_currency(float(amount), expense['currency'], index.company_currency)
+        if converted is not None:
+            amount = Decimal(str(converted))
+    
+    rule = index.match(expense.get('category_id'), amount)
+    
+    if not rule:
+        if not manager_id or manager_id == expense['user_id']:
+            return []
+        return [{
+            'expense_id': expense['id'],
+            'approver_id': manager_id,
+            'approval_rule_id': None,
+            'status': 'pending',
+            'sequence_order': 1,
+            'is_required': True
+        }]
+    
+    # Submitters never approve their own expense
+    approvers = [a for a in rule['approvers'] if a['approver_id'] != expense['user_id']]
+    if not approvers:
+        return []
+    
+    first_step = approvers[0].get('sequence_order') or 1
+    rows = []
+    for approver in approvers:
+        step = approver.get('sequence_order') or 1
+        rows.append({
+            'expense_id': expense['id'],
+            'approver_id': approver['approver_id'],
+            'approval_rule_id': rule['id'],
+            'status': 'waiting' if rule['is_sequential'] and step != first_step else 'pending',
+            'sequence_order': step,
+            'is_required': bool(approver.get('is_required'))
+        })
+    return rows
+
+
+def route_expense(supabase, expense: Dict, manager_id: Optional[str] = None) -> List[Dict]:
+    """
+    Create the approvals for a submitted expense in one batched insert
+    Falls back to the company admins when there is no rule and no manager;
+    the first admin to decide settles the expense (see decide_approvals()).
+    Returns: created approvals rows (empty if nobody but the submitter could approve)
+    """
+    rows = build_approval_rows(expense, manager_id)
+    
+    if not rows:
+        admins = supabase.table('users').select('id').eq(
+            'company_id', expense['company_id']
+        ).eq('role', 'admin').eq('is_active', True).neq('id', expense['user_id']).execute()
+        rows = [{
+            'expense_id': expense['id'],
+            'approver_id': admin['id'],
+            'approval_rule_id': None,
+            'status': 'pending',
+            'sequence_order': 1,
+            'is_required': False
+        } for admin in admins.data]
+    
+    if not rows:
+        return []
+    
+    return supabase.table('approvals').insert(rows).execute().data
+
+def settle_unroutable(supabase, expense: Dict):
+    """
+    Settle a submitted expense that nobody but its submitter could approve
+    A company's only admin has their own expenses approved; anyone else's
+    expense goes back to draft, since no active approver exists.
+    """
+    submitter = supabase.table('users').select('role').eq('id', expense['user_id']).execute()
+    is_admin = bool(submitter.data) and submitter.data[0]['role'] == 'admin'
+    
+    if not is_admin:
+        return_to_draft(supabase, expense)
+        return
+    
+    result = supabase.table('expenses').update({
+        'status': 'approved'
+    }).eq('id', expense['id']).eq('status', 'submitted').execute()
+    if not result.data:
+        return
+    
+    notify(expense['user_id'], 'expense_approved', expense['id'])
+    publish_event('expense.status', expense['company_id'], {
+        'id': expense['id'],
+        'status': 'approved'
+    }, [expense['user_id']])
+
+def return_to_draft(supabase, expense: Dict):
+    """Send a submitted expense back to its submitter as a draft"""
+    result = supabase.table('expenses').update({
+        'status': 'draft',
+        'submitted_at': None
+    }).eq('id', expense['id']).eq('status', 'submitted').execute()
+    if not result.data:
+        return
+    
+    publish_event('expense.status', expense['company_id'], {
+        'id': expense['id'],
+        'status': 'draft'
+    }, [expense['user_id']])
+
+# =====================================================
+# BACKGROUND JOBS
+# =====================================================
+
+@job_handler('route_approvals')
+def route_approvals_job(payload: Dict):
+    """
+    Create the approvals of a submitted expense and notify the first approvers
+    Payload: {"expense": {...}, "manager_id": "uuid" | null}
+    """
+    supabase = get_supabase_client()
+    expense = payload['expense']
+    
+    # A retried job must not route the same expense twice
+    existing = supabase.table('approvals').select('id').eq('expense_id', expense['id']).limit(1).execute()
+    if existing.data:
+        return
+    
+    approvals = route_expense(supabase, expense, payload.get('manager_id'))
+    if not approvals:
+        settle_unroutable(supabase, expense)
+        return
+    
+    approver_ids = [a['approver_id'] for a in approvals if a['status'] == 'pending']
+    for approver_id in approver_ids:
+        notify(approver_id, 'approval_requested', expense['id'])
+    
+    if approver_ids:
+        publish_event('approval.assigned', expense['company_id'], {'expense_id': expense['id']}, approver_ids)
+
+@job_failure_handler('route_approvals')
+def route_approvals_failed(payload: Dict, error: str):
+    """
+    Routing failed for good: return the expense to its submitter as a draft
+    so it can be submitted again (left alone if approvals were created)
+    """
+    supabase = get_supabase_client()
+    expense = payload['expense']
+    
+    existing = supabase.table('approvals').select('id').eq('expense_id', expense['id']).limit(1).execute()
+    if existing.data:
+        return
+    
+    logger.warning("Approval routing of expense %s failed, returning it to draft: %s", expense['id'], error)
+    return_to_draft(supabase, expense)
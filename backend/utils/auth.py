@@ -4,17 +4,30 @@ Handles JWT token generation, validation, and password hashing
 """
 
 import jwt
+import logging
 import os
 from datetime import datetime, timedelta
 from functools import wraps
+from typing import List
 from flask import request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
+from utils.process_pool import map_in_process, PROCESS_POOL_WORKERS
 
 # JWT Configuration
 JWT_SECRET = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24
 
+# Event stream tokens (EventSource cannot send an Authorization header)
+STREAM_TOKEN_SECRET = f"{JWT_SECRET}:events"
+STREAM_TOKEN_EXPIRATION_SECONDS = 60
+
+# Platform operators (comma-separated admin emails) who may see data across
+# companies, such as job queue stats
+OPERATOR_EMAILS = {email.strip().lower() for email in os.getenv('OPERATOR_EMAILS', '').split(',') if email.strip()}
+
+logger = logging.getLogger(__name__)
+
 def hash_password(password: str) -> str:
     """
     Hash a password using werkzeug's security functions
@@ -25,6 +38,26 @@ def hash_password(password: str) -> str:
     """
     return generate_password_hash(password)
 
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """
+    Hash many passwords in parallel across CPU cores
+    Hashing is CPU-bound, so it runs in the shared process pool
+    (utils/process_pool.py) instead of threads
+    Args:
+        passwords: Plain text passwords
+    Returns:
+        Hashed password strings, in the same order
+    """
+    if len(passwords) < 2 or PROCESS_POOL_WORKERS <= 1:
+        return [hash_password(password) for password in passwords]
+    
+    try:
+        return map_in_process(hash_password, passwords)
+    except Exception as e:
+        # A pool that keeps failing should not fail the request
+        logger.warning("Parallel password hashing failed, hashing sequentially: %s", e)
+        return [hash_password(password) for password in passwords]
+
 def verify_password(password: str, password_hash: str) -> bool:
     """
     Verify a password against its hash
@@ -78,6 +111,38 @@ def decode_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         raise Exception("Invalid token")
 
+def generate_stream_token(current_user: dict) -> str:
+    """
+    Generate a short-lived token for opening an event stream
+    Signed with a separate secret, so it is never accepted as an access token
+    Args:
+        current_user: Decoded access token payload
+    Returns:
+        JWT token string
+    """
+    payload = {
+        'user_id': current_user['user_id'],
+        'role': current_user['role'],
+        'company_id': current_user['company_id'],
+        'exp': datetime.utcnow() + timedelta(seconds=STREAM_TOKEN_EXPIRATION_SECONDS),
+        'iat': datetime.utcnow()
+    }
+    
+    return jwt.encode(payload, STREAM_TOKEN_SECRET, algorithm=JWT_ALGORITHM)
+
+def decode_stream_token(token: str) -> dict:
+    """
+    Decode and verify an event stream token
+    Raises:
+        Exception: If the token is invalid or expired
+    """
+    try:
+        return jwt.decode(token, STREAM_TOKEN_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise Exception("Stream token has expired")
+    except jwt.InvalidTokenError:
+        raise Exception("Invalid stream token")
+
 def token_required(f):
     """
     Decorator to protect routes that require authentication
@@ -136,6 +201,24 @@ def admin_required(f):
     
     return decorated
 
+def operator_required(f):
+    """
+    Decorator to protect routes that expose data of every company
+    Usage: @operator_required on any route function
+    Must be used with @token_required; only admins listed in OPERATOR_EMAILS pass
+    """
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        if current_user.get('role') != 'admin' or str(current_user.get('email') or '').lower() not in OPERATOR_EMAILS:
+            return jsonify({
+                'success': False,
+                'message': 'Operator access required'
+            }), 403
+        
+        return f(current_user, *args, **kwargs)
+    
+    return decorated
+
 def manager_or_admin_required(f):
     """
     Decorator to protect routes that require manager or admin role
@@ -0,0 +1,72 @@
+"""
+Caching Utilities
+In-process per-key caches with versioned invalidation
+"""
+
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+# Cache Configuration
+# TTL bounds how long another worker process can serve data invalidated elsewhere
+CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', 300))
+
+class VersionedCache:
+    """
+    Thread-safe cache of loader results, keyed by e.g. company_id
+    
+    Every key has a version that invalidate() bumps. A load that started
+    before an invalidation is returned to its caller but not stored, so a
+    slow read can never overwrite the cache with pre-write data.
+    """
+    
+    def __init__(self, ttl: int = CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Tuple[int, float, Any]] = {}
+        self._versions: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Get the cached value for key, loading it on a miss
+        Args:
+            key: Cache key
+            loader: Function returning a fresh value for key
+        Returns:
+            Cached or freshly loaded value
+        """
+        now = time.monotonic()
+        
+        with self._lock:
+            version = self._versions.get(key, 0)
+            entry = self._entries.get(key)
+            if entry and entry[0] == version and now - entry[1] < self.ttl:
+                return entry[2]
+        
+        value = loader()
+        
+        with self._lock:
+            # Only store if nothing invalidated the key while we were loading
+            if self._versions.get(key, 0) == version:
+                self._entries[key] = (version, now, value)
+        
+        return value
+    
+    def invalidate(self, key: Hashable):
+        """Drop the cached value for key and bump its version"""
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._entries.pop(key, None)
+    
+    def version(self, key: Hashable) -> int:
+        """Get the current version of key"""
+        with self._lock:
+            return self._versions.get(key, 0)
+    
+    def clear(self):
+        """Drop every cached value"""
+        with self._lock:
+            for key in list(self._entries):
+                self._versions[key] = self._versions.get(key, 0) + 1
+            self._entries.clear()
@@ -3,9 +3,9 @@ Currency and Country Utilities
 Handles country data and currency conversions
 """
 
-import requests
 from typing import Dict, List, Optional
 from functools import lru_cache
+from utils.http_client import get_http_session, HTTP_TIMEOUT
 
 # =====================================================
 # COUNTRY & CURRENCY DATA
@@ -29,9 +29,9 @@ def get_countries_with_currencies() -> List[Dict]:
         ]
     """
     try:
-        response = requests.get(
+        response = get_http_session().get(
             'https://restcountries.com/v3.1/all?fields=name,currencies',
-            timeout=10
+            timeout=HTTP_TIMEOUT
         )
         response.raise_for_status()
         
@@ -140,9 +140,9 @@ def get_exchange_rates(base_currency: str = 'USD') -> Optional[Dict]:
         }
     """
     try:
-        response = requests.get(
+        response = get_http_session().get(
             f'https://api.exchangerate-api.com/v4/latest/{base_currency}',
-            timeout=10
+            timeout=HTTP_TIMEOUT
         )
         response.raise_for_status()
         data = response.json()
@@ -0,0 +1,285 @@
+"""
+Event Streaming
+Fan-out hub for Server-Sent Events, scoped by company and user
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# An open stream parks its server thread in Condition.wait(). Under a
+# gevent worker (gunicorn -k gevent) that is a cheap greenlet; under the
+# sync/threaded servers it is a whole worker thread, so far fewer fit.
+try:
+    from gevent import monkey
+    GREEN_THREADS = monkey.is_module_patched('threading')
+except ImportError:
+    GREEN_THREADS = False
+
+# Event stream Configuration
+EVENTS_BROKER_URL = os.getenv('EVENTS_BROKER_URL')  # e.g. redis://localhost:6379/0 (fan-out across processes)
+EVENTS_CHANNEL = os.getenv('EVENTS_CHANNEL', 'expense-events')
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv('EVENTS_MAX_SUBSCRIBERS', 5000 if GREEN_THREADS else 50))  # open streams per process
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 100))  # undelivered events per stream before a resync
+EVENTS_HISTORY_SIZE = int(os.getenv('EVENTS_HISTORY_SIZE', 500))  # recent events per company for Last-Event-ID
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv('EVENTS_HEARTBEAT_SECONDS', 20))
+EVENTS_MAX_STREAM_SECONDS = float(os.getenv('EVENTS_MAX_STREAM_SECONDS', 300))  # streams are recycled after this
+
+
+class SubscriberLimitReached(Exception):
+    """Raised when a process already serves EVENTS_MAX_SUBSCRIBERS streams"""
+
+# =====================================================
+# HUB
+# =====================================================
+
+class Subscriber:
+    """
+    One open event stream
+    Holds a bounded queue; an idle subscriber costs one blocked wait and
+    is only touched when an event for its company is published.
+    """
+    
+    __slots__ = ('user_id', 'company_id', 'role', 'overflowed', '_events', '_cond')
+    
+    def __init__(self, user_id: str, company_id: str, role: str):
+        self.user_id = user_id
+        self.company_id = company_id
+        self.role = role
+        self.overflowed = False
+        self._events = deque()
+        self._cond = threading.Condition(threading.Lock())
+    
+    def matches(self, event: Dict) -> bool:
+        """Admins see every event of their company, others only their own"""
+        return self.role == 'admin' or self.user_id in event['user_ids']
+    
+    def put(self, event: Dict):
+        with self._cond:
+            if len(self._events) >= EVENTS_QUEUE_SIZE:
+                # A stalled client gets a resync instead of an unbounded queue
+                self._events.clear()
+                self.overflowed = True
+            else:
+                self._events.append(event)
+            self._cond.notify()
+    
+    def get(self, timeout: float) -> Tuple[List[Dict], bool]:
+        """
+        Wait up to timeout seconds for events
+        Returns: (events, overflowed)
+        """
+        with self._cond:
+            if not self._events and not self.overflowed:
+                self._cond.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            overflowed, self.overflowed = self.overflowed, False
+            return events, overflowed
+
+
+class EventHub:
+    """
+    In-process fan-out of events to subscribers, indexed by company
+    Publishing touches only the subscribers of the event's company.
+    """
+    
+    def __init__(self, max_subscribers: int = EVENTS_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._history: Dict[str, deque] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+    
+    def subscribe(self, user_id: str, company_id: str, role: str,
+                  last_event_id: Optional[str] = None) -> Tuple[Subscriber, Optional[List[Dict]]]:
+        """
+        Open a subscription
+        Args:
+            last_event_id: Last event the client saw (EventSource reconnects)
+        Returns:
+            (subscriber, missed events) - missed is None when last_event_id
+            is too old to replay and the client has to resync
+        Raises:
+            SubscriberLimitReached: Process is at EVENTS_MAX_SUBSCRIBERS
+        """
+        subscriber = Subscriber(user_id, company_id, role)
+        
+        # Replay and registration happen under the dispatch lock, so no event
+        # is both replayed and queued, or neither
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise SubscriberLimitReached()
+            
+            missed = []
+            if last_event_id:
+                history = list(self._history.get(company_id, ()))
+                ids = [event['id'] for event in history]
+                if last_event_id in ids:
+                    missed = [e for e in history[ids.index(last_event_id) + 1:] if subscriber.matches(e)]
+                else:
+                    missed = None
+            
+            self._subscribers.setdefault(company_id, set()).add(subscriber)
+            self._count += 1
+        
+        return subscriber, missed
+    
+    def unsubscribe(self, subscriber: Subscriber):
+        """Close a subscription"""
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.company_id)
+            if subscribers and subscriber in subscribers:
+                subscribers.discard(subscriber)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscriber.company_id]
+    
+    def dispatch(self, event: Dict):
+        """Deliver an event to the matching local subscribers"""
+        company_id = event['company_id']
+        
+        with self._lock:
+            history = self._history.get(company_id)
+            if history is None:
+                history = self._history[company_id] = deque(maxlen=EVENTS_HISTORY_SIZE)
+            history.append(event)
+            subscribers = list(self._subscribers.get(company_id, ()))
+        
+        for subscriber in subscribers:
+            if subscriber.matches(event):
+                subscriber.put(event)
+    
+    def stats(self) -> Dict:
+        """Open streams per process, for monitoring"""
+        with self._lock:
+            return {
+                'subscribers': self._count,
+                'companies': len(self._subscribers),
+                'max_subscribers': self.max_subscribers
+            }
+
+
+hub = EventHub()
+
+# =====================================================
+# BROKERS
+# =====================================================
+
+class LocalBroker:
+    """Single-process broker: publishing dispatches straight to the hub"""
+    
+    def publish(self, event: Dict):
+        hub.dispatch(event)
+    
+    def start(self):
+        pass
+
+
+class RedisBroker:
+    """
+    Cross-process broker over Redis pub/sub (optional, requires the `redis` package)
+    Every process runs one listener thread that feeds its local hub, so an
+    event published by a job worker reaches streams served by any process.
+    """
+    
+    def __init__(self, url: str, channel: str = EVENTS_CHANNEL):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._channel = channel
+        self._listener = None
+        self._lock = threading.Lock()
+    
+    def publish(self, event: Dict):
+        self._redis.publish(self._channel, json.dumps(event))
+    
+    def start(self):
+        """Start the listener thread (once per process)"""
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+                self._listener.start()
+    
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel)
+                for message in pubsub.listen():
+                    hub.dispatch(json.loads(message['data']))
+            except Exception as e:
+                logger.warning("Event listener disconnected, reconnecting: %s", e)
+                time.sleep(1)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+def get_broker():
+    """
+    Get the configured event broker
+    Uses Redis when EVENTS_BROKER_URL is set, in-process otherwise
+    """
+    global _broker
+    
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                if EVENTS_BROKER_URL:
+                    try:
+                        _broker = RedisBroker(EVENTS_BROKER_URL)
+                    except Exception as e:
+                        logger.warning("Event broker unavailable, using in-process broker: %s", e)
+                        _broker = LocalBroker()
+                else:
+                    _broker = LocalBroker()
+    
+    return _broker
+
+def set_broker(broker):
+    """Replace the event broker"""
+    global _broker
+    _broker = broker
+
+# =====================================================
+# PUBLISHING
+# =====================================================
+
+def publish_event(event_type: str, company_id: str, data: Dict, user_ids: Iterable[str] = ()):
+    """
+    Publish a status-change event to the open streams
+    Delivery is best effort; clients resync on reconnect.
+    Args:
+        event_type: e.g. 'expense.status', 'approval.assigned'
+        company_id: Company the event belongs to (admins receive all of them)
+        data: JSON-serialisable payload sent to clients
+        user_ids: Other users who should receive the event
+    """
+    event = {
+        'id': uuid.uuid4().hex,
+        'type': event_type,
+        'company_id': company_id,
+        'user_ids': list({user_id for user_id in user_ids if user_id}),
+        'data': data
+    }
+    
+    try:
+        get_broker().publish(event)
+    except Exception as e:
+        logger.warning("Failed to publish %s event: %s", event_type, e)
+
+def format_sse(event_type: str, data: Dict, event_id: Optional[str] = None) -> str:
+    """Serialise one event in text/event-stream format"""
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data)}")
+    return '\n'.join(lines) + '\n\n'
@@ -0,0 +1,55 @@
+"""
+HTTP Client
+Shared keep-alive session for outbound HTTP calls (exchange rates,
+countries, storage downloads), so repeated calls reuse pooled connections
+instead of paying a TCP and TLS handshake every time
+"""
+
+import os
+import threading
+import requests
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# HTTP Client Configuration
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 10))  # hosts with a connection pool
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 20))  # idle connections kept per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))  # seconds
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))  # seconds
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', 2))  # for dropped keep-alive connections and 502/503/504
+
+# (connect, read) timeout for requests calls
+HTTP_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_http_session() -> requests.Session:
+    """
+    Get the shared session (created on first use)
+    Safe to use from any thread: the connection pools are thread-safe and
+    the session keeps no cookies, so no per-call state is shared.
+    """
+    global _session
+    
+    with _session_lock:
+        if _session is None:
+            retries = Retry(
+                total=HTTP_RETRIES,
+                backoff_factor=0.3,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset({'GET', 'HEAD'}),
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_MAXSIZE,
+                max_retries=retries
+            )
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            _session = session
+        return _session
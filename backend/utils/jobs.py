@@ -0,0 +1,343 @@
+"""
+Background Job Queue
+Durable job queue (Postgres `jobs` table claimed with SKIP LOCKED) with an
+in-process worker pool, retries and exponential backoff
+"""
+
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+from config.database import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+# Job queue Configuration
+JOB_QUEUE_BACKEND = os.getenv('JOB_QUEUE_BACKEND', 'postgres')  # postgres | memory
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 1.0))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+JOB_BACKOFF_BASE = float(os.getenv('JOB_BACKOFF_BASE', 2.0))  # seconds
+JOB_BACKOFF_MAX = float(os.getenv('JOB_BACKOFF_MAX', 600.0))  # seconds
+JOB_LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', 300))  # seconds before a running job is reclaimed
+
+# Registered job handlers: job_type -> function(payload)
+_handlers: Dict[str, Callable[[Dict], None]] = {}
+
+# Called once a job has used up its attempts: job_type -> function(payload, error)
+_failure_handlers: Dict[str, Callable[[Dict, str], None]] = {}
+
+# Wakes idle workers when a job is enqueued in this process
+_wakeup = threading.Event()
+
+# =====================================================
+# HANDLER REGISTRY
+# =====================================================
+
+def job_handler(job_type: str):
+    """
+    Decorator to register a background job handler
+    Usage:
+        @job_handler('route_approvals')
+        def route_approvals_job(payload): ...
+    Handlers raise to signal failure; the job is then retried with backoff.
+    """
+    def decorator(f):
+        _handlers[job_type] = f
+        return f
+    return decorator
+
+def job_failure_handler(job_type: str):
+    """
+    Decorator to register what happens when a job has failed for good
+    Usage:
+        @job_failure_handler('route_approvals')
+        def route_approvals_failed(payload, error): ...
+    Runs once, after the last attempt; use it to leave the job's data in
+    a state users can recover from.
+    """
+    def decorator(f):
+        _failure_handlers[job_type] = f
+        return f
+    return decorator
+
+def backoff_delay(attempts: int) -> float:
+    """
+    Delay before the next attempt (exponential backoff with jitter)
+    Args:
+        attempts: Attempts made so far
+    Returns:
+        Delay in seconds
+    """
+    delay = min(JOB_BACKOFF_BASE * (2 ** max(attempts - 1, 0)), JOB_BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+# =====================================================
+# BACKENDS
+# =====================================================
+
+class PostgresJobBackend:
+    """
+    Durable backend on the `jobs` table
+    Jobs are claimed by claim_jobs(), which uses FOR UPDATE SKIP LOCKED so
+    several workers (and processes) never pick the same job.
+    """
+    
+    def enqueue(self, job_type: str, payload: Dict, run_at: Optional[datetime], max_attempts: int) -> Dict:
+        row = {
+            'job_type': job_type,
+            'payload': payload,
+            'max_attempts': max_attempts
+        }
+        if run_at:
+            row['run_at'] = run_at.isoformat()
+        return get_supabase_client().table('jobs').insert(row).execute().data[0]
+    
+    def claim(self, worker_id: str, limit: int) -> List[Dict]:
+        response = get_supabase_client().rpc('claim_jobs', {
+            'p_worker': worker_id,
+            'p_limit': limit,
+            'p_lock_timeout_seconds': JOB_LOCK_TIMEOUT
+        }).execute()
+        return response.data or []
+    
+    def complete(self, job: Dict):
+        get_supabase_client().table('jobs').delete().eq('id', job['id']).execute()
+    
+    def fail(self, job: Dict, error: str, retry_at: Optional[datetime]):
+        update = {
+            'status': 'queued' if retry_at else 'failed',
+            'last_error': error[:2000],
+            'locked_by': None,
+            'locked_at': None
+        }
+        if retry_at:
+            update['run_at'] = retry_at.isoformat()
+        get_supabase_client().table('jobs').update(update).eq('id', job['id']).execute()
+    
+    def stats(self) -> Dict:
+        return get_supabase_client().rpc('job_queue_stats', {}).execute().data or {}
+
+
+class MemoryJobBackend:
+    """
+    In-process stand-in for development and tests (not durable)
+    """
+    
+    def __init__(self):
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+    
+    def enqueue(self, job_type: str, payload: Dict, run_at: Optional[datetime], max_attempts: int) -> Dict:
+        job = {
+            'id': str(uuid.uuid4()),
+            'job_type': job_type,
+            'payload': payload,
+            'status': 'queued',
+            'attempts': 0,
+            'max_attempts': max_attempts,
+            'run_at': run_at or datetime.now(timezone.utc),
+            'locked_by': None,
+            'locked_at': None,
+            'last_error': None
+        }
+        with self._lock:
+            self._jobs[job['id']] = job
+        return dict(job)
+    
+    def claim(self, worker_id: str, limit: int) -> List[Dict]:
+        now = datetime.now(timezone.utc)
+        stale = now - timedelta(seconds=JOB_LOCK_TIMEOUT)
+        with self._lock:
+            ready = [
+                job for job in self._jobs.values()
+                if (job['status'] == 'queued' and job['run_at'] <= now)
+                or (job['status'] == 'running' and job['locked_at'] < stale)
+            ]
+            ready.sort(key=lambda job: job['run_at'])
+            claimed = ready[:limit]
+            for job in claimed:
+                job.update(status='running', locked_by=worker_id, locked_at=now, attempts=job['attempts'] + 1)
+            return [dict(job) for job in claimed]
+    
+    def complete(self, job: Dict):
+        with self._lock:
+            self._jobs.pop(job['id'], None)
+    
+    def fail(self, job: Dict, error: str, retry_at: Optional[datetime]):
+        with self._lock:
+            stored = self._jobs.get(job['id'])
+            if stored:
+                stored.update(
+                    status='queued' if retry_at else 'failed',
+                    last_error=error[:2000],
+                    locked_by=None,
+                    locked_at=None,
+                    run_at=retry_at or stored['run_at']
+                )
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        by_type = {}
+        for job in jobs:
+            counts = by_type.setdefault(job['job_type'], {'queued': 0, 'running': 0, 'failed': 0})
+            counts[job['status']] += 1
+        queued = [job for job in jobs if job['status'] == 'queued']
+        oldest = min((job['run_at'] for job in queued), default=None)
+        return {
+            'queued': len(queued),
+            'running': len([job for job in jobs if job['status'] == 'running']),
+            'failed': len([job for job in jobs if job['status'] == 'failed']),
+            'oldest_queued_at': oldest.isoformat() if oldest else None,
+            'by_type': by_type
+        }
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_job_backend():
+    """Get the configured job backend (Postgres by default, memory for dev/tests)"""
+    global _backend
+    
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = MemoryJobBackend() if JOB_QUEUE_BACKEND == 'memory' else PostgresJobBackend()
+    
+    return _backend
+
+def set_job_backend(backend):
+    """Replace the job backend (e.g. a MemoryJobBackend in tests)"""
+    global _backend
+    _backend = backend
+
+# =====================================================
+# QUEUE API
+# =====================================================
+
+def enqueue(job_type: str, payload: Dict, delay: float = 0, max_attempts: int = JOB_MAX_ATTEMPTS) -> Dict:
+    """
+    Enqueue a background job
+    Args:
+        job_type: Registered handler name
+        payload: JSON-serialisable job data
+        delay: Seconds to wait before the job becomes runnable
+        max_attempts: Attempts before the job is marked failed
+    Returns:
+        Job row
+    """
+    run_at = datetime.now(timezone.utc) + timedelta(seconds=delay) if delay else None
+    job = get_job_backend().enqueue(job_type, payload, run_at, max_attempts)
+    _wakeup.set()
+    return job
+
+def queue_stats() -> Dict:
+    """
+    Get queue depth for monitoring
+    Returns:
+        {"queued": 3, "running": 1, "failed": 0, "oldest_queued_at": "...", "by_type": {...}}
+    """
+    return get_job_backend().stats()
+
+def run_job(job: Dict):
+    """Execute one claimed job and record its outcome"""
+    backend = get_job_backend()
+    handler = _handlers.get(job['job_type'])
+    
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job type '{job['job_type']}'")
+        handler(job.get('payload') or {})
+        backend.complete(job)
+    except Exception as e:
+        error = f"{type(e).__name__}: {str(e)}"
+        attempts = job.get('attempts') or 1
+        retry_at = None
+        if attempts < (job.get('max_attempts') or JOB_MAX_ATTEMPTS):
+            retry_at = datetime.now(timezone.utc) + timedelta(seconds=backoff_delay(attempts))
+        if retry_at is None:
+            logger.exception("Job %s (%s) failed on attempt %s, giving up: %s", job['id'], job['job_type'], attempts, error)
+        else:
+            logger.warning("Job %s (%s) failed on attempt %s: %s", job['id'], job['job_type'], attempts, error)
+        backend.fail(job, error, retry_at)
+        
+        failure_handler = _failure_handlers.get(job['job_type'])
+        if retry_at is None and failure_handler:
+            try:
+                failure_handler(job.get('payload') or {}, error)
+            except Exception as hook_error:
+                logger.exception("Failure handler of job %s (%s) failed: %s", job['id'], job['job_type'], hook_error)
+
+# =====================================================
+# WORKER POOL
+# =====================================================
+
+class JobWorkerPool:
+    """
+    In-process pool of worker threads claiming and running jobs
+    """
+    
+    def __init__(self, workers: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._prefix = f"{socket.gethostname()}:{os.getpid()}"
+    
+    def start(self):
+        """Start the worker threads"""
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._run,
+                args=(f"{self._prefix}:{index}",),
+                name=f"job-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+    
+    def stop(self, timeout: float = 5.0):
+        """Stop the worker threads after their current job"""
+        self._stop.set()
+        _wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+    
+    def _run(self, worker_id: str):
+        backend = get_job_backend()
+        while not self._stop.is_set():
+            try:
+                jobs = backend.claim(worker_id, 1)
+            except Exception as e:
+                logger.warning("Job worker %s could not claim jobs: %s", worker_id, e)
+                jobs = []
+            
+            if not jobs:
+                _wakeup.wait(self.poll_interval)
+                _wakeup.clear()
+                continue
+            
+            for job in jobs:
+                run_job(job)
+
+
+_pool = None
+
+def start_workers(workers: int = JOB_WORKERS) -> Optional[JobWorkerPool]:
+    """
+    Start the in-process worker pool once per process
+    Returns: the pool, or None when JOB_WORKERS is 0 (jobs run elsewhere)
+    """
+    global _pool
+    
+    if _pool is None and workers > 0:
+        _pool = JobWorkerPool(workers)
+        _pool.start()
+    
+    return _pool
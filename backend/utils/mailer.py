@@ -0,0 +1,182 @@
+"""
+Email Delivery
+Pooled SMTP connection with batch sending, plus logging and in-memory
+stand-ins
+"""
+
+import logging
+import os
+import smtplib
+import threading
+import time
+from collections import deque
+from email.message import EmailMessage
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Email Configuration
+SMTP_HOST = os.getenv('SMTP_HOST')
+SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
+SMTP_USERNAME = os.getenv('SMTP_USERNAME')
+SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
+SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'True').lower() == 'true'
+SMTP_USE_SSL = os.getenv('SMTP_USE_SSL', 'False').lower() == 'true'
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', 10))
+SMTP_IDLE_TIMEOUT = float(os.getenv('SMTP_IDLE_TIMEOUT', 60))  # seconds an unused connection is kept
+EMAIL_FROM = os.getenv('EMAIL_FROM', 'no-reply@expense-manager.local')
+# smtp (SMTP_HOST), log (messages are logged and dropped) or memory (tests)
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'smtp' if SMTP_HOST else 'log')
+EMAIL_OUTBOX_SIZE = int(os.getenv('EMAIL_OUTBOX_SIZE', 1000))  # messages MemoryMailer keeps
+
+
+def build_message(to: str, subject: str, body: str) -> EmailMessage:
+    """Build a plain-text email from the configured sender"""
+    message = EmailMessage()
+    message['From'] = EMAIL_FROM
+    message['To'] = to
+    message['Subject'] = subject
+    message.set_content(body)
+    return message
+
+
+class SMTPMailer:
+    """
+    Sends batches of messages over one reused SMTP connection
+    
+    The connection is opened on first use, checked with NOOP when it has
+    been idle, and reopened once if the server drops it mid-batch.
+    """
+    
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT,
+                 username: Optional[str] = SMTP_USERNAME, password: Optional[str] = SMTP_PASSWORD,
+                 use_tls: bool = SMTP_USE_TLS, use_ssl: bool = SMTP_USE_SSL):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self._connection = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+    
+    def send_messages(self, messages: List[EmailMessage]) -> int:
+        """
+        Send messages over the pooled connection
+        Recipients the server refuses are skipped; connection errors raise.
+        Returns: Number of messages sent
+        """
+        if not messages:
+            return 0
+        
+        sent = 0
+        with self._lock:
+            for message in messages:
+                try:
+                    self._send(message)
+                    sent += 1
+                except smtplib.SMTPRecipientsRefused as e:
+                    logger.warning("Email to %s refused: %s", message['To'], e.recipients)
+            self._last_used = time.monotonic()
+        
+        return sent
+    
+    def close(self):
+        """Close the pooled connection"""
+        with self._lock:
+            self._disconnect()
+    
+    def _send(self, message: EmailMessage):
+        try:
+            self._connect().send_message(message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # The server closed an idle connection; retry once on a fresh one
+            self._disconnect()
+            self._connect().send_message(message)
+    
+    def _connect(self):
+        if self._connection is not None and time.monotonic() - self._last_used > SMTP_IDLE_TIMEOUT:
+            try:
+                if self._connection.noop()[0] != 250:
+                    self._disconnect()
+            except (smtplib.SMTPException, OSError):
+                self._disconnect()
+        
+        if self._connection is None:
+            if self.use_ssl:
+                connection = smtplib.SMTP_SSL(self.host, self.port, timeout=SMTP_TIMEOUT)
+            else:
+                connection = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+                if self.use_tls:
+                    connection.starttls()
+            if self.username:
+                connection.login(self.username, self.password)
+            self._connection = connection
+        
+        return self._connection
+    
+    def _disconnect(self):
+        if self._connection is not None:
+            try:
+                self._connection.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._connection = None
+
+
+class LogMailer:
+    """
+    Default without SMTP: logs each message and drops it
+    """
+    
+    def send_messages(self, messages: List[EmailMessage]) -> int:
+        for message in messages:
+            logger.info("Email not sent (no SMTP_HOST): %s to %s", message['Subject'], message['To'])
+        return len(messages)
+    
+    def close(self):
+        pass
+
+
+class MemoryMailer:
+    """
+    Test stand-in that keeps the last EMAIL_OUTBOX_SIZE sent messages
+    """
+    
+    def __init__(self, size: int = EMAIL_OUTBOX_SIZE):
+        self.outbox = deque(maxlen=size)
+        self._lock = threading.Lock()
+    
+    def send_messages(self, messages: List[EmailMessage]) -> int:
+        with self._lock:
+            self.outbox.extend(messages)
+        return len(messages)
+    
+    def close(self):
+        pass
+
+
+_mailer = None
+_mailer_lock = threading.Lock()
+
+def get_mailer():
+    """Get the configured mailer (SMTP when SMTP_HOST is set, logging otherwise)"""
+    global _mailer
+    
+    if _mailer is None:
+        with _mailer_lock:
+            if _mailer is None:
+                if EMAIL_BACKEND == 'smtp':
+                    _mailer = SMTPMailer()
+                elif EMAIL_BACKEND == 'memory':
+                    _mailer = MemoryMailer()
+                else:
+                    _mailer = LogMailer()
+    
+    return _mailer
+
+def set_mailer(mailer):
+    """Replace the mailer (e.g. a MemoryMailer in tests)"""
+    global _mailer
+    _mailer = mailer
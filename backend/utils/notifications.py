@@ -0,0 +1,264 @@
+"""
+Notifications
+Buffers notification events, collapses them into per-recipient digests and
+delivers them in batches: one bulk insert of in-app notifications and one
+digest email per recipient over a pooled SMTP connection
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from config.database import get_supabase_client
+from utils.jobs import job_handler, enqueue, backoff_delay
+from utils.mailer import build_message, get_mailer
+
+logger = logging.getLogger(__name__)
+
+# Notification Configuration
+NOTIFICATION_FLUSH_INTERVAL = float(os.getenv('NOTIFICATION_FLUSH_INTERVAL', 60))  # seconds per digest window
+NOTIFICATION_MAX_BUFFER = int(os.getenv('NOTIFICATION_MAX_BUFFER', 1000))  # events that force an early flush
+NOTIFICATION_BATCH_SIZE = int(os.getenv('NOTIFICATION_BATCH_SIZE', 100))  # recipients per delivery job
+
+NOTIFICATION_TYPES = ['approval_requested', 'expense_approved', 'expense_rejected']
+
+# Ids per in_() lookup (keeps PostgREST request URLs short)
+LOOKUP_CHUNK_SIZE = 200
+
+# =====================================================
+# BUFFER
+# =====================================================
+
+class NotificationBuffer:
+    """
+    In-process buffer of notification events
+    
+    Events are de-duplicated on (user_id, type, expense_id) and flushed every
+    flush_interval seconds, or early once max_events are waiting. A flush
+    groups events by recipient and hands them to durable delivery jobs, so
+    an approver receiving 200 submissions in one window gets one digest.
+    """
+    
+    def __init__(self, flush_interval: float = NOTIFICATION_FLUSH_INTERVAL, max_events: int = NOTIFICATION_MAX_BUFFER):
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        self._events: Dict[tuple, Dict] = {}
+        self._lock = threading.Lock()
+        self._full = threading.Event()
+        self._thread = None
+    
+    def add(self, event: Dict):
+        """Buffer one event (starts the flusher thread on first use)"""
+        key = (event['user_id'], event['type'], event.get('expense_id'))
+        
+        with self._lock:
+            self._events.setdefault(key, event)
+            size = len(self._events)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='notification-flusher', daemon=True)
+                self._thread.start()
+        
+        if size >= self.max_events:
+            self._full.set()
+    
+    def flush(self) -> int:
+        """
+        Hand every buffered event to the delivery jobs
+        Returns: Number of events flushed
+        """
+        with self._lock:
+            events = list(self._events.values())
+            self._events = {}
+        
+        if not events:
+            return 0
+        
+        try:
+            enqueue_deliveries(events)
+        except Exception:
+            # Keep the events for the next flush
+            with self._lock:
+                for event in events:
+                    self._events.setdefault((event['user_id'], event['type'], event.get('expense_id')), event)
+            raise
+        
+        return len(events)
+    
+    def _run(self):
+        while True:
+            self._full.wait(self.flush_interval)
+            self._full.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("Notification flush failed: %s", e)
+                time.sleep(self.flush_interval)
+
+
+_buffer = NotificationBuffer()
+
+def notify(user_id: str, notification_type: str, expense_id: Optional[str] = None):
+    """
+    Queue a notification for the recipient's next digest
+    Args:
+        user_id: Recipient UUID
+        notification_type: One of NOTIFICATION_TYPES
+        expense_id: Expense the notification is about
+    """
+    if notification_type not in NOTIFICATION_TYPES:
+        raise ValueError(f"Unknown notification type '{notification_type}'")
+    
+    _buffer.add({
+        'user_id': user_id,
+        'type': notification_type,
+        'expense_id': expense_id
+    })
+
+def flush_notifications() -> int:
+    """Flush buffered notifications now (also runs at interpreter exit)"""
+    return _buffer.flush()
+
+atexit.register(flush_notifications)
+
+# =====================================================
+# DELIVERY
+# =====================================================
+
+def group_by_recipient(events: Iterable[Dict]) -> List[Dict]:
+    """
+    Collapse events into one digest per recipient
+    Returns: [{"user_id": "uuid", "events": [{"type": ..., "expense_id": ...}]}]
+    """
+    digests = {}
+    for event in events:
+        digests.setdefault(event['user_id'], []).append({
+            'type': event['type'],
+            'expense_id': event.get('expense_id')
+        })
+    return [{'user_id': user_id, 'events': items} for user_id, items in digests.items()]
+
+def enqueue_deliveries(events: List[Dict]):
+    """
+    Enqueue the delivery jobs for a flushed set of events
+    In-app rows and emails are separate jobs so a retried email batch never
+    inserts the in-app notifications twice.
+    """
+    digests = group_by_recipient(events)
+    
+    for start in range(0, len(digests), NOTIFICATION_BATCH_SIZE):
+        batch = digests[start:start + NOTIFICATION_BATCH_SIZE]
+        enqueue('store_notifications', {
+            'notifications': [
+                {'user_id': digest['user_id'], 'type': event['type'], 'expense_id': event['expense_id']}
+                for digest in batch for event in digest['events']
+            ]
+        })
+        enqueue('email_digests', {'digests': batch})
+
+def fetch_by_ids(supabase, table: str, columns: str, ids: List[str]) -> Dict[str, Dict]:
+    """Load rows by id in chunked in_() queries, keyed by id"""
+    rows = {}
+    ids = list(dict.fromkeys(i for i in ids if i))
+    for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+        response = supabase.table(table).select(columns).in_('id', ids[start:start + LOOKUP_CHUNK_SIZE]).execute()
+        rows.update((row['id'], row) for row in response.data)
+    return rows
+
+def describe_expense(expense: Dict) -> str:
+    """One digest line for an expense"""
+    submitter = (expense.get('submitter') or {}).get('name')
+    line = f"{expense.get('description') or 'Expense'} - {expense['amount']} {expense['currency']}"
+    return f"{line} ({submitter})" if submitter else line
+
+def build_digest_email(user: Dict, events: List[Dict], expenses: Dict[str, Dict]):
+    """
+    Build the digest email of one recipient
+    Returns: EmailMessage, or None when none of the expenses still exist
+    """
+    requested = [expenses[e['expense_id']] for e in events
+                 if e['type'] == 'approval_requested' and e['expense_id'] in expenses]
+    decided = [(expenses[e['expense_id']], e['type'].split('_')[1]) for e in events
+               if e['type'] != 'approval_requested' and e['expense_id'] in expenses]
+    
+    if not requested and not decided:
+        return None
+    
+    lines = [f"Hi {user.get('name') or user['email']},", '']
+    
+    if requested:
+        lines.append(f"{len(requested)} expense(s) are waiting for your approval:")
+        lines.extend(f"  - {describe_expense(expense)}" for expense in requested)
+        lines.append('')
+    
+    if decided:
+        lines.append('Updates on your expenses:')
+        lines.extend(f"  - {describe_expense(expense)}: {outcome}" for expense, outcome in decided)
+        lines.append('')
+    
+    if requested and not decided:
+        subject = f"{len(requested)} expense(s) awaiting your approval"
+    elif decided and not requested:
+        subject = f"{len(decided)} expense update(s)"
+    else:
+        subject = f"{len(requested) + len(decided)} expense notifications"
+    
+    return build_message(user['email'], subject, '\n'.join(lines))
+
+# =====================================================
+# BACKGROUND JOBS
+# =====================================================
+
+@job_handler('store_notifications')
+def store_notifications_job(payload: Dict):
+    """
+    Insert a batch of in-app notifications in one statement
+    Payload: {"notifications": [{"user_id": ..., "type": ..., "expense_id": ...}]}
+    """
+    rows = payload.get('notifications') or []
+    if rows:
+        get_supabase_client().table('notifications').insert(rows).execute()
+
+
+@job_handler('email_digests')
+def email_digests_job(payload: Dict):
+    """
+    Send one digest email per recipient over the pooled SMTP connection
+    (recipients and expenses are loaded in batched lookups). If the
+    connection fails partway, the unsent digests move to a new job instead
+    of the whole batch being retried.
+    Payload: {"digests": [{"user_id": "uuid", "events": [...]}]}
+    """
+    digests = payload.get('digests') or []
+    if not digests:
+        return
+    
+    supabase = get_supabase_client()
+    users = fetch_by_ids(supabase, 'users', 'id, name, email, is_active', [d['user_id'] for d in digests])
+    expenses = fetch_by_ids(
+        supabase, 'expenses', 'id, amount, currency, description, status, submitter:users!user_id(name)',
+        [e['expense_id'] for d in digests for e in d['events']]
+    )
+    
+    pending = []
+    for digest in digests:
+        user = users.get(digest['user_id'])
+        if not user or not user.get('is_active') or not user.get('email'):
+            continue
+        message = build_digest_email(user, digest['events'], expenses)
+        if message:
+            pending.append((digest, message))
+    
+    mailer = get_mailer()
+    for position, (digest, message) in enumerate(pending):
+        try:
+            mailer.send_messages([message])
+        except Exception as e:
+            if position == 0:
+                raise
+            # Hand only the unsent digests to a new job, so a retry never
+            # mails the recipients who already got theirs
+            logger.warning("Digest email batch interrupted after %s message(s), requeueing the rest: %s", position, e)
+            enqueue('email_digests', {'digests': [d for d, _ in pending[position:]]}, delay=backoff_delay(1))
+            return
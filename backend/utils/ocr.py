@@ -0,0 +1,245 @@
+"""
+Receipt OCR
+Extracts amount, date, currency and merchant suggestions from receipt
+images with a local Tesseract engine. OCR runs in the worker process pool
+and results are cached per company by the receipt's content hash, so a
+duplicate receipt is never read twice.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional
+from dateutil import parser as date_parser
+from config.database import get_supabase_client
+from utils.currency import get_currency_list
+from utils.jobs import job_handler
+from utils.process_pool import run_in_process
+from utils.storage import get_storage
+from utils.uploads import UPLOAD_TMP_DIR
+
+# OCR Configuration
+OCR_ENABLED = os.getenv('OCR_ENABLED', 'True').lower() == 'true'
+OCR_LANGUAGES = os.getenv('OCR_LANGUAGES', 'eng')  # tesseract -l value, e.g. eng+deu
+TESSERACT_CMD = os.getenv('TESSERACT_CMD')  # None = tesseract on PATH
+OCR_MAX_DIMENSION = int(os.getenv('OCR_MAX_DIMENSION', 2500))  # pixels; larger scans are downsized first
+
+# Formats tesseract reads directly (PDF receipts are not OCR'd)
+OCR_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+CURRENCY_SYMBOLS = {'$': 'USD', '€': 'EUR', '£': 'GBP', '₹': 'INR', '¥': 'JPY'}
+TOTAL_KEYWORDS = re.compile(r'\b(grand\s+total|total|amount\s+due|balance\s+due|to\s+pay)\b', re.IGNORECASE)
+SUBTOTAL_KEYWORDS = re.compile(r'\b(sub\s*-?\s*total|tax|vat|tip|change|cash)\b', re.IGNORECASE)
+AMOUNT_PATTERN = re.compile(r'(?<![\d.,])(\d{1,3}(?:[,.]\d{3})+[.,]\d{2}|\d+[.,]\d{2})(?!\d)')
+# A three-letter code directly before or after an amount ("EUR 12.50", "12,50 EUR")
+CODE_AMOUNT_PATTERN = re.compile(r'\b([A-Z]{3})\s?\d[\d.,]*[.,]\d{2}(?!\d)|\d[.,]\d{2}\s?([A-Z]{3})\b')
+DATE_PATTERN = re.compile(
+    r'\b(\d{4}[-/.]\d{1,2}[-/.]\d{1,2}'
+    r'|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}'
+    r'|\d{1,2}\s+[A-Za-z]{3,9}\.?,?\s+\d{2,4}'
+    r'|[A-Za-z]{3,9}\.?\s+\d{1,2},?\s+\d{2,4})\b'
+)
+
+# =====================================================
+# OCR (runs in the worker process pool)
+# =====================================================
+
+def ocr_image(source_path: str, languages: str, max_dimension: int, tesseract_cmd: Optional[str]) -> str:
+    """
+    Read the text of a receipt image
+    Module-level so it can be pickled into the process pool.
+    """
+    import pytesseract
+    from PIL import Image, ImageOps
+    
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    
+    try:
+        image = Image.open(source_path)
+    except Image.DecompressionBombError as e:
+        # Re-raised as ValueError so the extraction is recorded as failed
+        raise ValueError(f"Image too large: {str(e)}") from None
+    
+    with image:
+        image.draft('L', (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        # Grayscale with stretched contrast reads better than raw photos
+        image = ImageOps.autocontrast(image.convert('L'))
+        image.thumbnail((max_dimension, max_dimension))
+        return pytesseract.image_to_string(image, lang=languages)
+
+# =====================================================
+# PARSING
+# =====================================================
+
+def parse_amount(value: str) -> Optional[Decimal]:
+    """Parse '1,234.56', '1.234,56' or '12,50' (the last separator is decimal)"""
+    integer_part = re.sub(r'[.,]', '', value[:-3])
+    try:
+        return Decimal(f"{integer_part}.{value[-2:]}")
+    except InvalidOperation:
+        return None
+
+def find_amount(lines: List[str]) -> Optional[Decimal]:
+    """Amount on the last 'total' line, else the largest amount on the receipt"""
+    total = None
+    largest = None
+    for line in lines:
+        amounts = [a for a in (parse_amount(m) for m in AMOUNT_PATTERN.findall(line)) if a is not None]
+        if not amounts:
+            continue
+        largest = max(amounts + ([largest] if largest is not None else []))
+        if TOTAL_KEYWORDS.search(line) and not SUBTOTAL_KEYWORDS.search(line):
+            total = amounts[-1]
+    return total if total is not None else largest
+
+def find_date(text: str) -> Optional[date]:
+    """First plausible purchase date (not in the future, at most two years old)"""
+    today = date.today()
+    for match in DATE_PATTERN.findall(text):
+        # 03/04/2026 is ambiguous: month-first, then day-first
+        for dayfirst in (False, True):
+            try:
+                parsed = date_parser.parse(match, dayfirst=dayfirst, fuzzy=True).date()
+            except (ValueError, OverflowError):
+                continue
+            if today - timedelta(days=730) <= parsed <= today:
+                return parsed
+    return None
+
+def codes_next_to_amounts(line: str, known_codes: set, before: bool = True) -> List[str]:
+    """ISO codes printed directly after (or, if before, also before) an amount on a line"""
+    codes = []
+    for match in CODE_AMOUNT_PATTERN.finditer(line):
+        code = match.group(2) or (match.group(1) if before else None)
+        if code in known_codes:
+            codes.append(code)
+    return codes
+
+def find_currency(lines: List[str], known_codes: set) -> Optional[str]:
+    """
+    Currency of the receipt
+    A bare three-letter word is not enough (CUP, ALL, TOP and PEN are
+    ISO codes too): an ISO code next to the total wins, then a currency
+    symbol, then an ISO code after any amount ("1 CUP 3.50" is a unit,
+    "3,50 EUR" a currency).
+    """
+    for line in lines:
+        if TOTAL_KEYWORDS.search(line) and not SUBTOTAL_KEYWORDS.search(line):
+            codes = codes_next_to_amounts(line, known_codes)
+            if codes:
+                return codes[-1]
+    text = '\n'.join(lines)
+    for symbol, code in CURRENCY_SYMBOLS.items():
+        if symbol in text:
+            return code
+    for line in lines:
+        codes = codes_next_to_amounts(line, known_codes, before=False)
+        if codes:
+            return codes[0]
+    return None
+
+def find_merchant(lines: List[str]) -> Optional[str]:
+    """Merchant name: the first line of the header that reads like words"""
+    for line in lines[:8]:
+        if len(re.findall(r'[A-Za-z]', line)) >= 3 and not DATE_PATTERN.search(line):
+            return line[:100]
+    return None
+
+def extract_suggestions(text: str, known_codes: set) -> Dict:
+    """
+    Turn OCR text into create_expense suggestions
+    Returns: {"amount": "12.50" | null, "currency": "EUR" | null,
+              "expense_date": "2025-01-15" | null, "description": "..." | null}
+    """
+    lines = [re.sub(r'\s+', ' ', line).strip() for line in text.splitlines()]
+    lines = [line for line in lines if line]
+    
+    amount = find_amount(lines)
+    expense_date = find_date(text)
+    return {
+        'amount': str(amount) if amount is not None else None,
+        'currency': find_currency(lines, known_codes),
+        'expense_date': expense_date.isoformat() if expense_date else None,
+        'description': find_merchant(lines)
+    }
+
+# =====================================================
+# CACHE LOOKUP
+# =====================================================
+
+def get_cached_extraction(company_id: str, content_hash: Optional[str]) -> Optional[Dict]:
+    """Stored OCR result of a receipt's content, or None if not read yet"""
+    if not content_hash:
+        return None
+    result = get_supabase_client().table('receipt_extractions').select(
+        'status, suggestions, error'
+    ).eq('company_id', company_id).eq('content_hash', content_hash).execute()
+    return result.data[0] if result.data else None
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 of a local file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# =====================================================
+# BACKGROUND JOBS
+# =====================================================
+
+@job_handler('extract_receipt')
+def extract_receipt_job(payload: Dict):
+    """
+    OCR one uploaded receipt (skipped when its content was read before)
+    Payload: {"receipt_id": "uuid"}
+    """
+    supabase = get_supabase_client()
+    
+    result = supabase.table('receipts').select(
+        'id, company_id, path, content_hash'
+    ).eq('id', payload['receipt_id']).execute()
+    if not result.data:
+        return
+    receipt = result.data[0]
+    
+    if get_cached_extraction(receipt['company_id'], receipt['content_hash']):
+        return
+    
+    with tempfile.TemporaryDirectory(prefix='ocr-', dir=UPLOAD_TMP_DIR) as workdir:
+        source = os.path.join(workdir, 'original')
+        get_storage().download_to(receipt['path'], source)
+        
+        # Signed direct uploads are hashed here, on first read
+        if not receipt['content_hash']:
+            receipt['content_hash'] = file_sha256(source)
+            supabase.table('receipts').update({
+                'content_hash': receipt['content_hash']
+            }).eq('id', receipt['id']).execute()
+            if get_cached_extraction(receipt['company_id'], receipt['content_hash']):
+                return
+        
+        try:
+            text = run_in_process(ocr_image, source, OCR_LANGUAGES, OCR_MAX_DIMENSION, TESSERACT_CMD)
+            row = {
+                'status': 'done',
+                'text': text,
+                'suggestions': extract_suggestions(text, {c['code'] for c in get_currency_list()}),
+                'error': None
+            }
+        except (OSError, ValueError, ImportError, RuntimeError) as e:
+            # Unreadable image or no OCR engine installed: retrying will not help
+            row = {
+                'status': 'failed',
+                'text': None,
+                'suggestions': None,
+                'error': f"{type(e).__name__}: {str(e)}"[:2000]
+            }
+    
+    row.update({'company_id': receipt['company_id'], 'content_hash': receipt['content_hash']})
+    supabase.table('receipt_extractions').upsert(row, on_conflict='company_id,content_hash').execute()
@@ -0,0 +1,102 @@
+"""
+Pagination Utilities
+Keyset (cursor) pagination helpers for PostgREST list queries
+"""
+
+import base64
+import json
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def parse_limit(value: Optional[str], default: int = DEFAULT_PAGE_SIZE, maximum: int = MAX_PAGE_SIZE) -> int:
+    """
+    Parse a ?limit= query parameter, clamped to [1, maximum]
+    Args:
+        value: Raw query parameter value
+        default: Page size used when value is missing or invalid
+        maximum: Largest page size allowed
+    Returns:
+        Page size
+    """
+    try:
+        limit = int(value) if value else default
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
+
+def encode_cursor(row: Dict, sort_field: str) -> str:
+    """
+    Encode the position of a row as an opaque cursor
+    Args:
+        row: Last row of the current page
+        sort_field: Column the page is ordered by (id is the tie-breaker)
+    Returns:
+        URL-safe cursor string
+    """
+    payload = json.dumps([row[sort_field], row['id']])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decode a cursor produced by encode_cursor
+    Args:
+        cursor: Cursor string from a previous page
+    Returns:
+        (sort_value, id)
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        row_id = str(uuid.UUID(str(row_id)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    
+    # The value is embedded in a PostgREST logic tree, so reject quoting tricks
+    sort_value = str(sort_value)
+    if '"' in sort_value or '\\' in sort_value:
+        raise ValueError("Invalid cursor")
+    
+    return sort_value, row_id
+
+def apply_cursor(query, cursor: Optional[str], sort_field: str, desc: bool = True):
+    """
+    Order a PostgREST query by (sort_field, id) and seek past the cursor
+    Args:
+        query: Supabase query builder
+        cursor: Cursor from the previous page (or None for the first page)
+        sort_field: Column to order by
+        desc: Newest/largest first when True
+    Returns:
+        Query builder with ordering and keyset filter applied
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        op = 'lt' if desc else 'gt'
+        query = query.or_(
+            f'{sort_field}.{op}."{sort_value}",'
+            f'and({sort_field}.eq."{sort_value}",id.{op}.{row_id})'
+        )
+    
+    return query.order(sort_field, desc=desc).order('id', desc=desc)
+
+def paginate(rows: List[Dict], limit: int, sort_field: str) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Trim a result fetched with limit + 1 rows and build the next cursor
+    Args:
+        rows: Rows returned by the query (up to limit + 1)
+        limit: Requested page size
+        sort_field: Column the page is ordered by
+    Returns:
+        (page_rows, next_cursor or None when this is the last page)
+    """
+    if len(rows) <= limit:
+        return rows, None
+    
+    page = rows[:limit]
+    return page, encode_cursor(page[-1], sort_field)
@@ -0,0 +1,64 @@
+"""
+Process Pool
+Shared worker process pool for CPU-bound work (image processing, OCR,
+report rendering, bulk password hashing) so it never competes with
+request threads for the GIL
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, List
+
+# Process pool Configuration
+PROCESS_POOL_WORKERS = int(os.getenv('PROCESS_POOL_WORKERS', os.cpu_count() or 1))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get the shared pool (created on first use)"""
+    global _pool
+    
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PROCESS_POOL_WORKERS)
+        return _pool
+
+def run_in_process(fn: Callable, *args, **kwargs):
+    """
+    Run a picklable top-level function in the shared pool and wait for it
+    Runs inline when PROCESS_POOL_WORKERS is 0; a broken pool (e.g. a
+    worker killed by the OOM killer) is replaced and the call retried once.
+    """
+    global _pool
+    
+    if PROCESS_POOL_WORKERS <= 0:
+        return fn(*args, **kwargs)
+    
+    try:
+        return get_process_pool().submit(fn, *args, **kwargs).result()
+    except BrokenProcessPool:
+        with _pool_lock:
+            _pool = None
+        return get_process_pool().submit(fn, *args, **kwargs).result()
+
+def map_in_process(fn: Callable, items: Iterable) -> List:
+    """
+    Apply a picklable top-level function to every item across the shared pool
+    Same fallbacks as run_in_process. Returns: results, in the order of items
+    """
+    global _pool
+    
+    items = list(items)
+    if PROCESS_POOL_WORKERS <= 0:
+        return [fn(item) for item in items]
+    
+    chunksize = max(1, len(items) // (PROCESS_POOL_WORKERS * 4))
+    try:
+        return list(get_process_pool().map(fn, items, chunksize=chunksize))
+    except BrokenProcessPool:
+        with _pool_lock:
+            _pool = None
+        return list(get_process_pool().map(fn, items, chunksize=chunksize))
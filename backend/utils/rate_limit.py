@@ -0,0 +1,261 @@
+"""
+Rate Limiting Utilities
+Sliding-window request limiter for login, signup and other CPU-heavy endpoints
+"""
+
+import os
+import logging
+import time
+import threading
+from collections import deque
+from functools import wraps
+from typing import Callable, List, Optional, Tuple
+from flask import request, jsonify
+from utils.auth import decode_token
+
+# Rate limit Configuration
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+RATE_LIMIT_STORAGE_URL = os.getenv('RATE_LIMIT_STORAGE_URL')  # e.g. redis://localhost:6379/0
+RATE_LIMIT_KEY_PREFIX = 'ratelimit'
+
+logger = logging.getLogger(__name__)
+
+# =====================================================
+# BACKENDS
+# =====================================================
+
+class InMemoryBackend:
+    """
+    In-process sliding-window log backend
+    Keeps at most `limit` timestamps per key, so memory stays bounded
+    """
+    
+    SWEEP_INTERVAL = 60  # seconds between idle-key sweeps
+    
+    def __init__(self):
+        self._hits = {}
+        self._windows = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+    
+    def hit(self, key: str, limit: int, window: int) -> Tuple[bool, int]:
+        """
+        Record a hit for key if it is within the limit
+        Args:
+            key: Limiter key (scope + identity)
+            limit: Maximum hits allowed per window
+            window: Window length in seconds
+        Returns:
+            (allowed, retry_after_seconds)
+        """
+        now = time.monotonic()
+        
+        with self._lock:
+            self._sweep(now)
+            
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = deque()
+                self._hits[key] = hits
+            self._windows[key] = window
+            
+            # Drop timestamps that fell out of the window
+            cutoff = now - window
+            while hits and hits[0] <= cutoff:
+                hits.popleft()
+            
+            if len(hits) >= limit:
+                retry_after = int(hits[0] + window - now) + 1
+                return False, max(retry_after, 1)
+            
+            hits.append(now)
+            return True, 0
+    
+    def reset(self, key: str):
+        """Forget all hits recorded for key"""
+        with self._lock:
+            self._hits.pop(key, None)
+            self._windows.pop(key, None)
+    
+    def _sweep(self, now: float):
+        """Remove keys whose newest hit has left that key's window"""
+        if now - self._last_sweep < self.SWEEP_INTERVAL:
+            return
+        
+        self._last_sweep = now
+        stale = [key for key, hits in self._hits.items() if not hits or hits[-1] <= now - self._windows[key]]
+        for key in stale:
+            del self._hits[key]
+            del self._windows[key]
+
+
+class RedisBackend:
+    """
+    Shared-store sliding-window backend (optional, requires the `redis` package)
+    Lets several worker processes enforce one limit
+    """
+    
+    def __init__(self, url: str):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+    
+    def hit(self, key: str, limit: int, window: int) -> Tuple[bool, int]:
+        """
+        Record a hit for key if it is within the limit
+        Args:
+            key: Limiter key (scope + identity)
+            limit: Maximum hits allowed per window
+            window: Window length in seconds
+        Returns:
+            (allowed, retry_after_seconds)
+        """
+        now = time.time()
+        redis_key = f"{RATE_LIMIT_KEY_PREFIX}:{key}"
+        
+        pipe = self._redis.pipeline()
+        pipe.zremrangebyscore(redis_key, 0, now - window)
+        pipe.zcard(redis_key)
+        pipe.zrange(redis_key, 0, 0, withscores=True)
+        _, count, oldest = pipe.execute()
+        
+        if count >= limit:
+            oldest_ts = oldest[0][1] if oldest else now
+            return False, max(int(oldest_ts + window - now) + 1, 1)
+        
+        pipe = self._redis.pipeline()
+        pipe.zadd(redis_key, {f"{now}": now})
+        pipe.expire(redis_key, window)
+        pipe.execute()
+        return True, 0
+    
+    def reset(self, key: str):
+        """Forget all hits recorded for key"""
+        self._redis.delete(f"{RATE_LIMIT_KEY_PREFIX}:{key}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """
+    Get the configured rate limit backend
+    Uses Redis when RATE_LIMIT_STORAGE_URL is set, in-process memory otherwise
+    """
+    global _backend
+    
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if RATE_LIMIT_STORAGE_URL:
+                    try:
+                        _backend = RedisBackend(RATE_LIMIT_STORAGE_URL)
+                    except Exception as e:
+                        logger.warning("Rate limit store unavailable, using in-memory backend: %s", e)
+                        _backend = InMemoryBackend()
+                else:
+                    _backend = InMemoryBackend()
+    
+    return _backend
+
+def set_backend(backend):
+    """Replace the rate limit backend (e.g. a shared store configured at startup)"""
+    global _backend
+    _backend = backend
+
+# =====================================================
+# KEY FUNCTIONS
+# =====================================================
+
+def key_by_ip() -> Optional[str]:
+    """
+    Key requests by client IP
+    X-Forwarded-For is only honoured through ProxyFix for the configured
+    number of trusted proxies (TRUSTED_PROXY_COUNT in app.py), so clients
+    cannot pick their own key.
+    """
+    return f"ip:{request.remote_addr}"
+
+def key_by_email() -> Optional[str]:
+    """Key requests by the email in the JSON body, if any"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None
+    
+    email = data.get('email')
+    if not isinstance(email, str) or not email.strip():
+        return None
+    return f"email:{email.lower().strip()}"
+
+def key_by_user() -> Optional[str]:
+    """Key requests by the authenticated user (use below @token_required)"""
+    auth_header = request.headers.get('Authorization', '')
+    token = auth_header.split(" ")[1] if " " in auth_header else None
+    if not token:
+        return None
+    
+    try:
+        return f"user:{decode_token(token)['user_id']}"
+    except Exception:
+        return None
+
+# =====================================================
+# DECORATOR
+# =====================================================
+
+def rate_limit(scope: str, limit: int, window: int, key_funcs: Optional[List[Callable]] = None):
+    """
+    Decorator to throttle a route before any hashing or database work happens
+    Usage: @rate_limit('login', limit=10, window=60, key_funcs=[key_by_ip, key_by_email])
+    
+    Each key function produces an independent limit, so a request is rejected
+    if any of its keys (e.g. the IP or the target email) is over the limit.
+    Limits can be overridden per scope with RATE_LIMIT_<SCOPE>=<limit>/<window>.
+    
+    Args:
+        scope: Name of the limited route, used in keys and env overrides
+        limit: Maximum requests allowed per window
+        window: Window length in seconds
+        key_funcs: Functions returning a key for the current request (default: by IP)
+    """
+    key_funcs = key_funcs or [key_by_ip]
+    
+    override = os.getenv(f'RATE_LIMIT_{scope.upper()}')
+    if override:
+        try:
+            limit_str, window_str = override.split('/')
+            limit, window = int(limit_str), int(window_str)
+        except ValueError:
+            logger.warning("Ignoring invalid RATE_LIMIT_%s value: %s", scope.upper(), override)
+    
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not RATE_LIMIT_ENABLED:
+                return f(*args, **kwargs)
+            
+            backend = get_backend()
+            retry_after = 0
+            
+            for key_func in key_funcs:
+                key = key_func()
+                if not key:
+                    continue
+                
+                allowed, wait = backend.hit(f"{scope}:{key}", limit, window)
+                if not allowed:
+                    retry_after = max(retry_after, wait)
+            
+            if retry_after:
+                response = jsonify({
+                    'success': False,
+                    'message': f'Too many requests. Try again in {retry_after} seconds.'
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+            
+            return f(*args, **kwargs)
+        
+        return decorated
+    
+    return decorator
@@ -0,0 +1,186 @@
+"""
+Receipt Garbage Collection
+Deletes receipt objects no expense references: uploads never attached to
+an expense, and receipts of draft expenses that were deleted
+"""
+
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from config.database import get_supabase_client
+from utils.jobs import job_handler
+from utils.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+# Receipt GC Configuration
+RECEIPT_GC_GRACE_HOURS = float(os.getenv('RECEIPT_GC_GRACE_HOURS', 24))  # uploads younger than this are kept
+RECEIPT_GC_REMOVE_BATCH_SIZE = int(os.getenv('RECEIPT_GC_REMOVE_BATCH_SIZE', 100))  # objects per remove() call
+
+RECEIPT_ROOT = 'receipts'
+LOOKUP_CHUNK_SIZE = 200
+# Full public URLs are long: keep each in_() query string well under proxy URL limits
+URL_LOOKUP_CHUNK_SIZE = 20
+# Receipts rows per request (at most PostgREST's max-rows, 1000 by default)
+ROW_PAGE_SIZE = 1000
+
+def new_stats(dry_run: bool) -> Dict:
+    """Empty throughput counters of one GC run"""
+    return {
+        'dry_run': dry_run,
+        'prefixes': 0,
+        'objects_scanned': 0,
+        'bytes_scanned': 0,
+        'orphans': 0,
+        'orphan_bytes': 0,
+        'removed': 0,
+        'elapsed_seconds': 0.0,
+        'objects_per_second': 0.0
+    }
+
+def referenced_urls(supabase, company_id: str, urls: List[str]) -> set:
+    """Subset of urls some expense uses as receipt_url (chunked in_() anti-join)"""
+    found = set()
+    for start in range(0, len(urls), URL_LOOKUP_CHUNK_SIZE):
+        response = supabase.table('expenses').select('receipt_url').eq(
+            'company_id', company_id
+        ).in_('receipt_url', urls[start:start + URL_LOOKUP_CHUNK_SIZE]).execute()
+        found.update(row['receipt_url'] for row in response.data)
+    return found
+
+def receipt_rows(supabase, company_id: str, prefix: str) -> List[Dict]:
+    """
+    All receipts rows under a prefix, paged by id
+    A single request would be cut off at the API's row cap, and the rows
+    past it would be mistaken for legacy objects.
+    """
+    rows = []
+    last_id = None
+    while True:
+        query = supabase.table('receipts').select(
+            'id, path, url, optimized_path, optimized_url, thumbnail_path, thumbnail_url, updated_at'
+        ).eq('company_id', company_id).like('path', f"{prefix}/%")
+        if last_id:
+            query = query.gt('id', last_id)
+        page = query.order('id').limit(ROW_PAGE_SIZE).execute().data
+        if not page:
+            return rows
+        rows.extend(page)
+        last_id = page[-1]['id']
+
+def find_orphans(supabase, storage, company_id: str, prefix: str, cutoff: datetime, stats: Dict):
+    """
+    Find the orphaned objects of one company/month (or sha256) prefix
+    An original and its optimized copy and thumbnail are one unit: they are
+    kept while any of them is referenced, and only removed together once
+    all of them, and the receipt's last (deduplicated) upload, are older
+    than the grace period.
+    Returns: (object paths, receipts row ids) to delete
+    """
+    objects = {obj['path']: obj for obj in storage.list_objects(prefix)}
+    stats['prefixes'] += 1
+    stats['objects_scanned'] += len(objects)
+    stats['bytes_scanned'] += sum(obj['size'] for obj in objects.values())
+    if not objects:
+        return [], []
+    
+    rows = receipt_rows(supabase, company_id, prefix)
+    
+    # Group objects into units: receipts rows, plus legacy objects uploaded
+    # before receipts were recorded
+    units = []
+    covered = set()
+    for row in rows:
+        paths = {p for p in (row['path'], row['optimized_path'], row['thumbnail_path']) if p}
+        urls = {u for u in (row['url'], row['optimized_url'], row['thumbnail_url']) if u}
+        updated_at = datetime.fromisoformat(row['updated_at'].replace('Z', '+00:00'))
+        units.append((paths, urls, row['id'], updated_at))
+        covered.update(paths)
+    for path in objects:
+        if path not in covered:
+            units.append(({path}, {storage.public_url(path)}, None, None))
+    
+    # Only units that are entirely past the grace period are candidates
+    candidates = [unit for unit in units
+                  if all(objects[p]['updated_at'] < cutoff for p in unit[0] if p in objects)
+                  and (unit[3] is None or unit[3] < cutoff)]
+    used = referenced_urls(supabase, company_id, sorted({u for unit in candidates for u in unit[1]}))
+    
+    orphan_paths, orphan_rows = [], []
+    for paths, urls, row_id, _ in candidates:
+        if urls & used:
+            continue
+        existing = [p for p in paths if p in objects]
+        orphan_paths.extend(existing)
+        stats['orphan_bytes'] += sum(objects[p]['size'] for p in existing)
+        if row_id:
+            orphan_rows.append(row_id)
+    
+    stats['orphans'] += len(orphan_paths)
+    return orphan_paths, orphan_rows
+
+def collect_company_receipts(company_id: str, grace_hours: float = RECEIPT_GC_GRACE_HOURS,
+                             dry_run: bool = False, stats: Optional[Dict] = None) -> Dict:
+    """
+    Delete one company's orphaned receipt objects, prefix by prefix
+    Returns: stats {"prefixes", "objects_scanned", "orphans", "removed", ...}
+    """
+    supabase = get_supabase_client()
+    storage = get_storage()
+    stats = stats if stats is not None else new_stats(dry_run)
+    started = time.monotonic()
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=grace_hours)
+    
+    company_prefix = f"{RECEIPT_ROOT}/{company_id}"
+    for folder in storage.list_folders(company_prefix):
+        prefix = f"{company_prefix}/{folder}"
+        paths, row_ids = find_orphans(supabase, storage, company_id, prefix, cutoff, stats)
+        if dry_run or not paths:
+            continue
+        
+        for start in range(0, len(paths), RECEIPT_GC_REMOVE_BATCH_SIZE):
+            batch = paths[start:start + RECEIPT_GC_REMOVE_BATCH_SIZE]
+            storage.remove(batch)
+            stats['removed'] += len(batch)
+        for start in range(0, len(row_ids), LOOKUP_CHUNK_SIZE):
+            supabase.table('receipts').delete().in_('id', row_ids[start:start + LOOKUP_CHUNK_SIZE]).execute()
+    
+    stats['elapsed_seconds'] = round(stats['elapsed_seconds'] + time.monotonic() - started, 3)
+    if stats['elapsed_seconds']:
+        stats['objects_per_second'] = round(stats['objects_scanned'] / stats['elapsed_seconds'], 1)
+    return stats
+
+def collect_receipts(company_id: Optional[str] = None, grace_hours: float = RECEIPT_GC_GRACE_HOURS,
+                     dry_run: bool = False) -> Dict:
+    """
+    Delete orphaned receipt objects of one company, or of every company
+    Returns: stats (totals over all companies)
+    """
+    stats = new_stats(dry_run)
+    company_ids = [company_id] if company_id else get_storage().list_folders(RECEIPT_ROOT)
+    for company in company_ids:
+        collect_company_receipts(company, grace_hours, dry_run, stats)
+    return stats
+
+# =====================================================
+# BACKGROUND JOBS
+# =====================================================
+
+@job_handler('collect_receipts')
+def collect_receipts_job(payload: Dict):
+    """
+    Garbage-collect orphaned receipts
+    Payload: {"company_id": "uuid" | null (all companies), "grace_hours": 24, "dry_run": false}
+    """
+    stats = collect_receipts(
+        payload.get('company_id'),
+        float(payload.get('grace_hours', RECEIPT_GC_GRACE_HOURS)),
+        bool(payload.get('dry_run', False))
+    )
+    logger.info(
+        "Receipt GC %sscanned %s objects in %s prefixes, %s orphans (%s bytes), removed %s, %s objects/s",
+        '(dry run) ' if stats['dry_run'] else '', stats['objects_scanned'], stats['prefixes'],
+        stats['orphans'], stats['orphan_bytes'], stats['removed'], stats['objects_per_second']
+    )
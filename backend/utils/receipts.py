@@ -0,0 +1,263 @@
+"""
+Receipt Processing
+Records uploaded receipts and optimizes images in the background:
+orientation is normalized, images are downsized and recompressed to WebP,
+and a thumbnail is generated for list views
+"""
+
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from config.database import get_supabase_client
+from utils.jobs import job_handler, enqueue
+from utils.ocr import OCR_ENABLED, OCR_EXTENSIONS
+from utils.process_pool import run_in_process
+from utils.storage import get_storage
+from utils.uploads import UPLOAD_TMP_DIR
+
+# Receipt optimization Configuration
+RECEIPT_MAX_DIMENSION = int(os.getenv('RECEIPT_MAX_DIMENSION', 2000))  # pixels, longest side
+RECEIPT_THUMBNAIL_DIMENSION = int(os.getenv('RECEIPT_THUMBNAIL_DIMENSION', 320))
+RECEIPT_WEBP_QUALITY = int(os.getenv('RECEIPT_WEBP_QUALITY', 80))
+RECEIPT_THUMBNAIL_QUALITY = int(os.getenv('RECEIPT_THUMBNAIL_QUALITY', 70))
+
+# Formats that are re-encoded (GIFs may be animated, PDFs are not images)
+OPTIMIZABLE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
+
+# =====================================================
+# IMAGE PROCESSING (runs in the worker process pool)
+# =====================================================
+
+def optimize_image(source_path: str, optimized_path: str, thumbnail_path: str,
+                   max_dimension: int, thumbnail_dimension: int,
+                   quality: int, thumbnail_quality: int) -> Dict:
+    """
+    Write a downsized WebP copy and a WebP thumbnail of an image
+    Module-level so it can be pickled into the process pool.
+    Returns: {"width": ..., "height": ..., "optimized_size": ..., "thumbnail_size": ...}
+    """
+    from PIL import Image, ImageOps
+    
+    try:
+        image = Image.open(source_path)
+    except Image.DecompressionBombError as e:
+        # Neither OSError nor ValueError: re-raise as one, so the receipt is
+        # marked failed instead of retrying a hostile upload
+        raise ValueError(f"Image too large: {str(e)}") from None
+    
+    with image:
+        # Let the JPEG decoder scale down while decoding (much less work
+        # than decoding a 12MP photo at full size)
+        image.draft('RGB', (max_dimension, max_dimension))
+        
+        # Apply the EXIF orientation, so phone photos are stored upright
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        image.save(optimized_path, 'WEBP', quality=quality, method=4)
+        width, height = image.size
+        
+        image.thumbnail((thumbnail_dimension, thumbnail_dimension), Image.LANCZOS)
+        image.save(thumbnail_path, 'WEBP', quality=thumbnail_quality, method=4)
+    
+    return {
+        'width': width,
+        'height': height,
+        'optimized_size': os.path.getsize(optimized_path),
+        'thumbnail_size': os.path.getsize(thumbnail_path)
+    }
+
+# =====================================================
+# RECEIPT RECORDS
+# =====================================================
+
+def register_receipt(company_id: str, user_id: str, path: str, url: str,
+                     content_type: Optional[str], size: Optional[int],
+                     content_hash: Optional[str] = None) -> Dict:
+    """
+    Record an uploaded receipt and queue its optimization and OCR
+    Registering the same path again (e.g. a retried confirm, or concurrent
+    uploads of the same content) is a no-op: UNIQUE(path) decides which
+    registration wins, and only that one queues the jobs.
+    Returns: receipts row
+    """
+    supabase = get_supabase_client()
+    
+    extension = path.rsplit('.', 1)[-1].lower()
+    optimizable = extension in OPTIMIZABLE_EXTENSIONS
+    
+    inserted = supabase.table('receipts').upsert({
+        'company_id': company_id,
+        'uploaded_by': user_id,
+        'path': path,
+        'url': url,
+        'content_type': content_type,
+        'size': size,
+        'content_hash': content_hash,
+        'status': 'pending' if optimizable else 'skipped'
+    }, on_conflict='path', ignore_duplicates=True).execute().data
+    
+    if not inserted:
+        return supabase.table('receipts').select('*').eq('path', path).execute().data[0]
+    row = inserted[0]
+    
+    if optimizable:
+        enqueue('optimize_receipt', {'receipt_id': row['id']})
+    if OCR_ENABLED and extension in OCR_EXTENSIONS:
+        enqueue('extract_receipt', {'receipt_id': row['id']})
+    
+    return row
+
+def find_receipt_by_hash(company_id: str, content_hash: str) -> Optional[Dict]:
+    """
+    Look up a company's stored receipt by SHA-256 of its content
+    Returns: receipts row, or None if this content was never uploaded
+    """
+    result = get_supabase_client().table('receipts').select('*').eq(
+        'company_id', company_id
+    ).eq('content_hash', content_hash).order('created_at').limit(1).execute()
+    
+    return result.data[0] if result.data else None
+
+def touch_receipt(receipt_id: str):
+    """
+    Mark a receipt as just uploaded again (a deduplicated upload)
+    Receipt GC keeps it for another grace period, so the new uploader
+    has time to attach it to an expense.
+    """
+    get_supabase_client().table('receipts').update({
+        'updated_at': datetime.now(timezone.utc).isoformat()
+    }).eq('id', receipt_id).execute()
+
+def find_receipt_by_url(company_id: str, receipt_url: str) -> Optional[Dict]:
+    """Look up a receipt by its original or optimized URL"""
+    supabase = get_supabase_client()
+    
+    for column in ('url', 'optimized_url'):
+        result = supabase.table('receipts').select('*').eq(
+            'company_id', company_id
+        ).eq(column, receipt_url).limit(1).execute()
+        if result.data:
+            return result.data[0]
+    
+    return None
+
+def find_duplicate_expenses(company_id: str, receipt_url: Optional[str],
+                            exclude_expense_id: Optional[str] = None) -> List[Dict]:
+    """
+    Find other expenses that use the same receipt content
+    Receipts with the same content hash count as one receipt, whatever
+    their path; rejected expenses are ignored.
+    Returns: [{"id", "user_id", "amount", "currency", "expense_date", "status"}]
+    """
+    if not receipt_url:
+        return []
+    
+    supabase = get_supabase_client()
+    urls = {receipt_url}
+    
+    receipt = find_receipt_by_url(company_id, receipt_url)
+    if receipt:
+        receipts = [receipt]
+        if receipt.get('content_hash'):
+            receipts = supabase.table('receipts').select('url, optimized_url').eq(
+                'company_id', company_id
+            ).eq('content_hash', receipt['content_hash']).execute().data or receipts
+        for row in receipts:
+            urls.update(url for url in (row['url'], row.get('optimized_url')) if url)
+    
+    result = supabase.table('expenses').select(
+        'id, user_id, amount, currency, expense_date, status'
+    ).eq('company_id', company_id).in_('receipt_url', sorted(urls)).neq('status', 'rejected').execute()
+    
+    return [expense for expense in (result.data or []) if expense['id'] != exclude_expense_id]
+
+def resolve_receipt_urls(company_id: str, receipt_url: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Map an uploaded receipt URL to the URLs expenses should reference
+    Returns: (receipt_url, thumbnail_url) - the optimized copy once it exists
+    """
+    if not receipt_url:
+        return receipt_url, None
+    
+    result = get_supabase_client().table('receipts').select(
+        'status, optimized_url, thumbnail_url'
+    ).eq('url', receipt_url).eq('company_id', company_id).limit(1).execute()
+    
+    if result.data and result.data[0]['status'] == 'optimized':
+        receipt = result.data[0]
+        return receipt['optimized_url'] or receipt_url, receipt['thumbnail_url']
+    
+    return receipt_url, None
+
+# =====================================================
+# BACKGROUND JOBS
+# =====================================================
+
+@job_handler('optimize_receipt')
+def optimize_receipt_job(payload: Dict):
+    """
+    Optimize one uploaded receipt image
+    Payload: {"receipt_id": "uuid"}
+    """
+    supabase = get_supabase_client()
+    storage = get_storage()
+    
+    result = supabase.table('receipts').select('*').eq('id', payload['receipt_id']).execute()
+    if not result.data or result.data[0]['status'] != 'pending':
+        return
+    receipt = result.data[0]
+    
+    base_path = receipt['path'].rsplit('.', 1)[0]
+    optimized_path = f"{base_path}.opt.webp"
+    thumbnail_path = f"{base_path}.thumb.webp"
+    
+    with tempfile.TemporaryDirectory(prefix='receipt-', dir=UPLOAD_TMP_DIR) as workdir:
+        source = os.path.join(workdir, 'original')
+        optimized = os.path.join(workdir, 'optimized.webp')
+        thumbnail = os.path.join(workdir, 'thumbnail.webp')
+        
+        storage.download_to(receipt['path'], source)
+        
+        try:
+            image = run_in_process(
+                optimize_image, source, optimized, thumbnail,
+                RECEIPT_MAX_DIMENSION, RECEIPT_THUMBNAIL_DIMENSION,
+                RECEIPT_WEBP_QUALITY, RECEIPT_THUMBNAIL_QUALITY
+            )
+        except (OSError, ValueError) as e:
+            # Unreadable or corrupt image: retrying will not help
+            supabase.table('receipts').update({
+                'status': 'failed',
+                'error': f"{type(e).__name__}: {str(e)}"[:2000]
+            }).eq('id', receipt['id']).execute()
+            return
+        
+        # Keep the original when recompression does not make it smaller
+        if receipt.get('size') and image['optimized_size'] >= receipt['size']:
+            optimized_path, optimized_url, optimized_size = receipt['path'], receipt['url'], receipt['size']
+        else:
+            storage.upload(optimized_path, optimized, 'image/webp', overwrite=True)
+            optimized_url, optimized_size = storage.public_url(optimized_path), image['optimized_size']
+        
+        storage.upload(thumbnail_path, thumbnail, 'image/webp', overwrite=True)
+        thumbnail_url = storage.public_url(thumbnail_path)
+    
+    supabase.table('receipts').update({
+        'status': 'optimized',
+        'optimized_path': optimized_path,
+        'optimized_url': optimized_url,
+        'optimized_size': optimized_size,
+        'thumbnail_path': thumbnail_path,
+        'thumbnail_url': thumbnail_url,
+        'error': None
+    }).eq('id', receipt['id']).execute()
+    
+    # Expenses saved before optimization finished switch to the optimized copy
+    supabase.table('expenses').update({
+        'receipt_url': optimized_url,
+        'receipt_thumbnail_url': thumbnail_url
+    }).eq('company_id', receipt['company_id']).eq('receipt_url', receipt['url']).execute()
@@ -0,0 +1,287 @@
+"""
+Expense Reports
+Printable PDF reimbursement reports rendered by a background job in the
+worker process pool. Reports are cached per user by the content version of
+the expenses they include, so an unchanged selection is never rendered twice;
+superseded and expired reports are deleted with their PDFs.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from config.database import get_supabase_client
+from utils.currency import get_exchange_rates, convert_currency
+from utils.jobs import job_handler
+from utils.process_pool import run_in_process
+from utils.storage import get_storage
+from utils.uploads import UPLOAD_TMP_DIR
+
+logger = logging.getLogger(__name__)
+
+# Report Configuration
+REPORT_MAX_EXPENSES = int(os.getenv('REPORT_MAX_EXPENSES', 500))
+REPORT_STALE_SECONDS = int(os.getenv('REPORT_STALE_SECONDS', 900))  # pending reports older than this are re-queued
+REPORT_RETENTION_DAYS = float(os.getenv('REPORT_RETENTION_DAYS', 30))  # reports not requested for this long are deleted
+
+# Bump when the report layout changes, so cached reports are re-rendered
+REPORT_TEMPLATE_VERSION = '1'
+LOOKUP_CHUNK_SIZE = 200
+
+REPORT_EXPENSE_COLUMNS = (
+    'id, user_id, expense_date, amount, currency, status, description, paid_by, '
+    'receipt_url, receipt_thumbnail_url, updated_at, category:categories(name), user:users!user_id(name, email)'
+)
+
+# =====================================================
+# RENDERING (runs in the worker process pool)
+# =====================================================
+
+def render_report_pdf(report: Dict, lines: List[Dict], thumbnails: Dict[str, str], output_path: str) -> int:
+    """
+    Render a report to a PDF file
+    Module-level so it can be pickled into the process pool.
+    Args:
+        report: {"title", "company_currency", "generated_at", "total", "unconverted"}
+        lines: Expense lines (amounts as strings, converted amount or None)
+        thumbnails: expense id -> local thumbnail image path
+    Returns: Size of the PDF in bytes
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Image, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+    from xml.sax.saxutils import escape
+    
+    styles = getSampleStyleSheet()
+    document = SimpleDocTemplate(output_path, pagesize=A4, title=report['title'],
+                                 leftMargin=15 * mm, rightMargin=15 * mm, topMargin=15 * mm, bottomMargin=15 * mm)
+    
+    story = [
+        Paragraph(escape(report['title']), styles['Title']),
+        Paragraph(f"Generated {report['generated_at']} - amounts in {report['company_currency']}", styles['Normal']),
+        Spacer(1, 6 * mm)
+    ]
+    
+    rows = [['Date', 'Employee', 'Category', 'Description', 'Amount', report['company_currency']]]
+    for line in lines:
+        rows.append([
+            line['expense_date'],
+            Paragraph(escape(line['employee']), styles['BodyText']),
+            Paragraph(escape(line['category']), styles['BodyText']),
+            Paragraph(escape(line['description']), styles['BodyText']),
+            f"{line['amount']} {line['currency']}",
+            line['converted_amount'] or 'n/a'
+        ])
+    rows.append(['', '', '', 'Total', '', report['total']])
+    
+    table = Table(rows, repeatRows=1, colWidths=[22 * mm, 30 * mm, 28 * mm, 50 * mm, 25 * mm, 25 * mm])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e5e7eb')),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
+        ('ALIGN', (4, 0), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('GRID', (0, 0), (-1, -2), 0.25, colors.HexColor('#d1d5db'))
+    ]))
+    story.append(table)
+    
+    if report['unconverted']:
+        story.append(Spacer(1, 4 * mm))
+        story.append(Paragraph(
+            f"{report['unconverted']} expense(s) could not be converted and are not included in the total.",
+            styles['Italic']
+        ))
+    
+    # Receipt thumbnails, one labelled image per expense
+    receipts = [line for line in lines if line['id'] in thumbnails]
+    if receipts:
+        story.extend([PageBreak(), Paragraph('Receipts', styles['Heading2'])])
+        for line in receipts:
+            image = Image(thumbnails[line['id']], width=80 * mm, height=80 * mm, kind='proportional')
+            story.extend([
+                Paragraph(escape(f"{line['expense_date']} - {line['employee']} - {line['amount']} {line['currency']}"), styles['Heading4']),
+                image,
+                Spacer(1, 4 * mm)
+            ])
+    
+    document.build(story)
+    return os.path.getsize(output_path)
+
+# =====================================================
+# VERSIONING
+# =====================================================
+
+def content_version(expenses: List[Dict], company_currency: str, title: str) -> str:
+    """
+    Content version of a report: changes when any included expense is
+    edited, added or removed, or when the layout, company currency or
+    title changes
+    """
+    digest = hashlib.sha256(f"{REPORT_TEMPLATE_VERSION}:{company_currency}:{title}".encode())
+    for expense in sorted(expenses, key=lambda e: e['id']):
+        digest.update(f"|{expense['id']}:{expense['updated_at']}".encode())
+    return digest.hexdigest()
+
+def build_lines(expenses: List[Dict], company_currency: str):
+    """
+    Report lines with amounts converted to the company currency
+    Rates are fetched once per expense currency.
+    Returns: (lines, total, number of unconverted expenses)
+    """
+    rates = {}
+    total = 0.0
+    unconverted = 0
+    lines = []
+    
+    for expense in sorted(expenses, key=lambda e: (e['expense_date'], e['id'])):
+        amount = float(expense['amount'])
+        currency = expense['currency']
+        if currency != company_currency and currency not in rates:
+            exchange_data = get_exchange_rates(currency)
+            rates[currency] = exchange_data['rates'] if exchange_data else None
+        
+        converted = None
+        if currency == company_currency or rates.get(currency):
+            converted = convert_currency(amount, currency, company_currency, rates.get(currency) or {})
+        if converted is None:
+            unconverted += 1
+        else:
+            total += converted
+        
+        lines.append({
+            'id': expense['id'],
+            'expense_date': expense['expense_date'],
+            'employee': (expense.get('user') or {}).get('name') or '',
+            'category': (expense.get('category') or {}).get('name') or '',
+            'description': expense.get('description') or '',
+            'amount': f"{amount:.2f}",
+            'currency': currency,
+            'converted_amount': f"{converted:.2f}" if converted is not None else None
+        })
+    
+    return lines, f"{total:.2f}", unconverted
+
+# =====================================================
+# BACKGROUND JOBS
+# =====================================================
+
+def download_thumbnails(expenses: List[Dict], company_id: str, workdir: str) -> Dict[str, str]:
+    """Download receipt thumbnails into workdir: expense id -> local path"""
+    storage = get_storage()
+    thumbnails = {}
+    for expense in expenses:
+        path = storage.path_from_url(expense.get('receipt_thumbnail_url') or '')
+        if not path or not path.startswith(f"receipts/{company_id}/"):
+            continue
+        local_path = os.path.join(workdir, f"{expense['id']}.webp")
+        try:
+            storage.download_to(path, local_path)
+        except Exception as e:
+            logger.warning("Report thumbnail for expense %s unavailable: %s", expense['id'], e)
+            continue
+        thumbnails[expense['id']] = local_path
+    return thumbnails
+
+@job_handler('render_report')
+def render_report_job(payload: Dict):
+    """
+    Render one expense report PDF and store it
+    Payload: {"report_id": "uuid"}
+    """
+    supabase = get_supabase_client()
+    
+    result = supabase.table('expense_reports').select('*').eq('id', payload['report_id']).execute()
+    if not result.data or result.data[0]['status'] == 'ready':
+        return
+    report = result.data[0]
+    company_id = report['company_id']
+    
+    expenses = []
+    for start in range(0, len(report['expense_ids']), LOOKUP_CHUNK_SIZE):
+        expenses.extend(supabase.table('expenses').select(REPORT_EXPENSE_COLUMNS).eq(
+            'company_id', company_id
+        ).in_('id', report['expense_ids'][start:start + LOOKUP_CHUNK_SIZE]).execute().data)
+    lines, total, unconverted = build_lines(expenses, report['company_currency'])
+    
+    # One PDF per report: its title and generation time are its own
+    path = f"reports/{company_id}/{report['id']}.pdf"
+    with tempfile.TemporaryDirectory(prefix='report-', dir=UPLOAD_TMP_DIR) as workdir:
+        thumbnails = download_thumbnails(expenses, company_id, workdir)
+        output_path = os.path.join(workdir, 'report.pdf')
+        
+        try:
+            size = run_in_process(render_report_pdf, {
+                'title': report['title'],
+                'company_currency': report['company_currency'],
+                'generated_at': report['created_at'][:16].replace('T', ' '),
+                'total': total,
+                'unconverted': unconverted
+            }, lines, thumbnails, output_path)
+        except (ImportError, OSError, ValueError) as e:
+            # Renderer missing or an unreadable image: retrying will not help
+            mark_report_failed(report['id'], f"{type(e).__name__}: {str(e)}")
+            return
+        
+        get_storage().upload(path, output_path, 'application/pdf', overwrite=True)
+    
+    supabase.table('expense_reports').update({
+        'status': 'ready',
+        'path': path,
+        'size': size,
+        'total': total,
+        'error': None
+    }).eq('id', report['id']).execute()
+    
+    try:
+        prune_reports(report)
+    except Exception as e:
+        # The new report is ready; leftovers are pruned after the next render
+        logger.warning("Pruning reports of company %s failed: %s", company_id, e)
+
+def prune_reports(report: Dict):
+    """
+    Delete the reports a newly rendered one makes redundant, with their PDFs
+    - the requester's other reports under the same title (earlier versions
+      of the same selection, superseded by edits to its expenses)
+    - the company's reports not requested for REPORT_RETENTION_DAYS
+    Each call deletes at most LOOKUP_CHUNK_SIZE of each kind.
+    """
+    supabase = get_supabase_client()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=REPORT_RETENTION_DAYS)
+    
+    superseded = supabase.table('expense_reports').select('id, path').eq(
+        'company_id', report['company_id']
+    ).eq('requested_by', report['requested_by']).eq('title', report['title']).neq(
+        'id', report['id']
+    ).limit(LOOKUP_CHUNK_SIZE).execute().data
+    expired = supabase.table('expense_reports').select('id, path').eq(
+        'company_id', report['company_id']
+    ).lt('updated_at', cutoff.isoformat()).neq('id', report['id']).limit(LOOKUP_CHUNK_SIZE).execute().data
+    
+    stale = {row['id']: row['path'] for row in superseded + expired}
+    if not stale:
+        return
+    
+    supabase.table('expense_reports').delete().in_('id', list(stale)).execute()
+    paths = [path for path in stale.values() if path]
+    if paths:
+        get_storage().remove(paths)
+
+def mark_report_failed(report_id: str, error: str):
+    """Record a report that cannot be rendered"""
+    get_supabase_client().table('expense_reports').update({
+        'status': 'failed',
+        'error': error[:2000]
+    }).eq('id', report_id).execute()
+
+def find_report(company_id: str, user_id: str, version: str) -> Optional[Dict]:
+    """A user's report of a content version, or None"""
+    result = get_supabase_client().table('expense_reports').select('*').eq(
+        'company_id', company_id
+    ).eq('requested_by', user_id).eq('version', version).execute()
+    return result.data[0] if result.data else None
@@ -0,0 +1,349 @@
+"""
+Receipt Storage
+Storage backends for the receipts bucket: Supabase Storage, or a local
+directory for development and tests
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import jwt
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import parse_qs, quote, unquote, urlparse
+from typing import Dict, Iterator, List, Optional
+from config.database import get_supabase_client, get_supabase_url, get_supabase_service_key
+from utils.auth import JWT_SECRET, JWT_ALGORITHM
+from utils.http_client import get_http_session, HTTP_CONNECT_TIMEOUT
+
+# Storage Configuration
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'supabase')  # supabase | local
+STORAGE_BUCKET = 'receipts'
+LOCAL_STORAGE_ROOT = os.getenv('LOCAL_STORAGE_ROOT', str(Path(__file__).resolve().parent.parent / 'storage'))
+LOCAL_STORAGE_URL = os.getenv('LOCAL_STORAGE_URL', 'http://localhost:5000/api/storage')
+LOCAL_STORAGE_MAX_AGE = int(os.getenv('LOCAL_STORAGE_MAX_AGE', 3600))  # seconds browsers may cache receipts
+# Internal nginx location that serves LOCAL_STORAGE_ROOT (X-Accel-Redirect);
+# unset = the app streams files itself
+LOCAL_STORAGE_ACCEL_PREFIX = os.getenv('LOCAL_STORAGE_ACCEL_PREFIX', '').rstrip('/')
+SIGNED_UPLOAD_EXPIRATION_SECONDS = int(os.getenv('SIGNED_UPLOAD_EXPIRATION_SECONDS', 600))  # lifetime of signed upload URLs
+
+# Signed upload tokens of the local backend
+UPLOAD_TOKEN_SECRET = f"{JWT_SECRET}:uploads"
+
+STREAM_CHUNK_SIZE = 64 * 1024
+LIST_PAGE_SIZE = 1000
+DOWNLOAD_TIMEOUT_SECONDS = 30
+
+
+class SupabaseStorage:
+    """Receipts bucket in Supabase Storage"""
+    
+    def __init__(self, bucket: str = STORAGE_BUCKET):
+        self.bucket = bucket
+    
+    def _bucket(self):
+        return get_supabase_client().storage.from_(self.bucket)
+    
+    def upload(self, path: str, source_path: str, content_type: str, overwrite: bool = False):
+        """
+        Upload a local file (streamed from disk by the storage client)
+        Raises: FileExistsError if an object already exists at path, unless
+        overwrite is set
+        """
+        try:
+            with open(source_path, 'rb') as source:
+                self._bucket().upload(path, source, {
+                    'content-type': content_type,
+                    'upsert': 'true' if overwrite else 'false'
+                })
+        except Exception as e:
+            # The storage API answers 409 Duplicate for existing objects
+            if not overwrite and ('Duplicate' in str(e) or 'already exists' in str(e)):
+                raise FileExistsError(f'Object already exists: {path}')
+            raise
+    
+    def download_to(self, path: str, local_path: str):
+        """Stream an object to a local file in chunks"""
+        url = f"{get_supabase_url()}/storage/v1/object/{self.bucket}/{path}"
+        key = get_supabase_service_key()
+        with get_http_session().get(url, headers={'Authorization': f'Bearer {key}', 'apikey': key},
+                                    stream=True, timeout=(HTTP_CONNECT_TIMEOUT, DOWNLOAD_TIMEOUT_SECONDS)) as response:
+            response.raise_for_status()
+            with open(local_path, 'wb') as target:
+                for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                    target.write(chunk)
+    
+    def read(self, path: str) -> bytes:
+        """Download a whole object (receipts are at most a few MB)"""
+        return self._bucket().download(path)
+    
+    def remove(self, paths: List[str]):
+        """Delete objects"""
+        self._bucket().remove(paths)
+    
+    def _list_pages(self, prefix: str) -> Iterator[Dict]:
+        """Entries directly under prefix, paged LIST_PAGE_SIZE at a time"""
+        offset = 0
+        while True:
+            page = self._bucket().list(prefix, {
+                'limit': LIST_PAGE_SIZE,
+                'offset': offset,
+                'sortBy': {'column': 'name', 'order': 'asc'}
+            })
+            yield from page
+            if len(page) < LIST_PAGE_SIZE:
+                return
+            offset += LIST_PAGE_SIZE
+    
+    def list_folders(self, prefix: str) -> List[str]:
+        """Names of the folders directly under prefix"""
+        return [item['name'] for item in self._list_pages(prefix) if item.get('id') is None]
+    
+    def list_objects(self, prefix: str) -> Iterator[Dict]:
+        """
+        Objects directly under prefix
+        Yields: {"path": ..., "size": 123, "updated_at": datetime (UTC)}
+        """
+        for item in self._list_pages(prefix):
+            if item.get('id') is None:
+                continue
+            yield {
+                'path': f"{prefix}/{item['name']}",
+                'size': (item.get('metadata') or {}).get('size') or 0,
+                'updated_at': datetime.fromisoformat(item['updated_at'].replace('Z', '+00:00'))
+            }
+    
+    def public_url(self, path: str) -> str:
+        return self._bucket().get_public_url(path)
+    
+    def path_from_url(self, url: str) -> Optional[str]:
+        """Object path of a public URL of this bucket, or None"""
+        marker = f"/object/public/{self.bucket}/"
+        if marker not in url:
+            return None
+        return unquote(url.split(marker, 1)[1].split('?', 1)[0])
+    
+    def create_signed_upload(self, path: str, max_size: int) -> Dict:
+        """
+        Create a signed URL the client PUTs the file to directly
+        (valid for SIGNED_UPLOAD_EXPIRATION_SECONDS, which the storage client
+        has no option for, so the sign endpoint is called here; the bucket's
+        file size limit caps the upload, and confirm re-checks the size)
+        """
+        base_url = f"{get_supabase_url()}/storage/v1"
+        key = get_supabase_service_key()
+        response = get_http_session().post(
+            f"{base_url}/object/upload/sign/{self.bucket}/{quote(path)}",
+            json={'expiresIn': SIGNED_UPLOAD_EXPIRATION_SECONDS},
+            headers={'Authorization': f'Bearer {key}', 'apikey': key, 'x-upsert': 'false'},
+            timeout=(HTTP_CONNECT_TIMEOUT, DOWNLOAD_TIMEOUT_SECONDS)
+        )
+        response.raise_for_status()
+        url = base_url + response.json()['url']
+        token = parse_qs(urlparse(url).query).get('token')
+        if not token:
+            raise Exception('Storage API returned no upload token')
+        return {
+            'url': url,
+            'token': token[0],
+            'method': 'PUT',
+            'expires_in': SIGNED_UPLOAD_EXPIRATION_SECONDS
+        }
+    
+    def stat(self, path: str) -> Optional[Dict]:
+        """
+        Get size and content type of an object
+        Returns: {"size": 123, "content_type": "image/jpeg"}, or None if missing
+        """
+        folder, _, name = path.rpartition('/')
+        for item in self._bucket().list(folder, {'search': name, 'limit': 100}):
+            if item.get('name') == name:
+                metadata = item.get('metadata') or {}
+                return {
+                    'size': metadata.get('size'),
+                    'content_type': metadata.get('mimetype')
+                }
+        return None
+
+
+class LocalStorage:
+    """
+    Receipts stored under a local directory (development and tests)
+    Objects are served and signed uploads accepted by routes/storage.py.
+    """
+    
+    def __init__(self, root: str = LOCAL_STORAGE_ROOT, base_url: str = LOCAL_STORAGE_URL):
+        self.root = Path(root).resolve()
+        self.base_url = base_url.rstrip('/')
+    
+    def resolve(self, path: str) -> Path:
+        """Map an object path to a file under root (rejects path traversal)"""
+        full_path = (self.root / path).resolve()
+        if self.root not in full_path.parents:
+            raise ValueError('Invalid storage path')
+        return full_path
+    
+    def upload(self, path: str, source_path: str, content_type: str, overwrite: bool = False):
+        """
+        Copy a local file into place atomically
+        Raises: FileExistsError if an object already exists at path, unless
+        overwrite is set
+        """
+        target = self.resolve(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        
+        fd, tmp_path = tempfile.mkstemp(dir=target.parent)
+        os.close(fd)
+        try:
+            shutil.copyfile(source_path, tmp_path)
+            if overwrite:
+                os.replace(tmp_path, target)
+            else:
+                self._commit(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+    
+    def download_to(self, path: str, local_path: str):
+        shutil.copyfile(self.resolve(path), local_path)
+    
+    def read(self, path: str) -> bytes:
+        return self.resolve(path).read_bytes()
+    
+    def write_stream(self, path: str, stream, max_size: int) -> int:
+        """
+        Write a request body to path in chunks
+        Returns: Bytes written
+        Raises:
+            FileExistsError: Object already exists
+            ValueError: Body is larger than max_size
+        """
+        target = self.resolve(path)
+        if target.exists():
+            raise FileExistsError(f'Object already exists: {path}')
+        target.parent.mkdir(parents=True, exist_ok=True)
+        
+        size = 0
+        with tempfile.NamedTemporaryFile('wb', dir=target.parent, delete=False) as tmp:
+            try:
+                while True:
+                    chunk = stream.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_size:
+                        raise ValueError(f'Upload exceeds {max_size} bytes')
+                    tmp.write(chunk)
+            except Exception:
+                os.unlink(tmp.name)
+                raise
+        
+        try:
+            self._commit(tmp.name, target)
+        finally:
+            os.unlink(tmp.name)
+        return size
+    
+    def _commit(self, tmp_path: str, target: Path):
+        """Publish a fully written temp file; fails if the object already exists"""
+        try:
+            os.link(tmp_path, target)
+        except FileExistsError:
+            raise FileExistsError(f'Object already exists: {target.relative_to(self.root)}')
+    
+    def remove(self, paths: List[str]):
+        for path in paths:
+            try:
+                self.resolve(path).unlink()
+            except FileNotFoundError:
+                pass
+    
+    def list_folders(self, prefix: str) -> List[str]:
+        folder = self.resolve(prefix)
+        if not folder.is_dir():
+            return []
+        return sorted(entry.name for entry in folder.iterdir() if entry.is_dir())
+    
+    def list_objects(self, prefix: str) -> Iterator[Dict]:
+        folder = self.resolve(prefix)
+        if not folder.is_dir():
+            return
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                # Skip directories and in-flight temp files of upload/write_stream
+                if not entry.is_file() or entry.name.startswith('tmp'):
+                    continue
+                info = entry.stat()
+                yield {
+                    'path': f"{prefix}/{entry.name}",
+                    'size': info.st_size,
+                    'updated_at': datetime.fromtimestamp(info.st_mtime, tz=timezone.utc)
+                }
+    
+    def public_url(self, path: str) -> str:
+        return f"{self.base_url}/object/{path}"
+    
+    def path_from_url(self, url: str) -> Optional[str]:
+        prefix = f"{self.base_url}/object/"
+        if not url.startswith(prefix):
+            return None
+        return unquote(url[len(prefix):].split('?', 1)[0])
+    
+    def create_signed_upload(self, path: str, max_size: int) -> Dict:
+        token = jwt.encode({
+            'path': path,
+            'max_size': max_size,
+            'exp': datetime.utcnow() + timedelta(seconds=SIGNED_UPLOAD_EXPIRATION_SECONDS)
+        }, UPLOAD_TOKEN_SECRET, algorithm=JWT_ALGORITHM)
+        return {
+            'url': f"{self.base_url}/upload/{path}?token={token}",
+            'token': token,
+            'method': 'PUT',
+            'expires_in': SIGNED_UPLOAD_EXPIRATION_SECONDS
+        }
+    
+    def verify_upload_token(self, path: str, token: str) -> Dict:
+        """
+        Check a signed upload token against the requested path
+        Raises: Exception if invalid, expired or issued for another path
+        """
+        try:
+            claims = jwt.decode(token, UPLOAD_TOKEN_SECRET, algorithms=[JWT_ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            raise Exception('Upload URL has expired')
+        except jwt.InvalidTokenError:
+            raise Exception('Invalid upload token')
+        
+        if claims.get('path') != path:
+            raise Exception('Upload token does not match path')
+        return claims
+    
+    def stat(self, path: str) -> Optional[Dict]:
+        try:
+            return {
+                'size': self.resolve(path).stat().st_size,
+                'content_type': None
+            }
+        except FileNotFoundError:
+            return None
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+def get_storage():
+    """Get the configured receipt storage (Supabase by default, local for dev/tests)"""
+    global _storage
+    
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = LocalStorage() if STORAGE_BACKEND == 'local' else SupabaseStorage()
+    
+    return _storage
+
+def set_storage(storage):
+    """Replace the receipt storage (e.g. a LocalStorage on a temp dir in tests)"""
+    global _storage
+    _storage = storage
@@ -0,0 +1,75 @@
+"""
+Upload Utilities
+Disk-spooled multipart parsing so request bodies never sit in worker memory
+"""
+
+import hashlib
+import os
+import tempfile
+from flask import Request
+
+# Upload Configuration
+UPLOAD_TMP_DIR = os.getenv('UPLOAD_TMP_DIR') or None  # None = system temp dir
+
+
+class StreamingUploadRequest(Request):
+    """
+    Request class that writes every multipart file part to a named temp file
+    
+    Werkzeug parses the body chunk by chunk and writes each chunk to the
+    part's stream; Flask's default keeps parts under 500KB in memory. Always
+    spooling to disk keeps memory per upload constant, and the temp file's
+    path lets the storage client stream the part from disk.
+    The temp file is deleted when the request is closed.
+    """
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingFile(tempfile.NamedTemporaryFile('wb+', prefix='upload-', dir=UPLOAD_TMP_DIR))
+
+
+class HashingFile:
+    """
+    Temp file wrapper that feeds every chunk written to it into a SHA-256,
+    so the content hash is ready when parsing ends without a second pass
+    """
+    
+    def __init__(self, file):
+        self._file = file
+        self.sha256 = hashlib.sha256()
+    
+    def write(self, data):
+        self.sha256.update(data)
+        return self._file.write(data)
+    
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+    
+    def __iter__(self):
+        return iter(self._file)
+
+
+def spooled_size(file) -> int:
+    """Size of an uploaded file part without reading it"""
+    return os.fstat(file.stream.fileno()).st_size
+
+
+def spooled_path(file) -> str:
+    """Path of the temp file an uploaded file part was spooled to"""
+    file.stream.flush()
+    return file.stream.name
+
+
+def spooled_sha256(file) -> str:
+    """Hex SHA-256 of an uploaded file part (computed while it was spooled)"""
+    stream = file.stream
+    if isinstance(stream, HashingFile):
+        return stream.sha256.hexdigest()
+    
+    # Not spooled by StreamingUploadRequest: hash it in chunks
+    digest = hashlib.sha256()
+    position = stream.tell()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(64 * 1024), b''):
+        digest.update(chunk)
+    stream.seek(position)
+    return digest.hexdigest()
@@ -6,6 +6,7 @@ import { useAuth } from '@/contexts/AuthContext';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { api } from '@/lib/api';
+import { subscribeToEvents } from '@/lib/events';
 import { Expense } from '@/types';
 import { toast } from 'sonner';
 
@@ -26,6 +27,17 @@ export default function DashboardPage() {
     }
   }, [authLoading, isAuthenticated, router]);
 
+  // Refresh on pushed status changes instead of polling
+  useEffect(() => {
+    if (!isAuthenticated) return;
+
+    return subscribeToEvents((event) => {
+      if (event.type === 'expense.status' || event.type === 'resync') {
+        loadExpenses();
+      }
+    });
+  }, [isAuthenticated]);
+
   const loadExpenses = async () => {
     try {
       const response = await api.expenses.list();
@@ -123,7 +123,6 @@ export default function EditExpensePage() {
     try {
       const formData = new FormData();
       formData.append('file', selectedFile);
-      formData.append('folder', 'receipts');
       
       const response = await api.upload.file(formData);
       
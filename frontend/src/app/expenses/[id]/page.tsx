@@ -215,6 +215,23 @@ export default function ViewExpensePage() {
             </div>
           )}
 
+          {/* Possible duplicates (same receipt on other expenses) */}
+          {expense.duplicate_expenses?.length > 0 && (
+            <div className="p-4 bg-yellow-50 border border-yellow-200 rounded-md">
+              <p className="text-sm font-medium text-yellow-800 mb-2">
+                This receipt is also attached to {expense.duplicate_expenses.length} other expense(s)
+              </p>
+              <ul className="text-sm text-yellow-800 space-y-1">
+                {expense.duplicate_expenses.map((duplicate: any) => (
+                  <li key={duplicate.id}>
+                    {duplicate.currency} {Number(duplicate.amount).toFixed(2)} on{' '}
+                    {new Date(duplicate.expense_date).toLocaleDateString()} ({duplicate.status})
+                  </li>
+                ))}
+              </ul>
+            </div>
+          )}
+
           {/* Submitted By */}
           {expense.user && (
             <div className="pt-4 border-t">
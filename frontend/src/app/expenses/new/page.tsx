@@ -16,6 +16,7 @@ export default function NewExpensePage() {
   const [error, setError] = useState('');
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
   const [receiptUrl, setReceiptUrl] = useState('');
+  const [readingReceipt, setReadingReceipt] = useState(false);
   
   const [formData, setFormData] = useState({
     category_id: '',
@@ -91,13 +92,13 @@ export default function NewExpensePage() {
     try {
       const formData = new FormData();
       formData.append('file', selectedFile);
-      formData.append('folder', 'receipts');
       
       const response = await api.upload.file(formData);
       
       if (response.data.success) {
         setReceiptUrl(response.data.data.url);
         setError('');
+        applyReceiptSuggestions(response.data.data.url);
       } else {
         setError(response.data.message || 'Upload failed');
       }
@@ -108,6 +109,37 @@ export default function NewExpensePage() {
     }
   };
 
+  // Pre-fill fields the user has not filled in yet from the receipt's OCR
+  // result (read in the background after upload)
+  const applyReceiptSuggestions = async (url: string) => {
+    setReadingReceipt(true);
+    try {
+      for (let attempt = 0; attempt < 20; attempt++) {
+        const response = await api.expenses.receiptSuggestions(url);
+        const { status, suggestions } = response.data.data || {};
+        
+        if (status === 'done' && suggestions) {
+          const today = new Date().toISOString().split('T')[0];
+          setFormData((current) => ({
+            ...current,
+            amount: current.amount || suggestions.amount || '',
+            currency: current.currency === 'USD' && suggestions.currency ? suggestions.currency : current.currency,
+            expense_date: current.expense_date === today && suggestions.expense_date ? suggestions.expense_date : current.expense_date,
+            description: current.description || suggestions.description || '',
+          }));
+          return;
+        }
+        if (status !== 'pending') return;
+        
+        await new Promise((resolve) => setTimeout(resolve, 1500));
+      }
+    } catch (err) {
+      console.error('Failed to read receipt:', err);
+    } finally {
+      setReadingReceipt(false);
+    }
+  };
+
   const handleSubmit = async (e: React.FormEvent, submit: boolean = false) => {
     e.preventDefault();
     setLoading(true);
@@ -366,7 +398,9 @@ export default function NewExpensePage() {
                   <svg className="w-8 h-8 text-green-500 mr-2" fill="none" stroke="currentColor" viewBox="0 0 24 24">
                     <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M9 12l2 2 4-4m6 2a9 9 0 11-18 0 9 9 0 0118 0z" />
                   </svg>
-                  <span className="text-sm text-gray-700">Receipt uploaded successfully</span>
+                  <span className="text-sm text-gray-700">
+                    {readingReceipt ? 'Receipt uploaded, reading details...' : 'Receipt uploaded successfully'}
+                  </span>
                 </div>
                 <button
                   type="button"
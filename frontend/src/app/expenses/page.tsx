@@ -3,6 +3,7 @@
 import { useState, useEffect } from 'react';
 import { useRouter } from 'next/navigation';
 import { api } from '@/lib/api';
+import { subscribeToEvents } from '@/lib/events';
 import { useAuth } from '@/contexts/AuthContext';
 
 export default function ExpensesPage() {
@@ -29,6 +30,18 @@ export default function ExpensesPage() {
     loadStats();
   }, [user]);
 
+  // Refresh on pushed status changes instead of polling
+  useEffect(() => {
+    if (!user) return;
+
+    return subscribeToEvents((event) => {
+      if (event.type === 'expense.status' || event.type === 'resync') {
+        loadExpenses();
+        loadStats();
+      }
+    });
+  }, [user]);
+
   const loadExpenses = async () => {
     try {
       setLoading(true);
@@ -6,7 +6,7 @@
 import axios, { AxiosInstance } from 'axios';
 
 // Backend API Base URL
-const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:5000/api';
+export const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:5000/api';
 
 // Create axios instance
 const apiClient: AxiosInstance = axios.create({
@@ -74,9 +74,12 @@ export const api = {
 
   // User management endpoints (Admin only)
   users: {
-    list: () => apiClient.get('/users'),
+    list: (params?: { role?: string; is_active?: boolean; q?: string; limit?: number; cursor?: string }) =>
+      apiClient.get('/users', { params }),
     get: (id: string) => apiClient.get(`/users/${id}`),
+    getMany: (ids: string[]) => apiClient.get('/users', { params: { ids: ids.join(',') } }),
     create: (data: any) => apiClient.post('/users', data),
+    bulkCreate: (data: { users: any[] } | FormData) => apiClient.post('/users/bulk', data),
     update: (id: string, data: any) => apiClient.put(`/users/${id}`, data),
     delete: (id: string) => apiClient.delete(`/users/${id}`),
   },
@@ -88,6 +91,7 @@ export const api = {
     create: (data: any) => apiClient.post('/categories', data),
     update: (id: string, data: any) => apiClient.put(`/categories/${id}`, data),
     delete: (id: string) => apiClient.delete(`/categories/${id}`),
+    stats: () => apiClient.get('/categories/stats'),
   },
 
   // Expense endpoints
@@ -99,6 +103,18 @@ export const api = {
     delete: (id: string) => apiClient.delete(`/expenses/${id}`),
     submit: (id: string) => apiClient.post(`/expenses/${id}/submit`),
     stats: () => apiClient.get('/expenses/stats'),
+    receiptSuggestions: (receiptUrl: string) =>
+      apiClient.get('/expenses/receipt-suggestions', { params: { receipt_url: receiptUrl } }),
+    receiptsZip: (params?: any) =>
+      apiClient.get('/expenses/receipts.zip', { params, responseType: 'blob' }),
+  },
+
+  // Expense report endpoints (PDF, rendered in the background)
+  reports: {
+    create: (data: any) => apiClient.post('/reports', data),
+    get: (id: string) => apiClient.get(`/reports/${id}`),
+    download: (id: string) =>
+      apiClient.get(`/reports/${id}/download`, { responseType: 'blob' }),
   },
 
   // File upload endpoints
@@ -110,15 +126,52 @@ export const api = {
     delete: (filePath: string) => apiClient.delete(`/upload/${encodeURIComponent(filePath)}`),
     validate: (data: { filename: string; size: number }) => 
       apiClient.post('/upload/validate', data),
+    sign: (data: { filename: string; size: number }) =>
+      apiClient.post('/upload/sign', data),
+    confirm: (data: { path: string; filename?: string }) =>
+      apiClient.post('/upload/confirm', data),
+  },
+
+  // Approval rule endpoints
+  approvalRules: {
+    list: (params?: any) => apiClient.get('/approval-rules', { params }),
+    create: (data: any) => apiClient.post('/approval-rules', data),
+    update: (id: string, data: any) => apiClient.put(`/approval-rules/${id}`, data),
+    delete: (id: string) => apiClient.delete(`/approval-rules/${id}`),
   },
 
   // Approval endpoints
   approvals: {
     list: (params?: any) => apiClient.get('/approvals', { params }),
+    inbox: (params?: { status?: string; limit?: number; cursor?: string }) =>
+      apiClient.get('/approvals/inbox', { params }),
     approve: (id: string, comments?: string) =>
       apiClient.post(`/approvals/${id}/approve`, { comments }),
     reject: (id: string, comments?: string) =>
       apiClient.post(`/approvals/${id}/reject`, { comments }),
+    bulk: (data: { approval_ids: string[]; action: 'approve' | 'reject'; comments?: string }) =>
+      apiClient.post('/approvals/bulk', data),
+  },
+
+  // In-app notifications
+  notifications: {
+    list: (params?: { unread?: boolean; limit?: number; cursor?: string }) =>
+      apiClient.get('/notifications', { params }),
+    markRead: (data: { ids?: string[]; all?: boolean }) =>
+      apiClient.post('/notifications/read', data),
+  },
+
+  // Server-Sent Events (see lib/events.ts)
+  events: {
+    token: () => apiClient.post('/events/token'),
+    stats: () => apiClient.get('/events/stats'),
+  },
+
+  // Background job queue (admin)
+  jobs: {
+    stats: () => apiClient.get('/jobs/stats'),
+    receiptGc: (data?: { dry_run?: boolean; grace_hours?: number }) =>
+      apiClient.post('/jobs/receipt-gc', data || {}),
   },
 
   // Countries and currencies
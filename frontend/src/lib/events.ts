@@ -0,0 +1,77 @@
+/**
+ * Event Stream Client
+ * Subscribes to server-pushed expense and approval status changes
+ * instead of polling the list endpoints
+ */
+
+import { api, API_BASE_URL } from './api';
+
+export type StreamEventType = 'expense.status' | 'approval.assigned' | 'approval.decided' | 'resync';
+
+export interface StreamEvent {
+  type: StreamEventType;
+  data: any;
+}
+
+const EVENT_TYPES: StreamEventType[] = ['expense.status', 'approval.assigned', 'approval.decided', 'resync'];
+
+// Delay before reopening a stream the server closed or rejected
+const RECONNECT_DELAY_MS = 5000;
+
+/**
+ * Open the event stream for the logged-in user.
+ * A fresh stream token is requested for every connection, and the stream
+ * reconnects until the returned function is called.
+ */
+export function subscribeToEvents(onEvent: (event: StreamEvent) => void): () => void {
+  let source: EventSource | null = null;
+  let timer: ReturnType<typeof setTimeout> | null = null;
+  let lastEventId = '';
+  let closed = false;
+
+  const scheduleReconnect = () => {
+    if (closed || timer) return;
+    timer = setTimeout(() => {
+      timer = null;
+      connect();
+    }, RECONNECT_DELAY_MS);
+  };
+
+  const connect = async () => {
+    try {
+      const response = await api.events.token();
+      if (closed) return;
+
+      const params = new URLSearchParams({ token: response.data.data.token });
+      if (lastEventId) params.set('last_event_id', lastEventId);
+
+      source = new EventSource(`${API_BASE_URL}/events/stream?${params.toString()}`);
+
+      EVENT_TYPES.forEach((type) => {
+        source!.addEventListener(type, (message) => {
+          const event = message as MessageEvent;
+          if (event.lastEventId) lastEventId = event.lastEventId;
+          onEvent({ type, data: JSON.parse(event.data || '{}') });
+        });
+      });
+
+      // Stream tokens expire after a minute, so reconnect with a new one
+      // instead of letting EventSource retry with the old URL
+      source.onerror = () => {
+        source?.close();
+        source = null;
+        scheduleReconnect();
+      };
+    } catch (error) {
+      scheduleReconnect();
+    }
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    if (timer) clearTimeout(timer);
+    source?.close();
+  };
+}
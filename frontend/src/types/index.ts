@@ -40,10 +40,13 @@ export interface Expense {
   expense_date: string;
   description?: string;
   receipt_url?: string;
+  receipt_thumbnail_url?: string;
   status: 'draft' | 'submitted' | 'approved' | 'rejected';
   submitted_at?: string;
   created_at: string;
   updated_at: string;
+  // Other expenses filed with the same receipt (single expense responses)
+  duplicate_expenses?: Pick<Expense, 'id' | 'user_id' | 'amount' | 'currency' | 'expense_date' | 'status'>[];
   // Joined data
   users?: {
     name: string;